@@ -28,8 +28,40 @@ class Settings(BaseSettings):
     MYSQL_PASSWORD: Optional[str] = None
     MYSQL_DATABASE: Optional[str] = None
     
+    # Connection pooling: "queue" keeps connections open between sessions, "null" opens one per session
+    DB_POOL_MODE: str = "queue"
+    DB_POOL_SIZE: int = 10  # API pool
+    DB_MAX_OVERFLOW: int = 20
+    WORKER_DB_POOL_SIZE: int = 20  # Task execution pool (dispatcher / Celery worker)
+    WORKER_DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a free connection before failing
+    DB_POOL_RECYCLE: int = 1800  # Keep below MySQL wait_timeout
+    DB_POOL_SLOW_CHECKOUT_MS: int = 100  # Checkouts slower than this are counted as slow
+    
+    # SQL logging: DB_ECHO prints every statement with parameters (local debugging only);
+    # SQL tracing logs a sample of statements at DEBUG (no parameters), slow queries as warnings
+    # and per-endpoint query counts (GET /health/db, admin only)
+    DB_ECHO: bool = False
+    SQL_TRACE_ENABLED: bool = False
+    SQL_TRACE_SAMPLE_RATE: float = 0.01
+    SQL_SLOW_QUERY_MS: int = 500
+    
     WORKER_CONCURRENCY: int = 20
     
+    # Task claiming (safe with multiple worker replicas)
+    WORKER_ID: str = ""  # Defaults to hostname:pid when empty
+    TASK_CLAIM_BATCH_SIZE: int = 50  # Max tasks a worker claims per sweep
+    TASK_CLAIM_PER_ACCOUNT: int = 5  # Max due tasks of one account claimed at once (they run serially)
+    TASK_LEASE_SECONDS: int = 1800  # Running tasks whose lease expires are re-queued
+    
+    # Long-lived dispatcher (python -m app.dispatcher)
+    WORKER_POLL_INTERVAL: float = 2.0  # Seconds between claims when nothing is due
+    WORKER_DRAIN_TIMEOUT: int = 300  # Seconds to wait for in-flight tasks on shutdown
+    
+    # Instagram client pool (per worker process)
+    INSTAGRAM_CLIENT_POOL_SIZE: int = 200  # Max cached clients (LRU)
+    INSTAGRAM_SESSION_TTL: int = 600  # Seconds a verified session is trusted without re-checking
+    
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
         """Get MySQL remote database URL."""
@@ -42,6 +74,14 @@ class Settings(BaseSettings):
     # Redis / Celery
     REDIS_HOST: str = "localhost" # Default for local run, override in docker-compose
     REDIS_PORT: int = 6379
+    REDIS_CACHE_DB: int = 1  # Caches, job state and events (Celery uses DB 0)
+    
+    DASHBOARD_CACHE_TTL: int = 15  # Seconds; 0 disables the dashboard stats cache
+    ENTITLEMENT_CACHE_TTL: int = 60  # Seconds a user/subscription snapshot is trusted (max delay for plan changes made in the central service); 0 disables the cache
+    SUBSCRIPTION_SWEEP_INTERVAL: int = 300  # Seconds between expiry sweeps (stop tasks, release proxies); 0 disables
+    BULK_JOB_TTL: int = 24 * 3600  # Seconds a bulk import job stays queryable after its last update
+    BULK_LOGIN_CONCURRENCY: int = 10  # Logins running at once in one bulk import
+    BULK_LOGIN_PER_PROXY: int = 2  # Logins running at once through the same proxy (or the server IP)
     
     @property
     def CELERY_BROKER_URL(self) -> str:
@@ -59,6 +99,44 @@ class Settings(BaseSettings):
         os.makedirs(path, exist_ok=True)
         return path
 
+    @property
+    def MEDIA_VARIANTS_PATH(self) -> str:
+        # Resolves to backend/media/variants (preprocessed upload variants by content hash)
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        path = os.path.join(base_dir, "media", "variants")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    # Media uploads (post/reels/story); larger uploads are rejected with 413
+    MEDIA_MAX_IMAGE_MB: int = 30
+    MEDIA_MAX_VIDEO_MB: int = 500
+    MEDIA_PREPROCESS_WORKERS: int = 2  # Processes building feed/story/thumbnail variants; 0 disables
+    MEDIA_GC_GRACE_HOURS: int = 24  # Unreferenced media is deleted after this long
+    MEDIA_GC_INTERVAL: int = 3600  # Seconds between media GC runs in the dispatcher
+
+    # Proxy health probes (app.services.proxy_health); PROXY_PROBE_URL can point at a local stand-in
+    PROXY_PROBE_URL: str = "http://ip-api.com/json"
+    PROXY_PROBE_TIMEOUT: float = 10.0
+    PROXY_PROBE_CONCURRENCY: int = 20  # Proxies probed at once
+    PROXY_PROBE_INTERVAL: int = 600  # Seconds between probe runs; 0 disables the background prober
+    PROXY_SLOW_MS: int = 3000  # Average latency above this marks a proxy as slow
+    PROXY_HEALTH_RETENTION_DAYS: int = 7
+
+    # Logging (app.core.logging_config): JSON lines in LOG_DIR/<service>.log plus readable stdout
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVEL_OVERRIDES: str = "instagrapi=WARNING,public_request=WARNING,private_request=WARNING"  # "logger=LEVEL,..."
+    LOG_TO_FILE: bool = True
+    LOG_ROTATION: str = "size"  # "size" (LOG_MAX_BYTES) or "time" (LOG_ROTATE_WHEN)
+    LOG_MAX_BYTES: int = 20 * 1024 * 1024
+    LOG_ROTATE_WHEN: str = "midnight"
+    LOG_BACKUP_COUNT: int = 7
+
+    @property
+    def LOG_DIR(self) -> str:
+        # Resolves to backend/logs
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        return os.path.join(base_dir, "logs")
+
     # Central Server (Multi-Tenant License Management)
     CENTRAL_SERVER_ENABLED: bool = False  # Set to True to enable
     CENTRAL_SERVER_URL: str = ""  # e.g. "http://your-server.com"
@@ -0,0 +1,160 @@
+"""
+Process-wide logging: non-blocking, structured, rotated.
+
+Call setup_logging("<service>") once at process start (API, dispatcher, Celery child).
+Loggers only put records on an in-memory queue; a QueueListener thread formats and
+writes them, so a slow disk never stalls the event loop or the instagrapi threads.
+
+- LOG_DIR/<service>.log: JSON lines, rotated by size (LOG_ROTATION="size") or time ("time")
+- stdout: one readable line per record (docker logs)
+- correlation_id: bound per task / login with bind_correlation_id() and attached to
+  every record logged inside, including from asyncio.to_thread() workers
+"""
+import atexit
+import contextlib
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.core.config import settings
+
+correlation_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("correlation_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "cid", "correlation_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configured_pid: Optional[int] = None
+
+
+@contextlib.contextmanager
+def bind_correlation_id(value):
+    """Attach `value` (e.g. "task-123") to every record logged in this context."""
+    token = correlation_id.set(str(value) if value is not None else None)
+    try:
+        yield
+    finally:
+        correlation_id.reset(token)
+
+
+class CorrelationIdFilter(logging.Filter):
+    # Runs on the producing side, where the context variable is visible
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "correlation_id"):
+            record.correlation_id = correlation_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "correlation_id", None):
+            entry["correlation_id"] = record.correlation_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            record.exc_text = record.exc_text or self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s%(cid)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        cid = getattr(record, "correlation_id", None)
+        record.cid = f" [{cid}]" if cid else ""
+        return super().format(record)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now (the objects may change before the
+        # listener runs) but keep structured fields for the JSON formatter
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _file_handler(service: str) -> logging.Handler:
+    os.makedirs(settings.LOG_DIR, exist_ok=True)
+    path = os.path.join(settings.LOG_DIR, f"{service}.log")
+    if settings.LOG_ROTATION == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(
+            path, when=settings.LOG_ROTATE_WHEN, backupCount=settings.LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=settings.LOG_MAX_BYTES, backupCount=settings.LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def _parse_levels(spec: str):
+    """"instagrapi=WARNING,httpx=ERROR" -> [("instagrapi", "WARNING"), ...]"""
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        if name and level:
+            yield name.strip(), level.strip().upper()
+
+
+def setup_logging(service: str = "app"):
+    """
+    Route all stdlib logging through the queue. Idempotent per process; a forked child
+    (Celery prefork) gets its own listener since threads do not survive fork.
+    """
+    global _listener, _configured_pid
+    if _configured_pid == os.getpid():
+        return
+    _listener = None  # Inherited from the parent; its thread is not running here
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(TextFormatter())
+    handlers = [console]
+    if settings.LOG_TO_FILE:
+        handlers.append(_file_handler(service))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(CorrelationIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    for name, level in _parse_levels(settings.LOG_LEVEL_OVERRIDES):
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _configured_pid = os.getpid()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None and _configured_pid == os.getpid():
+        _listener.stop()
+    _listener = None
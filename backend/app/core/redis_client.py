@@ -0,0 +1,25 @@
+from typing import Optional
+
+import redis.asyncio as redis
+
+from app.core.config import settings
+
+_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    Shared asyncio Redis client (same server as the Celery broker, DB REDIS_CACHE_DB).
+    Callers treat Redis as best effort: on RedisError they fall back to the database.
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_CACHE_DB,
+            decode_responses=True,
+            socket_connect_timeout=2,
+            socket_timeout=2,
+        )
+    return _client
@@ -11,6 +11,8 @@ pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 SECRET_KEY = os.getenv("SECRET_KEY", "your-fallback-secret-key-change-it-in-prod")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 1 week
+STREAM_TOKEN_EXPIRE_SECONDS = 60  # Only needs to outlive opening the stream
+STREAM_SCOPE = "events"
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -30,3 +32,13 @@ def create_access_token(subject: Union[str, Any], expires_delta: timedelta = Non
     to_encode = {"exp": expire, "sub": str(subject), "jti": jti}
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+def create_stream_token(subject: Union[str, Any], session_jti: str) -> str:
+    """
+    Short-lived token that only opens the event stream. EventSource cannot send headers,
+    so it travels in the query string (and access logs) instead of the access token.
+    Carries the session's jti so single-session enforcement still applies.
+    """
+    expire = datetime.utcnow() + timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    to_encode = {"exp": expire, "sub": str(subject), "jti": session_jti, "scope": STREAM_SCOPE}
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
@@ -1,27 +1,155 @@
+import threading
+import time
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 from app.core.config import settings
+from app.db.tracing import install_sql_tracing
 
 # Get database URI and determine database type
 database_uri = settings.SQLALCHEMY_DATABASE_URI
 is_mysql = "mysql" in database_uri
 
-# Create async engine with appropriate settings for database type
-engine = create_async_engine(
-    database_uri,
-    future=True,
-    echo=True,
-    poolclass=NullPool if is_mysql else None,  # Use NullPool for MySQL to avoid connection issues
-    pool_pre_ping=not is_mysql if not is_mysql else True,  # Always pre-ping for MySQL
-    pool_recycle=3600 if is_mysql else None,  # Recycle MySQL connections every hour
-    connect_args={"init_command": "SET time_zone='+07:00'"} if is_mysql else {},
-)
+
+class PoolMetrics:
+    """Checkout wait time and saturation counters for one engine's pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_errors = 0
+        self.connects = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.slow_checkouts = 0  # waited longer than DB_POOL_SLOW_CHECKOUT_MS
+
+    def record_wait(self, seconds: float, ok: bool = True):
+        with self._lock:
+            if not ok:
+                self.checkout_errors += 1
+                return
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if seconds * 1000 >= settings.DB_POOL_SLOW_CHECKOUT_MS:
+                self.slow_checkouts += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            data = {
+                "checkouts": self.checkouts,
+                "checkout_errors": self.checkout_errors,
+                "new_connections": self.connects,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+                "slow_checkouts": self.slow_checkouts,
+            }
+        data["pool_class"] = type(pool).__name__
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            data.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "capacity": capacity,
+                "saturation": round(pool.checkedout() / capacity, 3) if capacity else None,
+            })
+        return data
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a free connection."""
+
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            if self.metrics:
+                self.metrics.record_wait(time.perf_counter() - start, ok=False)
+            raise
+        if self.metrics:
+            self.metrics.record_wait(time.perf_counter() - start)
+        return conn
+
+
+def _pool_class(metrics: PoolMetrics):
+    return type(f"InstrumentedAsyncPool_{metrics.name}", (InstrumentedAsyncPool,), {"metrics": metrics})
+
+
+def _create_engine(name: str, pool_size: int, max_overflow: int):
+    """
+    Build an async engine.
+    DB_POOL_MODE=queue keeps connections open between sessions (pre-pinged and recycled
+    before MySQL's wait_timeout drops them); DB_POOL_MODE=null opens a connection per session.
+    """
+    metrics = PoolMetrics(name)
+    kwargs = dict(
+        future=True,
+        echo=settings.DB_ECHO,
+        connect_args={"init_command": "SET time_zone='+07:00'"} if is_mysql else {},
+    )
+    if settings.DB_POOL_MODE == "null":
+        kwargs["poolclass"] = NullPool
+    else:
+        kwargs.update(
+            poolclass=_pool_class(metrics),
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+    new_engine = create_async_engine(database_uri, **kwargs)
+
+    @event.listens_for(new_engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        metrics.record_connect()
+
+    new_engine.pool_metrics = metrics
+    install_sql_tracing(new_engine)
+    return new_engine
+
+
+# API requests
+engine = _create_engine("api", settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
 
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
 
+# Task execution (Celery sweep, dispatcher); kept apart so long-running tasks
+# never starve API requests of connections
+worker_engine = _create_engine("worker", settings.WORKER_DB_POOL_SIZE, settings.WORKER_DB_MAX_OVERFLOW)
+
+WorkerSessionLocal = sessionmaker(
+    worker_engine, class_=AsyncSession, expire_on_commit=False
+)
+
+
+def pool_status() -> dict:
+    return {
+        "mode": settings.DB_POOL_MODE,
+        "api": engine.pool_metrics.snapshot(engine.pool),
+        "worker": worker_engine.pool_metrics.snapshot(worker_engine.pool),
+    }
+
+
+async def dispose_engines():
+    await engine.dispose()
+    await worker_engine.dispose()
+
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         try:
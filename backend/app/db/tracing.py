@@ -0,0 +1,119 @@
+"""
+Optional SQL tracing.
+
+Off by default (SQL_TRACE_ENABLED=false): no engine listeners are installed, so the hot
+path pays nothing. When enabled:
+- a SQL_TRACE_SAMPLE_RATE share of statements is logged at DEBUG (statement text only,
+  never parameters, so cookies and passwords stay out of the logs);
+- statements slower than SQL_SLOW_QUERY_MS are always logged as warnings;
+- queries are counted per request and aggregated per endpoint (see query_stats()).
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_STATEMENT_CHARS = 500
+
+
+class RequestQueryStats:
+    __slots__ = ("count", "total_ms")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+
+
+_current_request: ContextVar[Optional[RequestQueryStats]] = ContextVar("sql_request_stats", default=None)
+
+# "METHOD /route/{param}" -> aggregated counters
+_endpoint_stats: Dict[str, dict] = {}
+_endpoint_lock = threading.Lock()
+
+
+def _shorten(statement: str) -> str:
+    statement = " ".join(statement.split())
+    if len(statement) > MAX_STATEMENT_CHARS:
+        return statement[:MAX_STATEMENT_CHARS] + "..."
+    return statement
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._trace_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_trace_start", None)
+    if start is None:
+        return
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    stats = _current_request.get()
+    if stats is not None:
+        stats.count += 1
+        stats.total_ms += elapsed_ms
+
+    if elapsed_ms >= settings.SQL_SLOW_QUERY_MS:
+        logger.warning("Slow SQL [%s] %.1fms: %s", conn.engine.url.database, elapsed_ms, _shorten(statement))
+    elif random.random() < settings.SQL_TRACE_SAMPLE_RATE:
+        logger.debug("SQL [%s] %.1fms: %s", conn.engine.url.database, elapsed_ms, _shorten(statement))
+
+
+def install_sql_tracing(engine):
+    """Attach tracing listeners to an AsyncEngine (no-op unless SQL_TRACE_ENABLED)."""
+    if not settings.SQL_TRACE_ENABLED:
+        return
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "after_cursor_execute", _after_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def start_request():
+    """Begin counting queries for the current request; returns a token for finish_request()."""
+    if not settings.SQL_TRACE_ENABLED:
+        return None
+    return _current_request.set(RequestQueryStats())
+
+
+def finish_request(token, endpoint: str) -> Optional[RequestQueryStats]:
+    if token is None:
+        return None
+    stats = _current_request.get()
+    _current_request.reset(token)
+    if stats is None:
+        return None
+
+    with _endpoint_lock:
+        agg = _endpoint_stats.setdefault(endpoint, {"requests": 0, "queries": 0, "max_queries": 0, "db_ms": 0.0})
+        agg["requests"] += 1
+        agg["queries"] += stats.count
+        agg["max_queries"] = max(agg["max_queries"], stats.count)
+        agg["db_ms"] += stats.total_ms
+    return stats
+
+
+def query_stats() -> dict:
+    """Per-endpoint query counts, busiest endpoints first."""
+    with _endpoint_lock:
+        rows = [
+            {
+                "endpoint": endpoint,
+                "requests": agg["requests"],
+                "avg_queries": round(agg["queries"] / agg["requests"], 2),
+                "max_queries": agg["max_queries"],
+                "avg_db_ms": round(agg["db_ms"] / agg["requests"], 2),
+            }
+            for endpoint, agg in _endpoint_stats.items()
+        ]
+    rows.sort(key=lambda r: r["avg_queries"] * r["requests"], reverse=True)
+    return {"enabled": settings.SQL_TRACE_ENABLED, "endpoints": rows}
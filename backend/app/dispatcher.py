@@ -0,0 +1,198 @@
+"""
+Long-lived task dispatcher.
+
+Run with: python -m app.dispatcher
+
+Unlike the Celery beat sweep (app.worker.check_scheduled_tasks), which builds a new
+event loop every tick and waits for the slowest task of the batch, the dispatcher keeps
+one event loop alive and a bounded window of in-flight accounts (WORKER_CONCURRENCY).
+Claimed tasks of the same account run one after another in a single session, so the
+window counts running accounts, each claim takes at most TASK_CLAIM_PER_ACCOUNT tasks
+of one account, and accounts already running are not claimed again. As soon as an
+account's tasks finish, its slot is refilled with the next due account.
+
+Tasks are claimed atomically (see app.services.task_queue), so several dispatcher
+replicas, or a dispatcher next to the Celery sweep, never run the same task twice.
+"""
+import asyncio
+import logging
+import signal
+from typing import Dict, List, Tuple
+
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.db.session import dispose_engines
+from app.models import Task, Account, User, Fingerprint, TaskBatch # Import all to ensure registry
+from app.services.task_executor import execute_account_tasks
+from app.services.media_gc import collect_media_garbage
+from app.services.proxy_health import run_proxy_health_checks
+from app.services.subscription_sweeper import sweep_expired_subscriptions
+from app.services.task_queue import claim_due_tasks, release_expired_leases, renew_leases, get_worker_id, group_by_account
+
+logger = logging.getLogger(__name__)
+
+
+class TaskDispatcher:
+    def __init__(
+        self,
+        concurrency: int = settings.WORKER_CONCURRENCY,
+        poll_interval: float = settings.WORKER_POLL_INTERVAL,
+        drain_timeout: int = settings.WORKER_DRAIN_TIMEOUT,
+    ):
+        self.worker_id = get_worker_id()
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.drain_timeout = drain_timeout
+        # Renew leases well before they expire
+        self.maintenance_interval = max(10, settings.TASK_LEASE_SECONDS // 3)
+        # Running per-account groups -> (account id, task ids)
+        self.inflight: Dict[asyncio.Task, Tuple[int, List[int]]] = {}
+        self._stopping: asyncio.Event = None
+        self._periodic: Dict[str, asyncio.Task] = {}
+
+    def stop(self):
+        """Stop claiming new tasks; in-flight tasks are drained by run()."""
+        if self._stopping and not self._stopping.is_set():
+            logger.info("[%s] Shutdown requested, draining %s in-flight task(s)...", self.worker_id, self.inflight_count)
+            self._stopping.set()
+
+    def _install_signal_handlers(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Windows: fall back to KeyboardInterrupt handling in main()
+                pass
+
+    @property
+    def inflight_count(self) -> int:
+        return sum(len(task_ids) for _, task_ids in self.inflight.values())
+
+    def _inflight_task_ids(self, groups=None) -> List[int]:
+        groups = self.inflight if groups is None else groups
+        return [task_id for task in groups for task_id in self.inflight.get(task, (None, []))[1]]
+
+    def _start(self, account_id: int, task_ids: List[int]):
+        task = asyncio.create_task(self._execute(account_id, task_ids))
+        self.inflight[task] = (account_id, task_ids)
+        task.add_done_callback(lambda t: self.inflight.pop(t, None))
+
+    async def _execute(self, account_id: int, task_ids: List[int]):
+        try:
+            await execute_account_tasks(account_id, task_ids)
+        except Exception as e:
+            logger.exception("[%s] Unhandled error in tasks %s: %s", self.worker_id, task_ids, e)
+
+    async def _maintenance(self):
+        try:
+            await release_expired_leases()
+            await renew_leases(self.worker_id, self._inflight_task_ids())
+        except Exception as e:
+            logger.warning("[%s] Lease maintenance failed: %s", self.worker_id, e)
+
+    def _start_periodic(self, name: str, job):
+        """Run a periodic job (media GC, proxy probes) in the background so it never delays claiming."""
+        running = self._periodic.get(name)
+        if running and not running.done():
+            return
+
+        async def _run():
+            try:
+                await job()
+            except Exception as e:
+                logger.exception("[%s] %s failed: %s", self.worker_id, name, e)
+
+        self._periodic[name] = asyncio.create_task(_run())
+
+    async def _fill_window(self):
+        free = self.concurrency - len(self.inflight)
+        if free <= 0:
+            return
+        per_account = max(1, settings.TASK_CLAIM_PER_ACCOUNT)
+        try:
+            claimed = await claim_due_tasks(
+                self.worker_id,
+                free * per_account,
+                per_account=per_account,
+                max_accounts=free,
+                exclude_accounts={account_id for account_id, _ in self.inflight.values()},
+            )
+        except Exception as e:
+            logger.warning("[%s] Failed to claim tasks: %s", self.worker_id, e)
+            return
+        for account_id, task_ids in group_by_account(claimed).items():
+            self._start(account_id, task_ids)
+        if claimed:
+            logger.info("[%s] Claimed %s task(s), %s/%s account(s) in flight", self.worker_id, len(claimed), len(self.inflight), self.concurrency)
+
+    async def _wait(self, stop_waiter: asyncio.Task):
+        """Sleep until a slot frees, shutdown is requested, or the poll interval elapses."""
+        await asyncio.wait(
+            set(self.inflight) | {stop_waiter},
+            timeout=self.poll_interval,
+            return_when=asyncio.FIRST_COMPLETED
+        )
+
+    async def _drain(self):
+        if not self.inflight:
+            return
+        done, pending = await asyncio.wait(set(self.inflight), timeout=self.drain_timeout)
+        if pending:
+            # Their rows stay 'running' and are re-queued once the lease expires
+            logger.warning("[%s] Drain timeout: cancelling %s account group(s), tasks %s", self.worker_id, len(pending), sorted(self._inflight_task_ids(pending)))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def run(self):
+        self._stopping = asyncio.Event()
+        self._install_signal_handlers()
+        stop_waiter = asyncio.create_task(self._stopping.wait())
+        loop = asyncio.get_running_loop()
+        last_maintenance = 0.0
+        # name -> (job, interval setting, last start); the first run waits one interval
+        periodic = {
+            "Media GC": [collect_media_garbage, settings.MEDIA_GC_INTERVAL, loop.time()],
+            "Proxy health probe": [run_proxy_health_checks, settings.PROXY_PROBE_INTERVAL, loop.time()],
+            "Subscription sweep": [sweep_expired_subscriptions, settings.SUBSCRIPTION_SWEEP_INTERVAL, loop.time()],
+        }
+
+        logger.info("[%s] Dispatcher started (window %s accounts, poll %ss)", self.worker_id, self.concurrency, self.poll_interval)
+        try:
+            while not self._stopping.is_set():
+                if loop.time() - last_maintenance >= self.maintenance_interval:
+                    await self._maintenance()
+                    last_maintenance = loop.time()
+                for name, entry in periodic.items():
+                    job, interval, last_run = entry
+                    if interval > 0 and loop.time() - last_run >= interval:
+                        self._start_periodic(name, job)
+                        entry[2] = loop.time()
+
+                await self._fill_window()
+                await self._wait(stop_waiter)
+        finally:
+            self.stop()
+            await self._drain()
+            for task in self._periodic.values():
+                if not task.done():
+                    task.cancel()
+            stop_waiter.cancel()
+            logger.info("[%s] Dispatcher stopped", self.worker_id)
+
+
+async def main():
+    setup_logging("dispatcher")
+    dispatcher = TaskDispatcher()
+    try:
+        await dispatcher.run()
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -1,9 +1,16 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.routers import accounts, tasks, proxies, dashboard, reporting, tickets, admin_proxy
-from app.db.session import engine
+from app.core.logging_config import setup_logging
+from app.routers import accounts, tasks, proxies, dashboard, reporting, tickets, admin_proxy, admin_media, events
+from app.routers.deps import check_role
+from app.db.session import engine, pool_status
+from app.db import tracing as sql_tracing
 from app.models.base import Base
+from app.models.task import Task
+from app.services.task_counters import rebuild_task_counters
+
+setup_logging("api")
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -18,6 +25,23 @@ async def log_requests(request, call_next):
     print(f"✅ Response: {request.method} {request.url.path} -> {response.status_code}")
     return response
 
+# Per-endpoint SQL query counts (only when SQL_TRACE_ENABLED)
+@app.middleware("http")
+async def count_queries(request, call_next):
+    token = sql_tracing.start_request()
+    if token is None:
+        return await call_next(request)
+    response = None
+    try:
+        response = await call_next(request)
+        return response
+    finally:
+        route = request.scope.get("route")
+        endpoint = f"{request.method} {getattr(route, 'path', request.url.path)}"
+        stats = sql_tracing.finish_request(token, endpoint)
+        if response is not None and stats is not None:
+            response.headers["X-DB-Query-Count"] = str(stats.count)
+
 # CORS - Allow all origins for development
 app.add_middleware(
     CORSMiddleware,
@@ -35,6 +59,8 @@ app.include_router(dashboard.router, prefix="/api/v1/dashboard", tags=["dashboar
 app.include_router(reporting.router, prefix="/api/v1/reporting", tags=["reporting"])
 app.include_router(tickets.router, prefix="/api/v1/tickets", tags=["tickets"])
 app.include_router(admin_proxy.router, prefix="/api/v1/admin", tags=["admin"])
+app.include_router(admin_media.router, prefix="/api/v1/admin", tags=["admin"])
+app.include_router(events.router, prefix="/api/v1/events", tags=["events"])
 
 @app.on_event("startup")
 async def startup():
@@ -45,9 +71,16 @@ async def startup():
         from sqlalchemy import text, inspect
         try:
             async with engine.begin() as conn:
+                existing_tables = await conn.run_sync(lambda connection: inspect(connection).get_table_names())
+                
                 # 1. Create all missing tables
                 await conn.run_sync(Base.metadata.create_all)
                 
+                # Backfill the task counters the first time their table is created
+                if "task_counters" not in existing_tables:
+                    await rebuild_task_counters(conn)
+                    print("✅ Migration: Built task_counters from existing tasks")
+                
                 # 2. Check for and add missing columns in existing tables (MySQL migration)
                 def get_table_columns(connection, table_name):
                     inspector = inspect(connection)
@@ -73,6 +106,24 @@ async def startup():
                     await conn.execute(text("ALTER TABLE accounts ADD COLUMN last_error VARCHAR(512)"))
                     print("✅ Migration: Added last_error to accounts table")
                 
+                # Sync tasks table (worker lease columns)
+                tasks_cols = await conn.run_sync(lambda connection: get_table_columns(connection, "tasks"))
+                if "lease_owner" not in tasks_cols:
+                    await conn.execute(text("ALTER TABLE tasks ADD COLUMN lease_owner VARCHAR(100)"))
+                    print("✅ Migration: Added lease_owner to tasks table")
+                if "lease_expires_at" not in tasks_cols:
+                    await conn.execute(text("ALTER TABLE tasks ADD COLUMN lease_expires_at DATETIME"))
+                    print("✅ Migration: Added lease_expires_at to tasks table")
+                
+                # Sync tasks table (composite indexes for the worker sweep, stats and dashboard)
+                tasks_indexes = await conn.run_sync(
+                    lambda connection: {i['name'] for i in inspect(connection).get_indexes("tasks")}
+                )
+                for index in Task.__table__.indexes:
+                    if index.name not in tasks_indexes:
+                        await conn.run_sync(lambda connection: index.create(connection))
+                        print(f"✅ Migration: Created index {index.name} on tasks table")
+                
                 # Sync proxies table (defensive check)
                 proxies_cols = await conn.run_sync(lambda connection: get_table_columns(connection, "proxy_templates"))
                 if "user_id" not in proxies_cols:
@@ -164,3 +215,8 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+@app.get("/health/db", dependencies=[Depends(check_role(["admin"]))])
+def db_pool_health():
+    """Connection pool checkout wait times and saturation for the API and worker engines (admin only)."""
+    return {"status": "healthy", "pools": pool_status(), "queries": sql_tracing.query_stats()}
@@ -7,10 +7,10 @@ from sqlalchemy.orm import selectinload
 from app.db.session import AsyncSessionLocal
 from app.models.user import User
 from app.models.subscription import Subscription, SubscriptionPlan
-import json
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.tz_utils import now_jakarta
+from app.services.entitlements import get_user_entitlements
 
 async def get_user_subscription(user: User, db: AsyncSession = None) -> Subscription:
     """Get user's active subscription with plan details."""
@@ -37,116 +37,38 @@ async def _get_subscription_query(db: AsyncSession, user: User) -> Subscription:
     return result.scalars().first()
 
 async def check_user_limits(user: User, resource_type: str = "account") -> bool:
-    """Check if user has reached their subscription limits."""
-    sub = await get_user_subscription(user)
-    if not sub:
+    """Check if user has reached their subscription limits (plan limit plus addon quota)."""
+    ent = await get_user_entitlements(user)
+    if not ent.subscription_active:
         return False
         
     async with AsyncSessionLocal() as db:
         if resource_type == "account":
             from app.models.account import Account
-            from app.models.subscription import SubscriptionAddon
-            
-            # Get current account count
             stmt = select(func.count(Account.id)).where(Account.user_id == user.id)
-            result = await db.execute(stmt)
-            count = result.scalar()
-            
-            # Get base limit from plan
-            limit = sub.plan.ig_account_limit
-            
-            # Add quota from active addons (sub_type='account')
-            addon_stmt = select(func.sum(SubscriptionAddon.quantity)).where(
-                SubscriptionAddon.user_id == user.id,
-                SubscriptionAddon.addon_type == 'quota',
-                SubscriptionAddon.sub_type == 'account',
-                SubscriptionAddon.is_active == True
-            )
-            addon_result = await db.execute(addon_stmt)
-            addon_quota = addon_result.scalar() or 0
-            
-            total_limit = limit + addon_quota
-            return count < total_limit
-            
         elif resource_type == "proxy":
             from app.models.proxy import ProxyTemplate
-            from app.models.subscription import SubscriptionAddon
-            
-            # Get current proxy count
             stmt = select(func.count(ProxyTemplate.id)).where(ProxyTemplate.user_id == user.id)
-            result = await db.execute(stmt)
-            count = result.scalar()
-            
-            # Get base limit from plan
-            limit = sub.plan.proxy_slot_limit
-            
-            # Add quota from active addons (sub_type='proxy')
-            addon_stmt = select(func.sum(SubscriptionAddon.quantity)).where(
-                SubscriptionAddon.user_id == user.id,
-                SubscriptionAddon.addon_type == 'quota',
-                SubscriptionAddon.sub_type == 'proxy',
-                SubscriptionAddon.is_active == True
-            )
-            addon_result = await db.execute(addon_stmt)
-            addon_quota = addon_result.scalar() or 0
-            
-            total_limit = limit + addon_quota
-            # If Supreme (proxy_slot_limit=999999), limit is practically unlimited
-            return count < total_limit
-            
-    return False
+        else:
+            return False
+        count = (await db.execute(stmt)).scalar()
+        
+    # If Supreme (proxy_slot_limit=999999), limit is practically unlimited
+    return count < ent.limit(resource_type)
 
 async def has_feature(user: User, feature_name: str) -> bool:
     """Check if user's current plan allows a specific feature."""
-    sub = await get_user_subscription(user)
-    if not sub:
-        return False
-        
-    features = sub.plan.features
-    if isinstance(features, str):
-        try:
-            features = json.loads(features)
-        except:
-            features = []
-            
-    return feature_name in features
-
-async def stop_user_tasks(user_id: int):
-    """Stop ALL running automation tasks and release proxies immediately upon expiration."""
-    from app.models.task import Task
-    from app.models.proxy import ProxyTemplate
-    
-    async with AsyncSessionLocal() as db:
-        # 1. Stop all pending/running tasks
-        stmt = select(Task).where(
-            Task.user_id == user_id,
-            Task.status.in_(["pending", "running"])
-        )
-        result = await db.execute(stmt)
-        tasks = result.scalars().all()
-        
-        for task in tasks:
-            task.status = "failed"
-            task.error_message = "Subscription expired"
-        
-        # 2. Release/Freeze Proxy assignments
-        proxy_stmt = select(ProxyTemplate).where(ProxyTemplate.user_id == user_id)
-        proxy_result = await db.execute(proxy_stmt)
-        proxies = proxy_result.scalars().all()
-        
-        for proxy in proxies:
-            proxy.user_id = None # Release the proxy from user
-            
-        await db.commit()
+    ent = await get_user_entitlements(user)
+    return ent.has_feature(feature_name)
 
 async def is_subscription_active(user: User) -> bool:
-    """Check if user has any active subscription. If expired, triggers auto-stop."""
-    sub = await get_user_subscription(user)
-    if not sub:
-        # If user existed but sub vanished or expired, stop tasks
-        await stop_user_tasks(user.id)
-        return False
-    return True
+    """
+    Check if user has any active subscription. Stopping an expired user's tasks and
+    releasing their proxies is done by the periodic sweeper
+    (app.services.subscription_sweeper), never on the request path.
+    """
+    ent = await get_user_entitlements(user)
+    return ent.subscription_active
 
 def require_active_subscription(func):
     """Decorator to protect routes from expired users."""
@@ -3,7 +3,9 @@ from .user import User
 from .account import Account, Fingerprint
 from .task import Task
 from .task_batch import TaskBatch
-from .proxy import ProxyTemplate
+from .proxy import ProxyTemplate, ProxyHealthCheck
+from .task_counter import TaskCounter
+from .media_object import MediaObject
 
 # Export all for cleaner imports and to ensure registry population
-__all__ = ["Base", "User", "Account", "Fingerprint", "Task", "TaskBatch", "ProxyTemplate"]
+__all__ = ["Base", "User", "Account", "Fingerprint", "Task", "TaskBatch", "ProxyTemplate", "TaskCounter", "MediaObject", "ProxyHealthCheck"]
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+class MediaObject(Base):
+    """
+    A stored media blob in settings.MEDIA_PATH, keyed by content hash.
+    ref_count is recomputed from Task.params by the media GC; objects left
+    unreferenced for MEDIA_GC_GRACE_HOURS are deleted with their variants.
+    """
+    __tablename__ = "media_objects"
+
+    sha256 = Column(String(64), primary_key=True)
+    filename = Column(String(255), nullable=False)  # "<sha256><ext>" in MEDIA_PATH
+    size_bytes = Column(BigInteger, nullable=False, default=0)
+
+    ref_count = Column(Integer, nullable=False, default=0)
+    unreferenced_since = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_referenced_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.base import Base
@@ -16,3 +16,25 @@ class ProxyTemplate(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class ProxyHealthCheck(Base):
+    """
+    One probe of one proxy (app.services.proxy_health). Proxies are keyed by a short hash
+    of their URL, so templates and assignments sharing a proxy share its history and
+    credentials are not repeated in every row. Rows older than PROXY_HEALTH_RETENTION_DAYS
+    are deleted by the prober.
+    """
+    __tablename__ = "proxy_health_checks"
+    __table_args__ = (
+        Index("ix_proxy_health_key_checked", "proxy_key", "checked_at"),
+        Index("ix_proxy_health_checked", "checked_at"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    proxy_key = Column(String(16), nullable=False)
+    checked_at = Column(DateTime(timezone=True), nullable=False)
+    success = Column(Boolean, nullable=False)
+    latency_ms = Column(Integer, nullable=True)  # Time to a full probe response
+    exit_ip = Column(String(45), nullable=True)  # Public IP seen by the probe target
+    error = Column(String(255), nullable=True)
@@ -1,10 +1,28 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Float, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Float, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.base import Base
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Worker sweep: pending tasks due by scheduled_at
+        Index("ix_tasks_status_scheduled_at", "status", "scheduled_at"),
+        # Expired lease recovery
+        Index("ix_tasks_status_lease_expires_at", "status", "lease_expires_at"),
+        # Per-user / per-account listings and stats
+        Index("ix_tasks_user_status", "user_id", "status"),
+        Index("ix_tasks_account_status", "account_id", "status"),
+        # Batch completion checks
+        Index("ix_tasks_batch_status", "batch_id", "status"),
+        # Keyset pagination: listings ordered by (scheduled_at, id)
+        Index("ix_tasks_user_scheduled_at", "user_id", "scheduled_at"),
+        Index("ix_tasks_batch_scheduled_at", "batch_id", "scheduled_at"),
+        # Dashboard ranges (admin and per-user)
+        Index("ix_tasks_status_executed_at", "status", "executed_at"),
+        Index("ix_tasks_user_executed_at", "user_id", "executed_at"),
+        Index("ix_tasks_user_created_at", "user_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     account_id = Column(Integer, ForeignKey("accounts.id"))
@@ -29,6 +47,10 @@ class Task(Base):
     status = Column(String(20), default="pending") # pending, running, completed, failed
     error_message = Column(Text, nullable=True)
     
+    # Worker lease: set when a worker claims the task (pending -> running)
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     user = relationship("User")
 
@@ -0,0 +1,112 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import Column, Integer, String, DateTime, Index, event, inspect
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import Session
+
+from app.core.tz_utils import now_jakarta, to_jakarta
+from app.models.base import Base
+from app.models.task import Task
+
+# (user_id, account_id, task_type, status, bucket_hour)
+CounterKey = Tuple[int, int, str, str, datetime]
+
+
+class TaskCounter(Base):
+    """
+    Materialized task counts per user, account, type, status and creation hour.
+
+    Kept in step with the tasks table: ORM inserts, deletes and status changes are
+    counted by the flush listener below; bulk Core statements must go through
+    app.services.task_counters. Rebuild with tools/rebuild_task_counters.py.
+    """
+    __tablename__ = "task_counters"
+    __table_args__ = (
+        Index("ix_task_counters_account_status", "account_id", "status"),
+    )
+
+    # 0 stands for NULL user/account (primary key columns cannot be NULL)
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    account_id = Column(Integer, primary_key=True, autoincrement=False)
+    task_type = Column(String(50), primary_key=True)
+    status = Column(String(20), primary_key=True)
+    bucket_hour = Column(DateTime, primary_key=True)  # Jakarta wall clock, truncated to the hour
+
+    task_count = Column(Integer, nullable=False, default=0)
+
+
+def bucket_hour(created_at: Optional[datetime]) -> datetime:
+    if created_at is None:
+        created_at = now_jakarta()
+    if created_at.tzinfo is not None:
+        created_at = to_jakarta(created_at).replace(tzinfo=None)
+    return created_at.replace(minute=0, second=0, microsecond=0)
+
+
+def counter_key(user_id, account_id, task_type, status, created_at) -> CounterKey:
+    return (user_id or 0, account_id or 0, task_type, status or "pending", bucket_hour(created_at))
+
+
+def counter_upsert(deltas: Dict[CounterKey, int]):
+    """INSERT ... ON DUPLICATE KEY UPDATE adding each delta to its counter, or None if nothing changed."""
+    rows = [
+        {
+            "user_id": key[0],
+            "account_id": key[1],
+            "task_type": key[2],
+            "status": key[3],
+            "bucket_hour": key[4],
+            "task_count": delta,
+        }
+        for key, delta in deltas.items() if delta
+    ]
+    if not rows:
+        return None
+    stmt = mysql_insert(TaskCounter).values(rows)
+    return stmt.on_duplicate_key_update(task_count=TaskCounter.task_count + stmt.inserted.task_count)
+
+
+_KEY_ATTRS = ("user_id", "account_id", "task_type", "status")
+
+
+def _task_key(task: Task, before: bool) -> CounterKey:
+    state = inspect(task)
+    values = []
+    for attr in _KEY_ATTRS:
+        history = state.attrs[attr].history
+        if before and history.deleted:
+            values.append(history.deleted[0])
+        else:
+            values.append(state.dict.get(attr))
+    return counter_key(*values, state.dict.get("created_at"))
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_new_tasks(session, flush_context, instances):
+    # Set created_at client side so the counter bucket matches the stored row
+    for obj in session.new:
+        if isinstance(obj, Task) and obj.created_at is None:
+            obj.created_at = now_jakarta()
+
+
+@event.listens_for(Session, "after_flush")
+def _count_task_changes(session, flush_context):
+    deltas: Dict[CounterKey, int] = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, Task):
+            deltas[_task_key(obj, before=False)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Task):
+            deltas[_task_key(obj, before=True)] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Task):
+            state = inspect(obj)
+            if any(state.attrs[attr].history.deleted for attr in _KEY_ATTRS):
+                deltas[_task_key(obj, before=True)] -= 1
+                deltas[_task_key(obj, before=False)] += 1
+
+    stmt = counter_upsert(deltas)
+    if stmt is not None:
+        session.connection().execute(stmt)
@@ -1,4 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, status, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from redis.exceptions import RedisError
 from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
@@ -7,17 +10,27 @@ import random
 import uuid
 import asyncio
 import time
+import json
+import os
+import tempfile
 
 from app.db.session import get_db, AsyncSessionLocal
 from app.models.account import Account, Fingerprint
 from app.models.task import Task
 from app.models.user import User
-from app.schemas.account import AccountCreate, AccountResponse, BulkDisconnectRequest, BulkAccountCreate, BulkImportStatus
+from app.schemas.account import AccountCreate, AccountResponse, BulkDisconnectRequest, BulkAccountCreate, BulkAccountItem, BulkImportStatus
 from app.schemas.user import UserResponse, Token, UserCreate, UserUpdate
 from app.services.fingerprint_service import FingerprintService
 from app.services.instagram_service import InstagramService
+from app.services.task_counters import count_bulk_change
+from app.services.batch_progress import (
+    count_batch_tasks, unfinished_per_batch, remove_from_batches, notify_batches_completed, UNFINISHED_STATUSES
+)
+from app.services import bulk_jobs
+from app.services.account_import import existing_usernames, insert_accounts, iter_import_batches, parse_import_row, IMPORT_FORMATS
+from app.services.entitlements import invalidate_entitlements
 from app.core.security import verify_password, create_access_token, get_password_hash
-from app.routers.deps import get_current_user, check_role
+from app.routers.deps import get_current_user, get_stream_user, stream_access_valid, check_role
 from instagrapi.exceptions import ChallengeRequired, TwoFactorRequired
 from fastapi.security import OAuth2PasswordRequestForm
 from app.middleware.auth_check import require_active_subscription
@@ -29,9 +42,10 @@ import string
 import secrets
 from datetime import timedelta
 from app.core.config import settings
+from app.core.logging_config import bind_correlation_id
+import logging
 
-# In-memory storage for bulk import jobs (for progress tracking)
-bulk_import_jobs: Dict[str, Dict[str, Any]] = {}
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -57,6 +71,7 @@ async def login_for_access_token(
     user.last_jti = payload.get("jti")
     db.add(user)
     await db.commit()
+    await invalidate_entitlements(user.username)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -142,6 +157,7 @@ async def login_google(
         user.last_jti = payload.get("jti")
         db.add(user)
         await db.commit()
+        await invalidate_entitlements(user.username)
         
         return {"access_token": access_token, "token_type": "bearer"}
 
@@ -172,6 +188,7 @@ async def update_user_me(
     
     db.add(current_user)
     await db.commit()
+    await invalidate_entitlements(current_user.username)
     await db.refresh(current_user)
     return current_user
 
@@ -273,6 +290,7 @@ async def sync_login(
     user.last_jti = payload.get("jti")
     db.add(user)
     await db.commit()
+    await invalidate_entitlements(user.username)
     
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -327,6 +345,7 @@ async def toggle_user_status(
     user.is_active = not user.is_active
     db.add(user)
     await db.commit()
+    await invalidate_entitlements(user.username)
     await db.refresh(user)
     return user
 
@@ -427,6 +446,26 @@ async def list_accounts(
     result = await db.execute(stmt)
     return result.scalars().all()
 
+def _bulk_account_row(item: BulkAccountItem, proxy_pool: Optional[List[str]], common_proxy: Optional[str]) -> dict:
+    """Account column values for one bulk import item."""
+    # Determine proxy (individual -> pool/random -> common)
+    proxy = item.proxy
+    if not proxy or not proxy.strip():
+        if proxy_pool:
+            proxy = random.choice(proxy_pool)
+        else:
+            proxy = common_proxy
+    return {
+        "username": item.username,
+        "password_encrypted": item.password,
+        "seed_2fa": item.seed_2fa,
+        "proxy": proxy,
+        "cookies": item.cookies,
+        "login_method": item.login_method,
+        "status": "active" if item.login_method == 3 else "pending", # Cookies are assumed active
+    }
+
+
 @router.post("/bulk")
 @require_active_subscription
 async def bulk_create_accounts(
@@ -445,34 +484,34 @@ async def bulk_create_accounts(
     error_count = 0
     account_ids = []
     
-    # Initialize job tracking
-    bulk_import_jobs[job_id] = {
-        "user_id": current_user.id,
-        "status": "creating",
-        "total": len(bulk_data.accounts),
-        "created": 0,
-        "failed": 0,
-        "pending_login": 0,
-        "logged_in": 0,
-        "login_failed": 0,
-        "results": [],
-        "staggered_login": bulk_data.staggered_login,
-        "min_delay": bulk_data.min_delay,
-        "max_delay": bulk_data.max_delay,
-        "batch_size": bulk_data.batch_size
-    }
+    # Initialize job tracking (shared by all API workers through Redis)
+    try:
+        await bulk_jobs.create_job(
+            job_id,
+            current_user.id,
+            len(bulk_data.accounts),
+            staggered_login=bulk_data.staggered_login,
+            min_delay=bulk_data.min_delay,
+            max_delay=bulk_data.max_delay,
+            batch_size=bulk_data.batch_size
+        )
+    except RedisError as e:
+        logger.error("Bulk job store unavailable: %s", e)
+        raise HTTPException(status_code=503, detail="Bulk import progress tracking is unavailable, try again later")
     
     # Validation: Proxy is now optional. If none provided, server IP will be used.
     
     # 10 Proxy Minimum Validation - REMOVED or RELAXED
     # We'll allow any number of proxies in the pool.
 
-    for item in bulk_data.accounts:
-        try:
-            # Check if username already exists
-            stmt = select(Account).where(Account.username == item.username)
-            result = await db.execute(stmt)
-            if result.scalars().first():
+    # One IN query for all usernames, then multi-row inserts (app.services.account_import)
+    try:
+        taken = await existing_usernames(db, (item.username for item in bulk_data.accounts))
+        rows = []
+        pending = []  # (results index, username) of rows to insert
+        for item in bulk_data.accounts:
+            key = item.username.lower()
+            if key in taken:
                 results.append({
                     "username": item.username,
                     "success": False,
@@ -481,78 +520,57 @@ async def bulk_create_accounts(
                 })
                 error_count += 1
                 continue
-            
-            # Generate fingerprint
-            fp_service = FingerprintService(db)
-            fp = await fp_service.create_fingerprint(user_id=current_user.id)
-            
-            # Determine proxy (individual -> pool/random -> common)
-            proxy = item.proxy
-            if not proxy or not proxy.strip():
-                if bulk_data.proxy_pool:
-                    proxy = random.choice(bulk_data.proxy_pool)
-                else:
-                    proxy = bulk_data.common_proxy
-            
-            # Create account
-            new_account = Account(
-                username=item.username,
-                password_encrypted=item.password,
-                seed_2fa=item.seed_2fa,
-                proxy=proxy,
-                cookies=item.cookies,
-                login_method=item.login_method,
-                fingerprint_id=fp.id,
-                status="active" if item.login_method == 3 else "pending", # Cookies are assumed active
-                user_id=current_user.id
-            )
-            
-            db.add(new_account)
-            await db.flush()  # Get the ID
-            
-            account_ids.append(new_account.id)
-            
-            results.append({
-                "username": item.username,
+            taken.add(key)  # Later duplicates in the same request are skipped too
+            rows.append(_bulk_account_row(item, bulk_data.proxy_pool, bulk_data.common_proxy))
+            pending.append((len(results), item.username))
+            results.append(None)
+        
+        created = await insert_accounts(db, current_user.id, rows)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.exception("Bulk account creation failed for job %s", job_id)
+        await _update_bulk_job(bulk_jobs.set_status(job_id, "failed"))
+        raise HTTPException(status_code=500, detail=f"Bulk account creation failed: {e}")
+    
+    for index, username in pending:
+        account_id = created.get(username)
+        if account_id:
+            account_ids.append(account_id)
+            results[index] = {
+                "username": username,
                 "success": True,
-                "account_id": new_account.id,
+                "account_id": account_id,
                 "login_status": "pending"
-            })
+            }
             created_count += 1
-            
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            results.append({
-                "username": item.username,
+        else:
+            # Created by a concurrent import in the meantime
+            results[index] = {
+                "username": username,
                 "success": False,
-                "error": str(e),
+                "error": "Sudah ada di database (Skip)",
                 "login_status": "skipped"
-            })
+            }
             error_count += 1
     
-    await db.commit()
-    
     # Update job status
-    bulk_import_jobs[job_id]["created"] = created_count
-    bulk_import_jobs[job_id]["failed"] = error_count
-    bulk_import_jobs[job_id]["pending_login"] = len(account_ids)
-    bulk_import_jobs[job_id]["results"] = results
+    await _update_bulk_job(
+        bulk_jobs.add_results(job_id, results, created_count, error_count, "logging_in" if account_ids else "completed")
+    )
     
     # Start staggered login in background if enabled
     if account_ids:
-        bulk_import_jobs[job_id]["status"] = "logging_in"
-        
         # Determine settings based on staggered flag
         if bulk_data.staggered_login:
             run_min_delay = bulk_data.min_delay
             run_max_delay = bulk_data.max_delay
             run_batch_size = bulk_data.batch_size
         else:
-            # Non-staggered: 0 delays, execute sequentially (for now) but with tracking
+            # Non-staggered: no delays, logins run concurrently (see perform_bulk_login_job)
             run_min_delay = 0
             run_max_delay = 0
-            run_batch_size = 100 # Larger batch size for faster processing
+            run_batch_size = len(account_ids)
             
         background_tasks.add_task(
             perform_bulk_login_job,
@@ -562,8 +580,6 @@ async def bulk_create_accounts(
             run_max_delay,
             run_batch_size
         )
-    else:
-        bulk_import_jobs[job_id]["status"] = "completed"
     
     return {
         "job_id": job_id,
@@ -576,17 +592,160 @@ async def bulk_create_accounts(
     }
 
 
-@router.get("/bulk/status/{job_id}")
-async def get_bulk_import_status(job_id: str):
+@router.post("/bulk/import-file")
+@require_active_subscription
+async def import_accounts_file(
+    file: UploadFile = File(...),
+    file_format: str = Form(""),  # "csv" or "ndjson"; detected from the file name when empty
+    common_proxy: str = Form(""),
+    proxy_pool: str = Form(""),  # One proxy per line (or comma separated)
+    staggered_login: str = Form("true"),
+    min_delay: int = Form(30),
+    max_delay: int = Form(120),
+    batch_size: int = Form(10),
+    current_user: User = Depends(get_current_user)
+):
     """
-    Get the status of a bulk import job.
+    Import accounts from a CSV (header: username,password,seed_2fa,proxy,login_method,cookies)
+    or NDJSON file. Rows are validated and inserted IMPORT_CHUNK_SIZE at a time, each chunk
+    committed on its own, and the response streams NDJSON as the import goes:
+    {"type": "error", "line", "username", "error"} per rejected row,
+    {"type": "progress", "processed", "created", "failed"} per chunk, and a final
+    {"type": "done", "job_id", ...}. Logins then run as a bulk job (see /bulk/stream/{job_id}).
     """
-    if job_id not in bulk_import_jobs:
-        raise HTTPException(status_code=404, detail="Job not found")
+    fmt = (file_format or os.path.splitext(file.filename or "")[1].lstrip(".")).lower()
+    fmt = {"jsonl": "ndjson", "json": "ndjson"}.get(fmt, fmt)
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported file format, use .csv or .ndjson")
+    
+    pool = [p.strip() for p in proxy_pool.replace(",", "\n").splitlines() if p.strip()]
+    staggered = staggered_login.lower() == "true"
+    job_id = str(uuid.uuid4())
+    try:
+        await bulk_jobs.create_job(
+            job_id,
+            current_user.id,
+            0,
+            staggered_login=staggered,
+            min_delay=min_delay,
+            max_delay=max_delay,
+            batch_size=batch_size
+        )
+    except RedisError as e:
+        logger.error("Bulk job store unavailable: %s", e)
+        raise HTTPException(status_code=503, detail="Bulk import progress tracking is unavailable, try again later")
+    
+    # Take ownership of the spooled upload: the request may close its files once this
+    # handler returns, before the streamed body below has read them
+    upload = file.file
+    file.file = tempfile.SpooledTemporaryFile()
+    account_ids: List[int] = []
     
-    job = bulk_import_jobs[job_id]
+    async def import_rows():
+        processed = created_total = failed_total = 0
+        taken_in_file = set()
+        try:
+            async for batch in iter_import_batches(upload, fmt):
+                results = []
+                rows = []
+                pending = []  # (results index, username)
+                items = []
+                for line_no, raw in batch:
+                    try:
+                        items.append((line_no, parse_import_row(raw)))
+                    except ValueError as e:
+                        username = raw.get("username") if isinstance(raw, dict) else None
+                        results.append({"username": username, "success": False, "error": str(e), "login_status": "skipped"})
+                        yield json.dumps({"type": "error", "line": line_no, "username": username, "error": str(e)}) + "\n"
+                
+                async with AsyncSessionLocal() as session:
+                    taken = await existing_usernames(session, (item.username for _, item in items))
+                    for line_no, item in items:
+                        key = item.username.lower()
+                        if key in taken or key in taken_in_file:
+                            error = "Sudah ada di database (Skip)"
+                            results.append({"username": item.username, "success": False, "error": error, "login_status": "skipped"})
+                            yield json.dumps({"type": "error", "line": line_no, "username": item.username, "error": error}) + "\n"
+                            continue
+                        taken_in_file.add(key)
+                        rows.append(_bulk_account_row(item, pool, common_proxy or None))
+                        pending.append((len(results), item.username, line_no))
+                        results.append(None)
+                    
+                    created = await insert_accounts(session, current_user.id, rows)
+                    await session.commit()
+                
+                chunk_created = 0
+                for index, username, line_no in pending:
+                    account_id = created.get(username)
+                    if account_id:
+                        account_ids.append(account_id)
+                        results[index] = {"username": username, "success": True, "account_id": account_id, "login_status": "pending"}
+                        chunk_created += 1
+                    else:
+                        error = "Sudah ada di database (Skip)"
+                        results[index] = {"username": username, "success": False, "error": error, "login_status": "skipped"}
+                        yield json.dumps({"type": "error", "line": line_no, "username": username, "error": error}) + "\n"
+                
+                await _update_bulk_job(bulk_jobs.append_results(job_id, processed, results, chunk_created, len(results) - chunk_created))
+                processed += len(results)
+                created_total += chunk_created
+                failed_total += len(results) - chunk_created
+                yield json.dumps({"type": "progress", "processed": processed, "created": created_total, "failed": failed_total}) + "\n"
+        except Exception as e:
+            logger.exception("Account file import failed for job %s", job_id)
+            yield json.dumps({"type": "error", "line": None, "username": None, "error": f"Import aborted: {e}"}) + "\n"
+        finally:
+            upload.close()
+        
+        await _update_bulk_job(bulk_jobs.set_status(job_id, "logging_in" if account_ids else "completed"))
+        yield json.dumps({
+            "type": "done",
+            "job_id": job_id,
+            "processed": processed,
+            "created": created_total,
+            "failed": failed_total,
+            "pending_login": len(account_ids),
+            "staggered": staggered
+        }) + "\n"
+    
+    async def start_logins():
+        if account_ids:
+            if staggered:
+                await perform_bulk_login_job(job_id, account_ids, min_delay, max_delay, batch_size)
+            else:
+                await perform_bulk_login_job(job_id, account_ids, 0, 0, len(account_ids))
+    
+    return StreamingResponse(
+        import_rows(),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"},
+        background=BackgroundTask(start_logins)
+    )
+
+
+async def _update_bulk_job(update):
+    """Progress tracking is best effort once accounts are being created/logged in."""
+    try:
+        await update
+    except RedisError as e:
+        logger.warning("Bulk job progress update failed: %s", e)
+
+
+async def _get_owned_job(job_id: str, current_user: User, with_results: bool = True) -> dict:
+    try:
+        job = await bulk_jobs.get_job(job_id, with_results=with_results)
+    except RedisError as e:
+        logger.error("Bulk job store unavailable: %s", e)
+        raise HTTPException(status_code=503, detail="Bulk import progress tracking is unavailable")
+    if not job or (current_user.role != "admin" and job["user_id"] != current_user.id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _job_summary(job: dict) -> dict:
     return {
-        "job_id": job_id,
+        "job_id": job["job_id"],
         "status": job["status"],
         "total": job["total"],
         "created": job["created"],
@@ -594,29 +753,65 @@ async def get_bulk_import_status(job_id: str):
         "pending_login": job["pending_login"],
         "logged_in": job["logged_in"],
         "login_failed": job["login_failed"],
-        "results": job["results"]
     }
 
 
+@router.get("/bulk/status/{job_id}")
+async def get_bulk_import_status(job_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Get the status of a bulk import job.
+    """
+    job = await _get_owned_job(job_id, current_user)
+    return {**_job_summary(job), "results": job["results"]}
+
+
+@router.get("/bulk/stream/{job_id}")
+async def stream_bulk_import_status(job_id: str, current_user: User = Depends(get_stream_user)):
+    """
+    Server-Sent Events for a bulk import job: a "snapshot" event with the full status
+    (same shape as /bulk/status), then a "progress" event for every change, carrying the
+    counters and the updated account result. The stream ends when the job completes, or
+    on a heartbeat once the user's access is gone.
+    Authenticate with ?token= from POST /events/token since EventSource cannot send headers.
+    """
+    await _get_owned_job(job_id, current_user, with_results=False)
+
+    async def events():
+        try:
+            async for event in bulk_jobs.job_events(job_id):
+                if event is None:
+                    if not await stream_access_valid(current_user):
+                        yield "event: revoked\ndata: {}\n\n"
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if event["event"] == "snapshot":
+                    data = {**_job_summary(event["job"]), "results": event["job"]["results"]}
+                else:
+                    data = {**_job_summary(event["job"]), "result": event.get("result")}
+                yield f"event: {event['event']}\ndata: {json.dumps(data, default=str)}\n\n"
+        except RedisError as e:
+            logger.warning("Bulk job stream %s interrupted: %s", job_id, e)
+            yield "event: error\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/bulk/active")
 async def get_active_bulk_jobs(current_user: User = Depends(get_current_user)):
     """
     Get all active or recently completed bulk import jobs for the current user.
     """
-    user_jobs = []
-    for job_id, job in bulk_import_jobs.items():
-        if job.get("user_id") == current_user.id:
-            user_jobs.append({
-                "job_id": job_id,
-                "status": job["status"],
-                "total": job["total"],
-                "created": job["created"],
-                "failed": job["failed"],
-                "logged_in": job.get("logged_in", 0),
-                "login_failed": job.get("login_failed", 0),
-                "pending_login": job.get("pending_login", 0)
-            })
-    return user_jobs
+    try:
+        jobs = await bulk_jobs.list_user_jobs(current_user.id)
+    except RedisError as e:
+        logger.error("Bulk job store unavailable: %s", e)
+        raise HTTPException(status_code=503, detail="Bulk import progress tracking is unavailable")
+    return [_job_summary(job) for job in jobs]
 
 
 async def perform_bulk_login_job(
@@ -627,72 +822,52 @@ async def perform_bulk_login_job(
     batch_size: int
 ):
     """
-    Perform bulk login for multiple accounts.
-    Tracks progress in bulk_import_jobs.
-    If min_delay and max_delay are 0, runs without artificial delays.
+    Log in many accounts concurrently: at most BULK_LOGIN_CONCURRENCY logins overall
+    and BULK_LOGIN_PER_PROXY per proxy (accounts without a proxy share the server IP).
+    With delays (staggered login), each login gets a random start offset and every
+    batch_size accounts a longer pause, so logins never start in a burst.
+    Tracks progress in the Redis job store (app.services.bulk_jobs).
     """
-    print(f"Starting bulk login job {job_id}: {len(account_ids)} accounts. Delays: {min_delay}-{max_delay}s")
+    logger.info("Starting bulk login job %s: %d accounts, delays %s-%ss", job_id, len(account_ids), min_delay, max_delay)
     
-    # Process in batches
-    for batch_start in range(0, len(account_ids), batch_size):
-        batch = account_ids[batch_start:batch_start + batch_size]
-        
-        for i, account_id in enumerate(batch):
-            try:
-                # Apply delay only if requested
-                if max_delay > 0:
-                    # Generate unique random delay for this account
-                    delay = random.uniform(min_delay, max_delay)
-                    
-                    # Add additional randomness based on position
-                    position_jitter = random.uniform(0, 5) * (i + 1)
-                    total_delay = delay + position_jitter
-                    
-                    print(f"[Job {job_id}] Waiting {total_delay:.1f}s before login for account {account_id}")
-                    await asyncio.sleep(total_delay)
-                
-                # Perform login
-                await perform_login(account_id)
-                
-                # Update job status
-                if job_id in bulk_import_jobs:
-                    # Check account status to determine success
-                    async with AsyncSessionLocal() as session:
-                        stmt = select(Account).where(Account.id == account_id)
-                        result = await session.execute(stmt)
-                        account = result.scalars().first()
-                        
-                        if account and account.status == "active":
-                            bulk_import_jobs[job_id]["logged_in"] += 1
-                        else:
-                            bulk_import_jobs[job_id]["login_failed"] += 1
-                        
-                        bulk_import_jobs[job_id]["pending_login"] -= 1
-                        
-                        # Update results with status and progress
-                        for r in bulk_import_jobs[job_id]["results"]:
-                            if r.get("account_id") == account_id:
-                                r["login_status"] = account.status if account else "failed"
-                                if account and account.last_error:
-                                    r["error_reason"] = account.last_error
-                                break
-                
-            except Exception as e:
-                print(f"[Job {job_id}] Login failed for account {account_id}: {e}")
-                if job_id in bulk_import_jobs:
-                    bulk_import_jobs[job_id]["login_failed"] += 1
-                    bulk_import_jobs[job_id]["pending_login"] -= 1
-        
-        # Add delay between batches only if staggered
-        if max_delay > 0 and batch_start + batch_size < len(account_ids):
-            batch_delay = random.uniform(min_delay * 2, max_delay * 2)
-            print(f"[Job {job_id}] Batch complete, waiting {batch_delay:.1f}s before next batch")
-            await asyncio.sleep(batch_delay)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(Account.id, Account.proxy).where(Account.id.in_(account_ids)))
+        proxies = {row.id: (row.proxy or "").strip() for row in result}
+    
+    global_slots = asyncio.Semaphore(max(1, settings.BULK_LOGIN_CONCURRENCY))
+    proxy_slots: Dict[str, asyncio.Semaphore] = {}
+    
+    async def login_one(account_id: int, start_after: float):
+        if start_after > 0:
+            await asyncio.sleep(start_after)
+        proxy = proxies.get(account_id, "")
+        if proxy not in proxy_slots:
+            proxy_slots[proxy] = asyncio.Semaphore(max(1, settings.BULK_LOGIN_PER_PROXY))
+        try:
+            # Wait for the proxy first so accounts queued behind a busy proxy hold no global slot
+            async with proxy_slots[proxy], global_slots:
+                outcome = await perform_login(account_id)
+        except Exception as e:
+            logger.warning("[Job %s] Login failed for account %s: %s", job_id, account_id, e)
+            outcome = {"status": "failed", "error": str(e)}
+        await _update_bulk_job(bulk_jobs.record_login(job_id, account_id, outcome["status"], outcome["error"]))
+    
+    # Start offsets (all 0 without staggering)
+    offsets = []
+    offset = 0.0
+    for i, account_id in enumerate(account_ids):
+        if max_delay > 0:
+            position = i % max(1, batch_size)
+            if i and position == 0:
+                offset += random.uniform(min_delay * 2, max_delay * 2)
+            offset += random.uniform(min_delay, max_delay) + random.uniform(0, 5) * (position + 1)
+        offsets.append(offset)
+    
+    await asyncio.gather(*(login_one(account_id, start_after) for account_id, start_after in zip(account_ids, offsets)))
     
     # Mark job as completed
-    if job_id in bulk_import_jobs:
-        bulk_import_jobs[job_id]["status"] = "completed"
-        print(f"[Job {job_id}] Bulk login job completed")
+    await _update_bulk_job(bulk_jobs.set_status(job_id, "completed"))
+    logger.info("[Job %s] Bulk login job completed", job_id)
 
 
 @router.post("/{account_id}/login")
@@ -703,7 +878,7 @@ async def login_account(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    print(f"DEBUG: Endpoint hit for account {account_id}")
+    logger.debug("Login requested for account %s", account_id)
     # isolation
     stmt = select(Account).where(Account.id == account_id)
     if current_user.role != "admin":
@@ -745,7 +920,10 @@ async def delete_account(
         
         # Delete tasks for this account first to avoid foreign key constraint errors
         from sqlalchemy import delete
+        await count_bulk_change(db, Task.account_id == account_id)
+        unfinished = await count_batch_tasks(db, Task.account_id == account_id, Task.status.in_(UNFINISHED_STATUSES))
         await db.execute(delete(Task).where(Task.account_id == account_id))
+        completed_batches = await remove_from_batches(db, unfinished)
         
         # Delete the account
         await db.delete(account)
@@ -760,6 +938,7 @@ async def delete_account(
                 await db.delete(fp)
         
         await db.commit()
+        await notify_batches_completed(db, completed_batches)
         
         print(f"Account @{username} deleted successfully")
         return {"message": f"Account @{username} disconnected successfully"}
@@ -826,6 +1005,7 @@ async def bulk_disconnect_accounts(
 
         deleted_count = 0
         deleted_usernames = []
+        completed_batches = []
         
         for account_id in account_ids:
             # Re-fetch account to get data for response/logging
@@ -845,6 +1025,7 @@ async def bulk_disconnect_accounts(
             tasks = t_res.scalars().all()
             for t in tasks:
                  await db.delete(t)
+            completed_batches += await remove_from_batches(db, unfinished_per_batch(tasks))
             
             # Delete account
             await db.delete(account)
@@ -861,6 +1042,7 @@ async def bulk_disconnect_accounts(
             deleted_usernames.append(username)
 
         await db.commit()
+        await notify_batches_completed(db, completed_batches)
         
         return {
             "message": f"Successfully disconnected {deleted_count} accounts", 
@@ -1024,46 +1206,41 @@ async def check_account_session(
 
 
 
-async def perform_login(account_id: int):
-    with open("login_debug.log", "a") as f:
-        f.write(f"Starting login task for account_id {account_id}\n")
+async def perform_login(account_id: int) -> Dict[str, Any]:
+    """Log the account in and record the outcome. Returns {"status": ..., "error": ...}."""
+    with bind_correlation_id(f"login-{account_id}"):
+        return await _perform_login(account_id)
+
+
+async def _perform_login(account_id: int) -> Dict[str, Any]:
+    logger.info("Starting login task for account_id %s", account_id)
     
     async with AsyncSessionLocal() as session:
         stmt = select(Account).where(Account.id == account_id)
         result = await session.execute(stmt)
         account = result.scalars().first()
         if not account:
-            with open("login_debug.log", "a") as f:
-                f.write(f"Account {account_id} not found\n")
-            return
+            logger.warning("Account %s not found", account_id)
+            return {"status": "failed", "error": "Account not found"}
             
         stmt_fp = select(Fingerprint).where(Fingerprint.id == account.fingerprint_id)
         res_fp = await session.execute(stmt_fp)
         fp = res_fp.scalars().first()
         
         if not fp:
-            print(f"Fingerprint missing for account {account.username}")
-            with open("login_debug.log", "a") as f:
-                f.write(f"Fingerprint missing for {account.username}\n")
-            return
+            logger.error("Fingerprint missing for account %s", account.username)
+            return {"status": "failed", "error": "Fingerprint not found"}
+
+        # End the read transaction so the pooled connection is not held during the
+        # (slow) Instagram login; objects stay loaded (expire_on_commit=False)
+        await session.commit()
 
         service = InstagramService(account, fp)
         try:
-            # Note: This calls the synchronous instagrapi login. 
-            # In production, offload to thread/celery.
-            with open("login_debug.log", "a") as f:
-                f.write(f"Calling service.login() for {account.username}\n")
-                
-            # Capture print output from the service (jitter logs, retry logs, etc.)
-            import io
-            import contextlib
-            f_capture = io.StringIO()
-            with contextlib.redirect_stdout(f_capture):
-                updates = await run_in_threadpool(service.login) 
-            
-            # Log the captured output
-            with open("login_debug.log", "a") as f:
-                f.write(f_capture.getvalue())
+            # The synchronous instagrapi login runs in the threadpool; its logs carry
+            # this login's correlation id (the context is copied into the thread)
+            logger.info("Calling service.login() for %s", account.username)
+            updates = await run_in_threadpool(service.login) 
             
             # Apply updates
             if "status" in updates:
@@ -1076,18 +1253,14 @@ async def perform_login(account_id: int):
             # Clear error on success
             account.last_error = None
             
-            with open("login_debug.log", "a") as f:
-                f.write(f"Login completed for {account.username}, status: {account.status}\n")
+            logger.info("Login completed for %s, status: %s", account.username, account.status)
         
         except ChallengeRequired as e:
-            print(f"Checkpoint/Challenge required for {account.username}")
             account.status = "challenge"
             account.last_error = "Instagram checkpoint/challenge required. Please verify on your phone/email."
-            with open("login_debug.log", "a") as f:
-                f.write(f"Login CHALLENGE for {account.username}: {e}\n")
+            logger.warning("Login CHALLENGE for %s: %s", account.username, e)
                 
         except Exception as e:
-            print(f"Bg Login Error for {account.username}: {e}")
             account.status = "failed"
             
             # Save error message for UI display
@@ -1108,8 +1281,7 @@ async def perform_login(account_id: int):
                 error_msg = error_msg[:500] + "..."
                 
             account.last_error = error_msg
-            with open("login_debug.log", "a") as f:
-                f.write(f"Login FAILED for {account.username}: {e}\n")
+            logger.warning("Login FAILED for %s: %s", account.username, e)
         
         if account.status == "active":
              task_status = "completed"
@@ -1132,8 +1304,8 @@ async def perform_login(account_id: int):
         session.add(login_task)
 
         await session.commit()
-        with open("login_debug.log", "a") as f:
-            f.write(f"Session committed for {account.username}\n")
+        logger.debug("Session committed for %s", account.username)
+        return {"status": account.status, "error": account.last_error}
 """
 Cookie Import Endpoints
 
@@ -1182,16 +1354,13 @@ async def import_account_from_cookie(
         fp_service = FingerprintService(db)
         fp = await fp_service.create_fingerprint(user_id=current_user.id)
         
-        # Convert cookies dict to JSON string for storage
-        cookies_json = json.dumps(cookie_data.cookies)
-        
-        # Create account with cookie-based login
+        # Create account with cookie-based login (cookies is a JSON column: store the dict itself)
         new_account = Account(
             username=username,
             password_encrypted="",  # No password for cookie-based accounts
-            cookies=cookies_json,
+            cookies=cookie_data.cookies,
             proxy=cookie_data.proxy or "",
-            login_method="cookies",
+            login_method=3,  # Cookies
             fingerprint_id=fp.id,
             user_id=current_user.id,
             status="active",  # Assume active since cookies were exported from active session
@@ -1230,73 +1399,72 @@ async def batch_import_accounts_from_cookies(
     
     Accepts an array of cookie export data and imports all accounts at once.
     """
-    results = []
+    results: List[Optional[CookieImportResponse]] = []
     imported = 0
     skipped = 0
     failed = 0
     
+    taken = await existing_usernames(db, (c.account.username for c in batch_data.accounts))
+    rows = []
+    pending = []  # (results index, username) of rows to insert
     for cookie_data in batch_data.accounts:
-        try:
-            username = cookie_data.account.username
-            
-            # Check if account already exists
-            stmt = select(Account).where(Account.username == username)
-            result = await db.execute(stmt)
-            existing_account = result.scalars().first()
-            
-            if existing_account:
-                results.append(CookieImportResponse(
-                    success=False,
-                    username=username,
-                    message=f"Sudah terdaftar",
-                    skipped=True
-                ))
-                skipped += 1
-                continue
-            
-            # Generate fingerprint
-            fp_service = FingerprintService(db)
-            fp = await fp_service.create_fingerprint(user_id=current_user.id)
-            
-            # Convert cookies dict to JSON string
-            cookies_json = json.dumps(cookie_data.cookies)
-            
-            # Create account
-            new_account = Account(
-                username=username,
-                password_encrypted="",
-                cookies=cookies_json,
-                proxy=cookie_data.proxy or "",
-                login_method="cookies",
-                fingerprint_id=fp.id,
-                user_id=current_user.id,
-                status="active",
-                last_login=cookie_data.exported_at
-            )
-            
-            db.add(new_account)
-            await db.flush()  # Get ID without committing
-            
+        username = cookie_data.account.username
+        key = username.lower()
+        if key in taken:
             results.append(CookieImportResponse(
+                success=False,
+                username=username,
+                message=f"Sudah terdaftar",
+                skipped=True
+            ))
+            skipped += 1
+            continue
+        taken.add(key)
+        
+        rows.append({
+            "username": username,
+            "password_encrypted": "",
+            "cookies": cookie_data.cookies,
+            "proxy": cookie_data.proxy or "",
+            "login_method": 3,  # Cookies
+            "status": "active",
+            "last_login": cookie_data.exported_at
+        })
+        pending.append((len(results), username))
+        results.append(None)
+    
+    error = None
+    try:
+        created = await insert_accounts(db, current_user.id, rows)
+        # Commit all successful imports
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.exception("Batch cookie import failed")
+        created = {}
+        error = f"Import failed: {str(e)}"
+    
+    for index, username in pending:
+        account_id = created.get(username)
+        if account_id:
+            results[index] = CookieImportResponse(
                 success=True,
-                account_id=new_account.id,
+                account_id=account_id,
                 username=username,
                 message="Successfully imported"
-            ))
+            )
             imported += 1
-            
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            results.append(CookieImportResponse(
-                success=False,
-                username=cookie_data.account.username,
-                message=f"Import failed: {str(e)}"
-            ))
+        elif error:
+            results[index] = CookieImportResponse(success=False, username=username, message=error)
             failed += 1
-    
-    # Commit all successful imports
-    await db.commit()
+        else:
+            results[index] = CookieImportResponse(
+                success=False,
+                username=username,
+                message=f"Sudah terdaftar",
+                skipped=True
+            )
+            skipped += 1
     
     return BatchImportResponse(
         total=len(batch_data.accounts),
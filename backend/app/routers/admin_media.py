@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_db
+from app.models.user import User
+from app.routers.deps import check_role
+from app.services.media_gc import collect_media_garbage, media_usage
+
+router = APIRouter()
+
+@router.get("/media/usage")
+async def get_media_usage(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(check_role(["admin"]))
+):
+    """Disk usage of stored media: referenced, unreferenced (pending GC) and legacy files."""
+    return await media_usage(db)
+
+@router.post("/media/gc")
+async def run_media_gc(
+    include_legacy: bool = False,
+    current_user: User = Depends(check_role(["admin"]))
+):
+    """
+    Run media garbage collection now (normally runs every MEDIA_GC_INTERVAL seconds).
+    With include_legacy, unreferenced legacy uploads past the grace period are deleted too.
+    """
+    return await collect_media_garbage(include_legacy=include_legacy)
@@ -10,6 +10,7 @@ from app.db.session import get_db
 from app.models.user import User
 from app.models.subscription import SubscriptionAddon, ProxyAssignment
 from app.routers.deps import get_current_user
+from app.services.entitlements import invalidate_user_entitlements
 
 router = APIRouter()
 
@@ -171,6 +172,7 @@ async def assign_proxies(
     addon.fulfilled_at = datetime.utcnow()
     
     await db.commit()
+    await invalidate_user_entitlements(db, [addon.user_id])
     
     return {
         "status": "success",
@@ -8,12 +8,14 @@ from app.core.tz_utils import now_jakarta
 from app.db.session import get_db
 from app.models.account import Account
 from app.models.task import Task
+from app.models.task_counter import TaskCounter
 from app.models.proxy import ProxyTemplate
 
 from app.models.user import User
 from app.models.subscription import Subscription, SubscriptionPlan, SubscriptionAddon
 from app.middleware.auth_check import get_user_subscription
 from app.routers.deps import get_current_user
+from app.services.dashboard_cache import get_cached_stats, set_cached_stats
 
 router = APIRouter()
 
@@ -42,46 +44,50 @@ async def get_dashboard_stats(
         period_start = datetime.combine(today_jakarta - timedelta(days=6), datetime.min.time()).replace(tzinfo=now.tzinfo)
         period_end = now
     
+    cached = await get_cached_stats(current_user, period)
+    if cached is not None:
+        return cached
+    
     try:
-        # 1. Account Stats (unchanged - still shows overall stats)
-        # Total accounts
-        stmt_total_acc = select(func.count(Account.id))
-        if current_user.role != "admin":
-            stmt_total_acc = stmt_total_acc.where(Account.user_id == current_user.id)
-        total_accounts = (await db.execute(stmt_total_acc)).scalar_one()
-
-        # Active accounts (status='active')
-        stmt_active_acc = select(func.count(Account.id)).where(Account.status == 'active')
+        # 1. Account Stats (overall, one grouped query)
+        stmt_status_breakdown = select(Account.status, func.count(Account.id))
         if current_user.role != "admin":
-            stmt_active_acc = stmt_active_acc.where(Account.user_id == current_user.id)
-        active_accounts = (await db.execute(stmt_active_acc)).scalar_one()
-
+            stmt_status_breakdown = stmt_status_breakdown.where(Account.user_id == current_user.id)
+        stmt_status_breakdown = stmt_status_breakdown.group_by(Account.status)
+        status_rows = (await db.execute(stmt_status_breakdown)).all()
+        
+        # Account Status Breakdown, useful for Pie Chart
+        status_breakdown = { "active": 0, "offline": 0, "failed": 0, "challenge": 0, "banned": 0 }
+        for row in status_rows:
+            status_breakdown[row.status] = row[1]
+        total_accounts = sum(row[1] for row in status_rows)
+        active_accounts = status_breakdown["active"]
         # Issues/Bans (status in ['failed', 'challenge', 'banned'])
-        stmt_issues_acc = select(func.count(Account.id)).where(Account.status.in_(['failed', 'challenge', 'banned']))
-        if current_user.role != "admin":
-            stmt_issues_acc = stmt_issues_acc.where(Account.user_id == current_user.id)
-        issues_accounts = (await db.execute(stmt_issues_acc)).scalar_one()
+        issues_accounts = sum(status_breakdown[s] for s in ['failed', 'challenge', 'banned'])
 
-        # 2. Task Stats - now based on selected period
-        # Total tasks in period
-        stmt_tasks_period = select(func.count(Task.id)).where(
-            and_(Task.created_at >= period_start, Task.created_at <= period_end)
+        # 2. Task Stats - based on selected period
+        # Total tasks created in period (hourly counters; period_start is hour-aligned)
+        stmt_tasks_period = select(func.coalesce(func.sum(TaskCounter.task_count), 0)).where(
+            and_(TaskCounter.bucket_hour >= period_start, TaskCounter.bucket_hour <= period_end)
         )
         if current_user.role != "admin":
-            stmt_tasks_period = stmt_tasks_period.where(Task.user_id == current_user.id)
-        tasks_period = (await db.execute(stmt_tasks_period)).scalar_one()
+            stmt_tasks_period = stmt_tasks_period.where(TaskCounter.user_id == current_user.id)
+        tasks_period = int((await db.execute(stmt_tasks_period)).scalar_one())
 
-        # Completed tasks in period
-        stmt_completed_period = select(func.count(Task.id)).where(
+        # Executed tasks in period, counted by hour/day bucket, status and type in SQL
+        hourly = period in ["today", "yesterday"]
+        bucket = func.date_format(Task.executed_at, "%Y-%m-%d %H:00:00" if hourly else "%Y-%m-%d").label("bucket")
+        stmt_executed = select(bucket, Task.status, Task.task_type, func.count(Task.id).label("n")).where(
             and_(
-                Task.status == 'completed', 
                 Task.executed_at >= period_start,
-                Task.executed_at <= period_end
+                Task.executed_at <= period_end,
+                Task.executed_at.isnot(None)  # Only tasks that have been executed
             )
         )
         if current_user.role != "admin":
-            stmt_completed_period = stmt_completed_period.where(Task.user_id == current_user.id)
-        completed_period = (await db.execute(stmt_completed_period)).scalar_one()
+            stmt_executed = stmt_executed.where(Task.user_id == current_user.id)
+        stmt_executed = stmt_executed.group_by(bucket, Task.status, Task.task_type)
+        executed_rows = (await db.execute(stmt_executed)).all()
 
         # 3. Proxy Stats
         stmt_proxies = select(func.count(ProxyTemplate.id))
@@ -89,154 +95,63 @@ async def get_dashboard_stats(
             stmt_proxies = stmt_proxies.where(ProxyTemplate.user_id == current_user.id)
         total_proxies = (await db.execute(stmt_proxies)).scalar_one()
 
-        # 4. Task Trends - Based on selected period
-        # Fetch all tasks in the period window
-        stmt_trend = select(Task.executed_at, Task.status).where(
-            and_(
-                Task.executed_at >= period_start,
-                Task.executed_at <= period_end,
-                Task.executed_at.isnot(None)  # Only tasks that have been executed
-            )
-        )
-        if current_user.role != "admin":
-            stmt_trend = stmt_trend.where(Task.user_id == current_user.id)
-        trend_tasks_result = await db.execute(stmt_trend)
-        trend_tasks = trend_tasks_result.all()
-        
-        # Generate trends based on period type
-        trend_data = []
-        
-        if period in ["today", "yesterday"]:
-            # Hourly grouping for today/yesterday
-            hourly_trends = {}
-            
+        # 4. Task Trends and Activity Stats - Based on selected period
+        trends = {}
+        if hourly:
             # Initialize all hours in the period
             current_time = period_start
             while current_time <= period_end:
                 hour_key = current_time.strftime("%Y-%m-%d %H:00:00")
-                hourly_trends[hour_key] = {"completed": 0, "failed": 0, "total": 0, "time": current_time.strftime("%H:%M")}
+                trends[hour_key] = {"time": current_time.strftime("%H:%M"), "completed": 0, "failed": 0, "total": 0}
                 current_time += timedelta(hours=1)
-            
-            # Populate with actual data
-            for t_executed_at, t_status in trend_tasks:
-                if t_executed_at:
-                    hour_key = t_executed_at.replace(minute=0, second=0, microsecond=0).strftime("%Y-%m-%d %H:00:00")
-                    if hour_key in hourly_trends:
-                        hourly_trends[hour_key]["total"] += 1
-                        if t_status == 'completed':
-                            hourly_trends[hour_key]["completed"] += 1
-                        elif t_status == 'failed':
-                            hourly_trends[hour_key]["failed"] += 1
-            
-            # Convert to sorted list (chronological: oldest to newest)
-            for hour_key in sorted(hourly_trends.keys()):
-                trend_data.append({
-                    "time": hourly_trends[hour_key]["time"],
-                    "completed": hourly_trends[hour_key]["completed"],
-                    "failed": hourly_trends[hour_key]["failed"],
-                    "total": hourly_trends[hour_key]["total"]
-                })
-        
         else:  # 7days - Daily grouping
-            daily_trends = {}
-            
-            # Initialize all days in the period (last 7 days)
+            # Initialize all days in the period (last 7 days), oldest first
             for i in range(7):
-                day = today_jakarta - timedelta(days=6-i)  # Start from oldest
-                day_key = day.strftime("%Y-%m-%d")
-                daily_trends[day_key] = {
-                    "completed": 0, 
-                    "failed": 0, 
-                    "total": 0, 
-                    "time": day.strftime("%b %d")  # e.g., "Feb 05"
-                }
-            
-            # Populate with actual data
-            for t_executed_at, t_status in trend_tasks:
-                if t_executed_at:
-                    day_key = t_executed_at.date().strftime("%Y-%m-%d")
-                    if day_key in daily_trends:
-                        daily_trends[day_key]["total"] += 1
-                        if t_status == 'completed':
-                            daily_trends[day_key]["completed"] += 1
-                        elif t_status == 'failed':
-                            daily_trends[day_key]["failed"] += 1
-            
-            # Convert to sorted list (chronological: oldest to newest)
-            for day_key in sorted(daily_trends.keys()):
-                trend_data.append({
-                    "time": daily_trends[day_key]["time"],
-                    "completed": daily_trends[day_key]["completed"],
-                    "failed": daily_trends[day_key]["failed"],
-                    "total": daily_trends[day_key]["total"]
-                })
+                day = today_jakarta - timedelta(days=6-i)
+                trends[day.strftime("%Y-%m-%d")] = {"time": day.strftime("%b %d"), "completed": 0, "failed": 0, "total": 0}
+
+        # Recent Activity Stats (completed counts by type for selected period)
+        activity_stats = {
+            "like": 0, "follow": 0, "post": 0, "story": 0, "reels": 0, "view": 0
+        }
+        completed_period = 0
+        
+        for row in executed_rows:
+            if row.bucket in trends:
+                trends[row.bucket]["total"] += row.n
+                if row.status in ("completed", "failed"):
+                    trends[row.bucket][row.status] += row.n
+            if row.status == "completed":
+                completed_period += row.n
+                activity_stats[row.task_type] = activity_stats.get(row.task_type, 0) + row.n
+        
+        # Chronological: oldest to newest
+        trend_data = [trends[key] for key in sorted(trends.keys())]
 
         # 5. Active & Upcoming Tasks (pending or running)
-        stmt_active = select(Task).where(
+        stmt_active = select(
+            Task.id, Task.task_type, Task.status, Task.scheduled_at, Task.created_at, Account.username
+        ).outerjoin(Account, Task.account_id == Account.id).where(
             Task.status.in_(['pending', 'running'])
         )
         if current_user.role != "admin":
             stmt_active = stmt_active.where(Task.user_id == current_user.id)
             
         stmt_active = stmt_active.order_by(Task.scheduled_at.asc()).limit(10)
-        
-        active_tasks_result = await db.execute(stmt_active)
-        active_tasks = active_tasks_result.scalars().all()
+        active_tasks = (await db.execute(stmt_active)).all()
 
         schedules = []
         for t in active_tasks:
             schedules.append({
                 "id": t.id,
-                "username": t.account_username,
+                "username": t.username or "unknown",
                 "type": t.task_type,
                 "status": t.status,
                 "scheduled_at": t.scheduled_at.isoformat() if t.scheduled_at else None,
                 "time": t.created_at.isoformat() if t.created_at else None
             })
 
-        # 6. Account Status Breakdown
-        # Useful for Pie Chart
-        stmt_status_breakdown = select(Account.status, func.count(Account.id))
-        if current_user.role != "admin":
-            stmt_status_breakdown = stmt_status_breakdown.where(Account.user_id == current_user.id)
-        
-        stmt_status_breakdown = stmt_status_breakdown.group_by(Account.status)
-        status_result = await db.execute(stmt_status_breakdown)
-        status_rows = status_result.all()
-        status_breakdown = { "active": 0, "offline": 0, "failed": 0, "challenge": 0, "banned": 0 }
-        for row in status_rows:
-            if row.status in status_breakdown:
-                status_breakdown[row.status] = row[1]
-            else:
-                status_breakdown[row.status] = row[1]
-
-
-        # 7. Recent Activity Stats (Counts by Type for selected period)
-        stmt_performance = select(Task).where(
-            and_(
-                Task.status == 'completed', 
-                Task.executed_at >= period_start,
-                Task.executed_at <= period_end
-            )
-        )
-        if current_user.role != "admin":
-            stmt_performance = stmt_performance.where(Task.user_id == current_user.id)
-        
-        perf_result = await db.execute(stmt_performance)
-        perf_tasks = perf_result.scalars().all()
-        
-        # Count by task type
-        activity_stats = {
-            "like": 0, "follow": 0, "post": 0, "story": 0, "reels": 0, "view": 0
-        }
-        
-        for t in perf_tasks:
-            t_type = t.task_type
-            if t_type not in activity_stats:
-                activity_stats[t_type] = 0
-            activity_stats[t_type] += 1
-
-        # 8. Subscription & Quota Info
+        # 6. Subscription & Quota Info
         sub = await get_user_subscription(current_user, db)
         
         # Calculate limits
@@ -301,16 +216,15 @@ async def get_dashboard_stats(
                     }
         # ---------------------------
 
-        # 9. Admin Specific Stats
+        # 7. Admin Specific Stats
         admin_stats = {}
         if current_user.role == "admin":
             # Total Operators
             stmt_ops = select(func.count(User.id)).where(User.role == "operator")
             total_operators = (await db.execute(stmt_ops)).scalar_one()
             
-            # Total System IG Accounts
-            stmt_sys_ig = select(func.count(Account.id))
-            total_sys_ig = (await db.execute(stmt_sys_ig)).scalar_one()
+            # Total System IG Accounts (admins already see every account)
+            total_sys_ig = total_accounts
             
             # Monthly Revenue (Estimasi)
             # Sum of plan prices for active subscriptions
@@ -358,6 +272,7 @@ async def get_dashboard_stats(
             "admin_stats": admin_stats
         }
         
+        await set_cached_stats(current_user, period, stats_response)
         return stats_response
         
     except Exception as e:
@@ -1,14 +1,14 @@
 from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
-from app.db.session import get_db
-from app.core.security import ALGORITHM, SECRET_KEY
+from app.db.session import get_db, AsyncSessionLocal
+from app.core.security import ALGORITHM, SECRET_KEY, STREAM_SCOPE
 from app.models.user import User
 from app.schemas.user import TokenData
+from app.services.entitlements import get_entitlements, user_from_entitlements
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/accounts/auth/login")
 
@@ -16,6 +16,32 @@ async def get_current_user(
     db: AsyncSession = Depends(get_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
+    return await authenticate_token(db, token)
+
+async def get_stream_user(token: Optional[str] = Query(None)) -> User:
+    """
+    Auth for Server-Sent Events: EventSource cannot send headers, so a stream token
+    (POST /events/token, valid for seconds) comes as ?token=; access tokens are refused.
+    Uses a short-lived session so a long stream does not pin a DB connection.
+    """
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    async with AsyncSessionLocal() as db:
+        return await authenticate_token(db, token, scope=STREAM_SCOPE)
+
+async def stream_access_valid(user: User) -> bool:
+    """Re-check a streaming user: still present and active, same role and (non-admins) same session."""
+    async with AsyncSessionLocal() as db:
+        ent = await get_entitlements(db, user.username)
+    if ent is None or not ent.user.get("is_active") or ent.user.get("role") != user.role:
+        return False
+    return user.role == "admin" or ent.user.get("last_jti") == user.last_jti
+
+async def authenticate_token(db: AsyncSession, token: str, scope: Optional[str] = None) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -24,17 +50,19 @@ async def get_current_user(
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        # Stream tokens open the event stream only, and access tokens never do
+        if username is None or payload.get("scope") != scope:
             raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
     
-    result = await db.execute(select(User).where(User.username == token_data.username))
-    user = result.scalars().first()
+    # One cache lookup on a hit; the snapshot also answers the subscription guards
+    ent = await get_entitlements(db, token_data.username)
     
-    if user is None:
+    if ent is None:
         raise credentials_exception
+    user = user_from_entitlements(ent)
         
     # Single Session Enforcement
     if user.role != "admin":
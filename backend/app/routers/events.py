@@ -0,0 +1,66 @@
+import json
+import logging
+import time
+from contextlib import aclosing
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from redis.exceptions import RedisError
+
+from app.core.security import STREAM_TOKEN_EXPIRE_SECONDS, create_stream_token
+from app.models.user import User
+from app.routers.deps import get_current_user, get_stream_user, stream_access_valid
+from app.services.events import user_events
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+# Seconds between re-checks of an open stream's user (ban, logout elsewhere, role change)
+ACCESS_CHECK_INTERVAL = 15.0
+
+@router.post("/token")
+async def create_events_token(current_user: User = Depends(get_current_user)):
+    """Short-lived token for GET /stream, so the access token never goes in a URL."""
+    return {
+        "token": create_stream_token(current_user.username, current_user.last_jti),
+        "expires_in": STREAM_TOKEN_EXPIRE_SECONDS,
+    }
+
+@router.get("/stream")
+async def stream_events(current_user: User = Depends(get_stream_user)):
+    """
+    Server-Sent Events with the user's task, batch and bulk import changes (every
+    user's for admins): task_status, tasks_changed, batch_completed and bulk_job.
+    Events are hints to re-fetch; a "ready" event is sent once subscribed.
+    Authenticate with ?token= from POST /token since EventSource cannot send headers.
+    Access is re-checked about every ACCESS_CHECK_INTERVAL seconds; once it is gone a
+    "revoked" event is sent and the stream ends.
+    """
+    user_id = current_user.id
+    is_admin = current_user.role == "admin"
+
+    async def events():
+        checked_at = time.monotonic()
+        try:
+            async with aclosing(user_events(user_id, is_admin)) as stream:
+                async for event in stream:
+                    if time.monotonic() - checked_at >= ACCESS_CHECK_INTERVAL:
+                        checked_at = time.monotonic()
+                        if not await stream_access_valid(current_user):
+                            logger.info("Closing event stream for user %s: access revoked", user_id)
+                            yield "event: revoked\ndata: {}\n\n"
+                            return
+                    if event is None:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+        except RedisError as e:
+            logger.warning("Event stream for user %s interrupted: %s", user_id, e)
+            yield "event: error\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
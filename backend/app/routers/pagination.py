@@ -0,0 +1,77 @@
+"""
+Keyset (cursor) pagination for listings ordered by (sort column, id).
+
+A page is fetched with `WHERE (sort, id) > cursor ORDER BY sort, id LIMIT n + 1`,
+so deep pages cost the same as the first one. The cursor of the next page is
+returned in the X-Next-Cursor header (absent on the last page); listings that can
+count cheaply also set X-Total-Count. Cursors are opaque to clients, and there is no
+OFFSET: a `skip` query parameter is refused rather than silently ignored.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = {"dt": sort_value.isoformat()}
+    raw = json.dumps([sort_value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value["dt"])
+        return sort_value, int(row_id)
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def reject_offset(request: Request):
+    """Dependency for keyset listings: clients still sending the old OFFSET get an error."""
+    if "skip" in request.query_params:
+        raise HTTPException(status_code=400, detail="skip is not supported; pass the X-Next-Cursor header as cursor")
+
+
+async def keyset_page(
+    db,
+    stmt,
+    sort_column,
+    id_column,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    descending: bool = False,
+):
+    """
+    Run `stmt` (a select whose rows expose the sort and id columns by name) for one
+    page after `cursor`, and set X-Next-Cursor when more rows follow.
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        # Expanded form of (sort, id) > (v, id), which MySQL turns into index ranges
+        if descending:
+            stmt = stmt.where(or_(sort_column < sort_value, and_(sort_column == sort_value, id_column < row_id)))
+        else:
+            stmt = stmt.where(or_(sort_column > sort_value, and_(sort_column == sort_value, id_column > row_id)))
+    if descending:
+        stmt = stmt.order_by(sort_column.desc(), id_column.desc())
+    else:
+        stmt = stmt.order_by(sort_column.asc(), id_column.asc())
+
+    rows = (await db.execute(stmt.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return rows
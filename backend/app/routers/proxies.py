@@ -1,9 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_
+from sqlalchemy import select, or_, func
 from typing import List
-import httpx
-import time
 import logging
 
 from app.db.session import get_db
@@ -15,6 +13,8 @@ from app.schemas.proxy import (
     ProxyBatchImportRequest, ProxyAssignmentResponse
 )
 from app.models.subscription import ProxyAssignment
+from app.services.proxy_health import probe_proxy, assignment_url, health_summary, run_proxy_health_checks
+from app.services.proxy_distribution import plan_distribution, apply_proxy_updates, is_active
 import random
 from app.routers.deps import get_current_user, check_role
 from app.models.user import User
@@ -28,34 +28,57 @@ async def check_proxy_connection(
     request: ProxyTestRequest,
     current_user: User = Depends(get_current_user)
 ):
-    """Test a proxy connection."""
-    start_time = time.time()
-    try:
-        # httpx >= 0.23.0 uses 'proxy' argument for single proxy or 'mounts'
-        # We pass the full proxy URL string directly
-        
-        async with httpx.AsyncClient(proxy=request.proxy_url, timeout=10.0) as client:
-            # We use a reliable geo-ip service to check connectivity and IP
-            response = await client.get("http://ip-api.com/json", follow_redirects=True)
-            response.raise_for_status()
-            data = response.json()
-            
-            latency = (time.time() - start_time) * 1000
-            
-            return ProxyTestResponse(
-                success=True,
-                message="Connection successful",
-                latency_ms=round(latency, 2),
-                ip=data.get("query"),
-                country=data.get("country")
-            )
-            
-    except Exception as e:
-        logger.error(f"Proxy test failed: {str(e)}")
+    """Test a proxy connection (against PROXY_PROBE_URL, like the background prober)."""
+    result = await probe_proxy(request.proxy_url)
+    if not result.success:
+        logger.error(f"Proxy test failed: {result.error}")
         return ProxyTestResponse(
             success=False,
-            message=f"Connection failed: {str(e)}"
+            message=f"Connection failed: {result.error}"
         )
+    return ProxyTestResponse(
+        success=True,
+        message="Connection successful",
+        latency_ms=result.latency_ms,
+        ip=result.exit_ip,
+        country=result.country
+    )
+
+
+@router.get("/health/summary")
+async def get_proxy_health_summary(
+    hours: int = Query(24, ge=1, le=24 * 30),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Health of the user's proxy templates and assigned proxies (all of them for admins)
+    from the background probes: status (healthy / slow / dead / unknown), success rate,
+    latency and the latest exit IP over the last `hours`.
+    """
+    stmt_templates = select(ProxyTemplate.id, ProxyTemplate.name, ProxyTemplate.proxy_url)
+    stmt_assignments = select(ProxyAssignment)
+    if current_user.role != "admin":
+        stmt_templates = stmt_templates.where(ProxyTemplate.user_id == current_user.id)
+        stmt_assignments = stmt_assignments.where(ProxyAssignment.user_id == current_user.id)
+    
+    proxies = [
+        {"source": "template", "id": row.id, "name": row.name, "proxy_url": row.proxy_url}
+        for row in (await db.execute(stmt_templates)).all()
+    ]
+    proxies += [
+        {"source": "assignment", "id": a.id, "name": f"{a.proxy_ip}:{a.proxy_port}", "proxy_url": assignment_url(a)}
+        for a in (await db.execute(stmt_assignments)).scalars().all()
+    ]
+    return await health_summary(db, proxies, hours)
+
+
+@router.post("/health/run")
+async def run_proxy_health_probe(
+    current_user: User = Depends(check_role(["admin"]))
+):
+    """Probe all proxies now (normally runs every PROXY_PROBE_INTERVAL seconds)."""
+    return await run_proxy_health_checks()
 
 
 @router.post("/", response_model=ProxyTemplateResponse)
@@ -306,154 +329,93 @@ async def distribute_proxies(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Randomly distribute proxy templates to accounts."""
-    # 1. Get all active accounts
+    """
+    Distribute proxy templates to accounts, least-loaded proxy first, at most
+    max_accounts_per_proxy accounts per proxy URL. Active accounts are served first.
+    """
+    # 1. Candidate accounts (only the columns the plan needs)
     # Filter by existing proxy if overwrite is False
-    stmt_accounts = select(Account)
+    stmt_accounts = select(Account.id, Account.status, Account.proxy)
     if not request.overwrite_existing:
         stmt_accounts = stmt_accounts.where(or_(Account.proxy == None, Account.proxy == ""))
         
     if current_user.role != "admin":
         stmt_accounts = stmt_accounts.where(Account.user_id == current_user.id)
         
-    result_accounts = await db.execute(stmt_accounts)
-    accounts = result_accounts.scalars().all()
+    accounts = (await db.execute(stmt_accounts)).all()
     
     if not accounts:
         return {"message": "No accounts found to assign proxies to"}
         
-    # 2. Get all proxy templates
-    stmt_templates = select(ProxyTemplate)
+    # 2. Proxy URLs of the templates (templates sharing a URL are one resource)
+    stmt_templates = select(ProxyTemplate.proxy_url).distinct()
     if current_user.role != "admin":
         stmt_templates = stmt_templates.where(ProxyTemplate.user_id == current_user.id)
         
-    result_templates = await db.execute(stmt_templates)
-    templates = result_templates.scalars().all()
+    proxy_urls = [url for url in (await db.execute(stmt_templates)).scalars() if url]
     
-    if not templates:
+    if not proxy_urls:
         return {"message": "No proxy templates available"}
         
-    # 3. Get current usage counts for templates to respect limits
-    # We need to calculate usage from accounts *NOT* being updated in this batch
-    # This effectively "frees up" the slots held by the accounts we are about to re-assign
-    account_ids_to_update = [acc.id for acc in accounts]
-    
-    # Query accounts that have proxies AND are NOT in our update list
-    stmt_usage = select(Account.proxy).where(
-        Account.proxy != None,
-        Account.proxy != "",
-        Account.id.notin_(account_ids_to_update)
+    # 3. Current usage per proxy, excluding the candidates: the slots they hold are
+    # freed since they are about to be re-assigned
+    result_usage = await db.execute(
+        select(Account.proxy, func.count(Account.id))
+        .where(Account.proxy.in_(proxy_urls))
+        .group_by(Account.proxy)
     )
-    result_usage = await db.execute(stmt_usage)
-    static_usage_proxies = result_usage.scalars().all()
-    
-    # Map proxy_url -> count from static usage (accounts NOT being updated)
-    proxy_usage_count = {}
-    for p_url in static_usage_proxies:
-        proxy_usage_count[p_url] = proxy_usage_count.get(p_url, 0) + 1
+    proxy_usage_count = dict(result_usage.all())
+    for acc in accounts:
+        if acc.proxy in proxy_usage_count:
+            proxy_usage_count[acc.proxy] -= 1
         
-    # 4. Prepare available templates
-    # We want to distribute based on UNIQUE proxy URLs to ensure we respect the limit per proxy resource
-    # If multiple templates have the same URL, we just treat them as the same resource
-    
-    unique_templates_by_url = {}
-    for tmpl in templates:
-        if tmpl.proxy_url not in unique_templates_by_url:
-            unique_templates_by_url[tmpl.proxy_url] = tmpl
-            
-    # Filter those that have space
-    available_templates = []
-    
-    for p_url, tmpl in unique_templates_by_url.items():
-        current_count = proxy_usage_count.get(p_url, 0)
-        if current_count < request.max_accounts_per_proxy:
-             available_templates.append({
-                 "template": tmpl,
-                 "current_count": current_count # Track live count
-             })
-
-    # If no templates are available, we still proceed to Reclaim Logic
-    # provided there are active accounts that might need them.
-        
-    # 5. Distribute
-    # Prioritize 'active' accounts first, then others
-    # Use case-insensitive check and strip for safety
-    active_accounts = [acc for acc in accounts if (acc.status or "").lower().strip() == 'active']
-    other_accounts = [acc for acc in accounts if (acc.status or "").lower().strip() != 'active']
-    
-    # Shuffle both groups independently to maintain randomness within groups
+    # 4. Plan: active accounts first, random order within each group
+    active_accounts = [(acc.id, acc.status) for acc in accounts if is_active(acc.status)]
+    other_accounts = [(acc.id, acc.status) for acc in accounts if not is_active(acc.status)]
     random.shuffle(active_accounts)
     random.shuffle(other_accounts)
-    
-    # Combine completely - Active MUST come before others
     accounts_list = active_accounts + other_accounts
     
-    assigned_count = 0
+    plan = plan_distribution(accounts_list, proxy_urls, proxy_usage_count, request.max_accounts_per_proxy)
+    assigned_count = len(plan)
     
-    for account in accounts_list:
-        # If overwriting, reset proxy to ensure we don't keep old values if slots run out
-        if request.overwrite_existing:
-            account.proxy = None
-            
-        # Filter available templates again to ensure dynamic limit is respected
-        if not available_templates:
-            continue
-            
-        # Pick a random template
-        choice_idx = random.randint(0, len(available_templates) - 1)
-        choice = available_templates[choice_idx]
-        template = choice["template"]
-        
-        # Assign
-        account.proxy = template.proxy_url
-        assigned_count += 1
-        
-        # Increment usage
-        choice["current_count"] += 1
+    # When overwriting, candidates that got no slot lose their old proxy
+    final_proxy = {acc.id: plan.get(acc.id, None if request.overwrite_existing else acc.proxy) for acc in accounts}
         
-        # If limit reached, remove from pool
-        if choice["current_count"] >= request.max_accounts_per_proxy:
-            available_templates.pop(choice_idx)
-            
-    # NEW: Reclaim Logic
-    # If there are still active accounts without proxies, steal from non-active accounts
-    # This handles the case where Overwrite=False but active accounts are starving
-    # caused by 'challenge' or 'failed' accounts hogging slots.
-    
-    starving_active = [acc for acc in accounts 
-                      if (acc.status or "").lower().strip() == 'active' 
-                      and (acc.proxy is None or acc.proxy == "")]
-                      
+    # 5. Reclaim: active accounts still without a proxy take one from non-active
+    # accounts of the same user, so 'challenge' or 'failed' accounts cannot hog slots
+    starving_active = [account_id for account_id, _ in active_accounts if not final_proxy[account_id]]
+    
     if starving_active:
-        # Find victims: Non-active accounts that HAVE a proxy
-        # CRITICAL FIX: Must filter by current_user.id to prevent stealing from other users
-        stmt_victims = select(Account).where(
-            Account.proxy != None,
-            Account.proxy != "",
-            Account.status != 'active',
-            Account.user_id == current_user.id
+        # CRITICAL: only the current user's accounts, never another tenant's
+        result_victims = await db.execute(
+            select(Account.id, Account.status, Account.proxy).where(
+                Account.proxy != None,
+                Account.proxy != "",
+                Account.status != 'active',
+                Account.user_id == current_user.id
+            )
         )
-        result_victims = await db.execute(stmt_victims)
-        possible_victims = result_victims.scalars().all()
-        
-        # Filter strictly
-        victims = [v for v in possible_victims if (v.status or "").lower().strip() != 'active']
+        victims = {row.id: row.proxy for row in result_victims.all() if not is_active(row.status)}
+        # Candidates' planned proxies override what is stored
+        for acc in accounts:
+            if not is_active(acc.status) and (acc.id in victims or final_proxy[acc.id]):
+                victims[acc.id] = final_proxy[acc.id]
+        victims = [(victim_id, proxy) for victim_id, proxy in victims.items() if proxy]
         random.shuffle(victims)
         
-        reclaimed_count = 0
-        for starving_acc in starving_active:
-            if not victims:
-                break
-                
-            victim = victims.pop(0)
-            starving_acc.proxy = victim.proxy
-            victim.proxy = None
-            
-            reclaimed_count += 1
+        for starving_id, (victim_id, proxy) in zip(starving_active, victims):
+            final_proxy[starving_id] = proxy
+            final_proxy[victim_id] = None
             assigned_count += 1
-            
-        # Note: 'assigned_count' might now include re-assignments, which is fine for the message.
-            
+    
+    # 6. One set-based write for every account whose proxy actually changes
+    current_proxy = {acc.id: acc.proxy for acc in accounts}
+    changes = {
+        account_id: proxy for account_id, proxy in final_proxy.items()
+        if account_id not in current_proxy or proxy != current_proxy[account_id]
+    }
+    await apply_proxy_updates(db, changes)
     await db.commit()
     
     return {
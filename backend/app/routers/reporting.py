@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, desc
 from typing import List, Optional
@@ -9,8 +9,10 @@ from app.models.task_batch import TaskBatch
 from app.models.task import Task
 from app.schemas.task import TaskBatchResponse, TaskResponse, TaskBatchCreate
 from app.services.verification_service import VerificationService
+from app.services.task_queries import task_listing
 
 from app.routers.deps import get_current_user
+from app.routers.pagination import keyset_page, reject_offset, TOTAL_COUNT_HEADER
 from app.models.user import User
 
 router = APIRouter()
@@ -49,27 +51,32 @@ async def get_batch(
         raise HTTPException(status_code=404, detail="Batch not found or access denied")
     return batch
 
-@router.get("/batches/{batch_id}/tasks", response_model=List[TaskResponse])
+@router.get("/batches/{batch_id}/tasks", response_model=List[TaskResponse], dependencies=[Depends(reject_offset)])
 async def get_batch_tasks(
     batch_id: int, 
-    skip: int = 0, 
-    limit: int = 100, 
+    response: Response,
+    limit: int = Query(100, ge=1, le=500), 
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get tasks belonging to a specific batch."""
+    """Get tasks belonging to a specific batch by (scheduled_at, id), paged with X-Next-Cursor."""
     # Verify access to batch first
-    stmt_batch = select(TaskBatch).where(TaskBatch.id == batch_id)
+    stmt_batch = select(TaskBatch.id, TaskBatch.total_count).where(TaskBatch.id == batch_id)
     if current_user.role != "admin":
         stmt_batch = stmt_batch.where(TaskBatch.user_id == current_user.id)
     
-    res_batch = await db.execute(stmt_batch)
-    if not res_batch.scalars().first():
+    batch = (await db.execute(stmt_batch)).first()
+    if batch is None:
         raise HTTPException(status_code=404, detail="Batch not found or access denied")
 
-    stmt = select(Task).where(Task.batch_id == batch_id).offset(skip).limit(limit)
-    result = await db.execute(stmt)
-    return result.scalars().all()
+    rows = await keyset_page(
+        db, task_listing(Task.batch_id == batch_id), Task.scheduled_at, Task.id, response,
+        cursor=cursor, limit=limit
+    )
+    # Maintained server-side as tasks are added to / deleted from the batch
+    response.headers[TOTAL_COUNT_HEADER] = str(batch.total_count or 0)
+    return rows
 
 @router.post("/batches", response_model=TaskBatchResponse)
 async def create_batch(
@@ -77,11 +84,15 @@ async def create_batch(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Create a new task batch."""
+    """
+    Create a new task batch. total_count starts at 0 and grows as tasks are created
+    with this batch_id; the client's planned count is ignored, since tasks that fail
+    to be created would otherwise keep the batch from ever completing.
+    """
     batch = TaskBatch(
         task_type=batch_in.task_type,
         params=batch_in.params,
-        total_count=batch_in.total_count,
+        total_count=0,
         status="pending",
         user_id=current_user.id
     )
@@ -1,22 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, BackgroundTasks, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, insert
 from typing import List, Optional, Dict
-from datetime import datetime, timezone
-from app.core.tz_utils import now_jakarta
+from datetime import datetime, timezone, timedelta
+from collections import defaultdict
+import json
 import os
-import shutil
+import random
+from app.core.tz_utils import now_jakarta
 
 from app.db.session import get_db, AsyncSessionLocal
 from app.models.task import Task
+from app.models.task_counter import TaskCounter, counter_key
+from app.models.task_batch import TaskBatch
 from app.models.account import Account, Fingerprint
-from app.schemas.task import TaskResponse, TaskCreatePost, TaskCreateLike, TaskCreateFollow, TaskCreateView, TaskCreateStory, TaskCreateReels, TaskUpdate, TaskBulkDelete
+from app.schemas.task import TaskResponse, TaskCreatePost, TaskCreateLike, TaskCreateFollow, TaskCreateView, TaskCreateStory, TaskCreateReels, TaskUpdate, TaskBulkDelete, TaskCampaignResponse
 from app.services.instagram_service import InstagramService
 from instagrapi.exceptions import LoginRequired
 from app.routers.deps import get_current_user
+from app.routers.pagination import keyset_page, reject_offset, TOTAL_COUNT_HEADER
+from app.services.events import publish_event, publish_task_status
 from app.models.user import User
 from app.core.config import settings
-from app.middleware.auth_check import require_active_subscription, require_feature, has_feature
+from app.middleware.auth_check import require_active_subscription, require_feature, has_feature, is_subscription_active
+from app.services.task_counters import count_bulk_change, apply_counter_deltas, approximate_task_count
+from app.services.task_queries import HIDDEN_TASK_TYPES, task_listing
+from app.services.batch_progress import (
+    add_to_batch, finished_per_batch, unfinished_per_batch, remove_from_batches, reopen_batch_results,
+    notify_batches_completed,
+)
+from app.services.media_store import save_upload, register_media
+from app.services.media_preprocess import schedule_preprocess
 
 router = APIRouter()
 
@@ -27,16 +41,16 @@ async def get_task_stats_by_account(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ) -> Dict[int, Dict[str, int]]:
-    """Get task counts grouped by account_id and status."""
+    """Get task counts grouped by account_id and status (from the task_counters table)."""
     stmt = select(
-        Task.account_id,
-        Task.status,
-        func.count(Task.id).label('count')
-    )
+        TaskCounter.account_id,
+        TaskCounter.status,
+        func.sum(TaskCounter.task_count).label('count')
+    ).where(TaskCounter.account_id != 0)
     if current_user.role != "admin":
-        stmt = stmt.where(Task.user_id == current_user.id)
+        stmt = stmt.where(TaskCounter.user_id == current_user.id)
         
-    stmt = stmt.group_by(Task.account_id, Task.status)
+    stmt = stmt.group_by(TaskCounter.account_id, TaskCounter.status)
     
     result = await db.execute(stmt)
     rows = result.all()
@@ -45,7 +59,9 @@ async def get_task_stats_by_account(
     for row in rows:
         account_id = row.account_id
         status = row.status
-        count = row.count
+        count = int(row.count or 0)
+        if count <= 0:
+            continue
         
         if account_id not in stats:
             stats[account_id] = {"pending": 0, "running": 0, "completed": 0, "failed": 0, "total": 0}
@@ -60,17 +76,17 @@ async def get_action_stats_by_account(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ) -> Dict[int, Dict[str, int]]:
-    """Get completed action counts grouped by account_id and task_type."""
+    """Get completed action counts grouped by account_id and task_type (from the task_counters table)."""
     stmt = select(
-        Task.account_id,
-        Task.task_type,
-        func.count(Task.id).label('count')
-    ).where(Task.status == "completed")
+        TaskCounter.account_id,
+        TaskCounter.task_type,
+        func.sum(TaskCounter.task_count).label('count')
+    ).where(TaskCounter.status == "completed", TaskCounter.account_id != 0)
     
     if current_user.role != "admin":
-        stmt = stmt.where(Task.user_id == current_user.id)
+        stmt = stmt.where(TaskCounter.user_id == current_user.id)
         
-    stmt = stmt.group_by(Task.account_id, Task.task_type)
+    stmt = stmt.group_by(TaskCounter.account_id, TaskCounter.task_type)
     
     result = await db.execute(stmt)
     rows = result.all()
@@ -79,7 +95,9 @@ async def get_action_stats_by_account(
     for row in rows:
         account_id = row.account_id
         task_type = row.task_type
-        count = row.count
+        count = int(row.count or 0)
+        if count <= 0:
+            continue
         
         if account_id not in stats:
             stats[account_id] = {"like": 0, "follow": 0, "view": 0, "post": 0, "story": 0, "reels": 0, "total": 0}
@@ -95,31 +113,51 @@ async def execute_task_now(task_id: int):
     """Execute a task immediately in the background."""
     await execute_task(task_id)
 
-@router.get("/", response_model=List[TaskResponse])
+async def _publish_bulk_change(current_user: User, action: str, count: int):
+    # Admin actions span all users; their event only reaches the admin stream
+    user_id = None if current_user.role == "admin" else current_user.id
+    await publish_event(user_id, "tasks_changed", action=action, count=count)
+
+
+@router.get("/", response_model=List[TaskResponse], dependencies=[Depends(reject_offset)])
 async def list_tasks(
-    skip: int = 0, 
-    limit: int = 100, 
+    response: Response,
+    limit: int = Query(100, ge=1, le=500), 
+    cursor: Optional[str] = None,
     status: Optional[str] = None,
     task_type: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """List all scheduled tasks."""
-    stmt = select(Task)
-    
+    """
+    List scheduled tasks by (scheduled_at, id). Pass the X-Next-Cursor header of a
+    response as `cursor` for the next page; X-Total-Count is approximate.
+    """
+    criteria = []
     if current_user.role != "admin":
-        stmt = stmt.where(Task.user_id == current_user.id)
-        
-    stmt = stmt.order_by(Task.scheduled_at.asc())
+        criteria.append(Task.user_id == current_user.id)
     if status:
-        stmt = stmt.where(Task.status == status)
+        criteria.append(Task.status == status)
     if task_type:
-        stmt = stmt.where(Task.task_type == task_type)
+        criteria.append(Task.task_type == task_type)
     else:
-        stmt = stmt.where(Task.task_type.not_in(['login', 'check_session']))
-    stmt = stmt.offset(skip).limit(limit)
-    result = await db.execute(stmt)
-    return result.scalars().all()
+        criteria.append(Task.task_type.not_in(HIDDEN_TASK_TYPES))
+    
+    rows = await keyset_page(
+        db, task_listing(*criteria), Task.scheduled_at, Task.id, response,
+        cursor=cursor, limit=limit
+    )
+    response.headers[TOTAL_COUNT_HEADER] = str(await _approximate_count(db, current_user, status, task_type))
+    return rows
+
+async def _approximate_count(db: AsyncSession, current_user: User, status: Optional[str], task_type: Optional[str]) -> int:
+    return await approximate_task_count(
+        db,
+        user_id=None if current_user.role == "admin" else current_user.id,
+        status=status,
+        task_type=task_type,
+        exclude_types=HIDDEN_TASK_TYPES,
+    )
 
 @router.get("/count")
 async def count_tasks(
@@ -128,20 +166,8 @@ async def count_tasks(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get total count of tasks matching filters."""
-    stmt = select(func.count(Task.id))
-    
-    if current_user.role != "admin":
-        stmt = stmt.where(Task.user_id == current_user.id)
-    if status:
-        stmt = stmt.where(Task.status == status)
-    if task_type:
-        stmt = stmt.where(Task.task_type == task_type)
-    else:
-        stmt = stmt.where(Task.task_type.not_in(['login', 'check_session']))
-    
-    result = await db.execute(stmt)
-    return {"count": result.scalar_one()}
+    """Get total count of tasks matching filters (from the task counters, no table scan)."""
+    return {"count": await _approximate_count(db, current_user, status, task_type)}
 
 @router.get("/{task_id}", response_model=TaskResponse)
 async def get_task(
@@ -195,24 +221,24 @@ async def create_post_task(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid datetime format")
     
-    filename = f"{account_id}_{int(now_jakarta().timestamp())}_{image.filename}"
-    file_path = os.path.join(settings.MEDIA_PATH, filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(image.file, buffer)
+    stored = await save_upload(image)
+    await register_media(db, stored)
+    schedule_preprocess(stored.sha256, os.path.join(settings.MEDIA_PATH, stored.filename))
     
     task = Task(
         account_id=account_id,
         task_type="post",
-        params={"media_path": filename, "caption": caption, "share_to_threads": share_to_threads.lower() == "true"},
+        params={"media_path": stored.filename, "media_hash": stored.sha256, "caption": caption, "share_to_threads": share_to_threads.lower() == "true"},
         scheduled_at=scheduled_datetime,
         status="pending",
         batch_id=batch_id,
         user_id=current_user.id
     )
     db.add(task)
+    await add_to_batch(db, task.batch_id, current_user.id)
     await db.commit()
     await db.refresh(task)
+    await publish_task_status([task], action="created")
     
     if execute_now.lower() == "true":
         background_tasks.add_task(execute_task_now, task.id)
@@ -254,24 +280,24 @@ async def create_reels_task(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid datetime format")
     
-    filename = f"reels_{account_id}_{int(now_jakarta().timestamp())}_{video.filename}"
-    file_path = os.path.join(settings.MEDIA_PATH, filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(video.file, buffer)
+    stored = await save_upload(video)
+    await register_media(db, stored)
+    schedule_preprocess(stored.sha256, os.path.join(settings.MEDIA_PATH, stored.filename))
     
     task = Task(
         account_id=account_id,
         task_type="reels",
-        params={"media_path": filename, "caption": caption, "share_to_threads": share_to_threads.lower() == "true"},
+        params={"media_path": stored.filename, "media_hash": stored.sha256, "caption": caption, "share_to_threads": share_to_threads.lower() == "true"},
         scheduled_at=scheduled_datetime,
         status="pending",
         batch_id=batch_id,
         user_id=current_user.id
     )
     db.add(task)
+    await add_to_batch(db, task.batch_id, current_user.id)
     await db.commit()
     await db.refresh(task)
+    await publish_task_status([task], action="created")
     
     if execute_now.lower() == "true":
         background_tasks.add_task(execute_task_now, task.id)
@@ -307,19 +333,14 @@ async def create_story_task(
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid datetime format")
     
-    filename = f"story_{account_id}_{int(now_jakarta().timestamp())}_{media.filename}"
-    if not os.path.exists(settings.MEDIA_PATH):
-        os.makedirs(settings.MEDIA_PATH, exist_ok=True)
-        
-    file_path = os.path.join(settings.MEDIA_PATH, filename)
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(media.file, buffer)
+    stored = await save_upload(media)
+    await register_media(db, stored)
+    schedule_preprocess(stored.sha256, os.path.join(settings.MEDIA_PATH, stored.filename))
     
     task = Task(
         account_id=account_id,
         task_type="story",
-        params={"media_path": filename, "caption": caption, "link": link},
+        params={"media_path": stored.filename, "media_hash": stored.sha256, "caption": caption, "link": link},
         scheduled_at=scheduled_datetime,
         status="pending",
         batch_id=batch_id,
@@ -327,14 +348,152 @@ async def create_story_task(
     )
     
     db.add(task)
+    await add_to_batch(db, task.batch_id, current_user.id)
     await db.commit()
     await db.refresh(task)
+    await publish_task_status([task], action="created")
     
     if execute_now.lower() == "true":
         background_tasks.add_task(execute_task_now, task.id)
     
     return task
 
+CAMPAIGN_TASK_TYPES = ["post", "reels", "story"]
+CAMPAIGN_INSERT_CHUNK = 1000
+
+def _parse_account_ids(raw: str) -> List[int]:
+    """Accept "1,2,3" or a JSON list "[1, 2, 3]"; keeps order, drops duplicates."""
+    try:
+        values = json.loads(raw) if raw.strip().startswith("[") else raw.split(",")
+        ids = [int(v) for v in values if str(v).strip()]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="account_ids must be a comma-separated list of integers")
+    return list(dict.fromkeys(ids))
+
+@router.post("/campaign", response_model=TaskCampaignResponse)
+async def create_campaign(
+    task_type: str = Form(...),
+    account_ids: str = Form(...),
+    start_at: Optional[str] = Form(None),
+    interval_seconds: int = Form(0),
+    jitter_seconds: int = Form(0),
+    shuffle: str = Form("true"),
+    caption: str = Form(""),
+    link: Optional[str] = Form(None),
+    share_to_threads: str = Form("false"),
+    execute_now: str = Form("false"),
+    media: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Schedule the same post/reels/story on many accounts with one upload.
+    Task i is scheduled at start_at + i * interval_seconds + random(0, jitter_seconds).
+    Creates one TaskBatch and bulk-inserts all tasks referencing a single stored media file.
+    """
+    if task_type not in CAMPAIGN_TASK_TYPES:
+        raise HTTPException(status_code=400, detail=f"task_type must be one of {CAMPAIGN_TASK_TYPES}")
+    if interval_seconds < 0 or jitter_seconds < 0:
+        raise HTTPException(status_code=400, detail="interval_seconds and jitter_seconds must be >= 0")
+
+    ids = _parse_account_ids(account_ids)
+    if not ids:
+        raise HTTPException(status_code=400, detail="No accounts selected")
+
+    # Subscription and feature checks, once for the whole campaign
+    if not await is_subscription_active(current_user):
+        raise HTTPException(status_code=403, detail="Subscription expired.")
+    if not await has_feature(current_user, task_type):
+        raise HTTPException(status_code=403, detail=f"FEATURE_RESTRICTED:{task_type}")
+    cross_post = task_type != "story" and share_to_threads.lower() == "true"
+    if cross_post:
+        if not await has_feature(current_user, "cross_posting") and not await has_feature(current_user, "cross_threads"):
+             raise HTTPException(status_code=403, detail="FEATURE_RESTRICTED:cross_posting")
+
+    # Verify all accounts in one query
+    stmt = select(Account.id).where(Account.id.in_(ids))
+    if current_user.role != "admin":
+        stmt = stmt.where(Account.user_id == current_user.id)
+    found = set((await db.execute(stmt)).scalars().all())
+    missing = [i for i in ids if i not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Accounts not found or access denied: {missing}")
+
+    if execute_now.lower() == "true" or not start_at:
+        start = now_jakarta()
+    else:
+        try:
+            start = datetime.fromisoformat(start_at.replace('Z', '+00:00'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid datetime format")
+
+    stored = await save_upload(media)
+    await register_media(db, stored)
+    schedule_preprocess(stored.sha256, os.path.join(settings.MEDIA_PATH, stored.filename))
+
+    if shuffle.lower() == "true":
+        # Spread load evenly instead of always starting with the same accounts
+        random.shuffle(ids)
+
+    params = {"media_path": stored.filename, "media_hash": stored.sha256, "caption": caption}
+    if task_type == "story":
+        params["link"] = link
+    else:
+        params["share_to_threads"] = cross_post
+
+    batch = TaskBatch(
+        task_type=task_type,
+        params={
+            **params,
+            "start_at": start.isoformat(),
+            "interval_seconds": interval_seconds,
+            "jitter_seconds": jitter_seconds,
+        },
+        total_count=len(ids),
+        status="pending",
+        user_id=current_user.id
+    )
+    db.add(batch)
+    await db.flush()
+
+    created_at = now_jakarta()
+    rows = []
+    for i, account_id in enumerate(ids):
+        offset = i * interval_seconds + (random.uniform(0, jitter_seconds) if jitter_seconds else 0)
+        rows.append({
+            "account_id": account_id,
+            "task_type": task_type,
+            "params": params,
+            "scheduled_at": start + timedelta(seconds=offset),
+            "status": "pending",
+            "batch_id": batch.id,
+            "user_id": current_user.id,
+            "created_at": created_at,
+        })
+
+    # Core bulk insert (executemany) bypasses the flush listener, so counters are bumped here
+    for i in range(0, len(rows), CAMPAIGN_INSERT_CHUNK):
+        await db.execute(insert(Task), rows[i:i + CAMPAIGN_INSERT_CHUNK])
+    deltas = defaultdict(int)
+    for row in rows:
+        deltas[counter_key(current_user.id, row["account_id"], task_type, "pending", created_at)] += 1
+    await apply_counter_deltas(db, deltas)
+
+    await db.commit()
+    await db.refresh(batch)
+    await publish_event(current_user.id, "tasks_changed", action="created", batch_ids=[batch.id], count=len(rows))
+
+    schedule = [row["scheduled_at"] for row in rows]
+    return {
+        "batch": batch,
+        "task_count": len(rows),
+        "media_path": stored.filename,
+        "media_hash": stored.sha256,
+        "deduplicated": stored.deduplicated,
+        "first_scheduled_at": min(schedule),
+        "last_scheduled_at": max(schedule),
+    }
+
 @router.post("/like", response_model=TaskResponse)
 @require_feature("like")
 async def create_like_task(
@@ -363,8 +522,10 @@ async def create_like_task(
     )
     
     db.add(task)
+    await add_to_batch(db, task.batch_id, current_user.id)
     await db.commit()
     await db.refresh(task)
+    await publish_task_status([task], action="created")
     
     if getattr(task_in, 'execute_now', False):
         background_tasks.add_task(execute_task_now, task.id)
@@ -399,8 +560,10 @@ async def create_follow_task(
     )
     
     db.add(task)
+    await add_to_batch(db, task.batch_id, current_user.id)
     await db.commit()
     await db.refresh(task)
+    await publish_task_status([task], action="created")
     
     if getattr(task_in, 'execute_now', False):
         background_tasks.add_task(execute_task_now, task.id)
@@ -435,8 +598,10 @@ async def create_view_task(
     )
     
     db.add(task)
+    await add_to_batch(db, task.batch_id, current_user.id)
     await db.commit()
     await db.refresh(task)
+    await publish_task_status([task], action="created")
     
     if getattr(task_in, 'execute_now', False):
         background_tasks.add_task(execute_task_now, task.id)
@@ -472,6 +637,7 @@ async def update_task(
     
     await db.commit()
     await db.refresh(task)
+    await publish_task_status([task], action="updated")
     
     return task
 
@@ -483,13 +649,15 @@ async def pause_all_tasks(
     """Pause all pending tasks."""
     try:
         from sqlalchemy import update
-        stmt = update(Task).where(Task.status == "pending")
+        criteria = [Task.status == "pending"]
         if current_user.role != "admin":
-            stmt = stmt.where(Task.user_id == current_user.id)
+            criteria.append(Task.user_id == current_user.id)
         
-        stmt = stmt.values(status="paused")
+        await count_bulk_change(db, *criteria, new_status="paused")
+        stmt = update(Task).where(*criteria).values(status="paused")
         result = await db.execute(stmt)
         await db.commit()
+        await _publish_bulk_change(current_user, "paused", result.rowcount)
         return {"message": f"Paused {result.rowcount} tasks"}
     except Exception as e:
         await db.rollback()
@@ -503,13 +671,15 @@ async def resume_all_tasks(
     """Resume all paused tasks."""
     try:
         from sqlalchemy import update
-        stmt = update(Task).where(Task.status == "paused")
+        criteria = [Task.status == "paused"]
         if current_user.role != "admin":
-            stmt = stmt.where(Task.user_id == current_user.id)
+            criteria.append(Task.user_id == current_user.id)
         
-        stmt = stmt.values(status="pending")
+        await count_bulk_change(db, *criteria, new_status="pending")
+        stmt = update(Task).where(*criteria).values(status="pending")
         result = await db.execute(stmt)
         await db.commit()
+        await _publish_bulk_change(current_user, "resumed", result.rowcount)
         return {"message": f"Resumed {result.rowcount} tasks"}
     except Exception as e:
         await db.rollback()
@@ -538,6 +708,7 @@ async def pause_task(
     task.status = "paused"
     await db.commit()
     await db.refresh(task)
+    await publish_task_status([task], action="paused")
     return task
 
 @router.post("/{task_id}/resume", response_model=TaskResponse)
@@ -563,6 +734,7 @@ async def resume_task(
     task.status = "pending"
     await db.commit()
     await db.refresh(task)
+    await publish_task_status([task], action="resumed")
     return task
 
 @router.delete("/history")
@@ -578,18 +750,20 @@ async def clear_task_history(
         
         done_statuses = ["completed", "failed"]
         
-        stmt = delete(Task).where(Task.status.in_(done_statuses))
+        criteria = [Task.status.in_(done_statuses)]
         if current_user.role != "admin":
-            stmt = stmt.where(Task.user_id == current_user.id)
+            criteria.append(Task.user_id == current_user.id)
         
         if task_type:
-            stmt = stmt.where(Task.task_type == task_type)
+            criteria.append(Task.task_type == task_type)
         
         if status:
-            stmt = stmt.where(Task.status == status)
+            criteria.append(Task.status == status)
             
-        result = await db.execute(stmt)
+        await count_bulk_change(db, *criteria)
+        result = await db.execute(delete(Task).where(*criteria))
         await db.commit()
+        await _publish_bulk_change(current_user, "deleted", result.rowcount)
         
         return {
             "message": "History cleared successfully",
@@ -619,8 +793,11 @@ async def delete_task(
     if task.status == "running":
         raise HTTPException(status_code=400, detail="Cannot delete running task")
     
+    completed_batches = await remove_from_batches(db, unfinished_per_batch([task]))
     await db.delete(task)
     await db.commit()
+    await publish_task_status([task], action="deleted")
+    await notify_batches_completed(db, completed_batches)
     
     return {"message": "Task deleted successfully"}
 
@@ -641,13 +818,15 @@ async def bulk_delete_tasks(
     result = await db.execute(stmt)
     tasks = result.scalars().all()
     
-    deleted_count = 0
-    for task in tasks:
-        if task.status != "running":
-            await db.delete(task)
-            deleted_count += 1
+    deleted = [task for task in tasks if task.status != "running"]
+    completed_batches = await remove_from_batches(db, unfinished_per_batch(deleted))
+    for task in deleted:
+        await db.delete(task)
+    deleted_count = len(deleted)
             
     await db.commit()
+    await publish_task_status(deleted, action="deleted")
+    await notify_batches_completed(db, completed_batches)
     return {"message": f"Deleted {deleted_count} tasks"}
 
 @router.post("/{task_id}/retry", response_model=TaskResponse)
@@ -670,6 +849,9 @@ async def retry_task(
         
     if task.status == "running":
          raise HTTPException(status_code=400, detail="Cannot retry running task")
+    
+    # A finished task already counted towards its batch; it will be counted again
+    await reopen_batch_results(db, finished_per_batch([task]))
         
     task.status = "pending"
     task.error_message = None
@@ -677,30 +859,34 @@ async def retry_task(
     
     await db.commit()
     await db.refresh(task)
+    await publish_task_status([task], action="retried")
     
     background_tasks.add_task(execute_task_now, task.id)
     
     return task
 
-@router.get("/expired-sessions", response_model=List[TaskResponse])
+@router.get("/expired-sessions", response_model=List[TaskResponse], dependencies=[Depends(reject_offset)])
 async def list_expired_session_tasks(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """List failed tasks retryable."""
+    """List failed tasks retryable, newest first (paged with X-Next-Cursor)."""
     exclude_errors = ["banned", "IP blacklist", "blacklist", "challenge", "checkpoint"]
     
-    stmt = select(Task).where(Task.status == "failed")
     from sqlalchemy import not_, or_
     conditions = [Task.error_message.ilike(f"%{err}%") for err in exclude_errors]
-    stmt = stmt.where(not_(or_(*conditions)))
+    criteria = [Task.status == "failed", not_(or_(*conditions))]
     
     if current_user.role != "admin":
-        stmt = stmt.where(Task.user_id == current_user.id)
+        criteria.append(Task.user_id == current_user.id)
         
-    stmt = stmt.order_by(Task.created_at.desc())
-    result = await db.execute(stmt)
-    return result.scalars().all()
+    return await keyset_page(
+        db, task_listing(*criteria), Task.created_at, Task.id, response,
+        cursor=cursor, limit=limit, descending=True
+    )
 
 @router.post("/bulk-retry")
 async def bulk_retry_tasks(
@@ -720,6 +906,8 @@ async def bulk_retry_tasks(
     result = await db.execute(stmt)
     tasks = result.scalars().all()
     
+    await reopen_batch_results(db, finished_per_batch([task for task in tasks if task.status != "running"]))
+    
     retried_count = 0
     for task in tasks:
         if task.status != "running":
@@ -732,4 +920,5 @@ async def bulk_retry_tasks(
             retried_count += 1
             
     await db.commit()
+    await publish_task_status([task for task in tasks if task.status == "pending"], action="retried")
     return {"message": f"Retried {retried_count} tasks"}
@@ -83,7 +83,8 @@ class TaskBatchBase(BaseModel):
     total_count: int = 0
 
 class TaskBatchCreate(TaskBatchBase):
-    pass
+    # Accepted for compatibility; the server counts the tasks actually created
+    total_count: int = 0
 
 class TaskBatchResponse(TaskBatchBase):
     id: int
@@ -97,3 +98,12 @@ class TaskBatchResponse(TaskBatchBase):
 
     class Config:
         from_attributes = True
+
+class TaskCampaignResponse(BaseModel):
+    batch: TaskBatchResponse
+    task_count: int
+    media_path: str
+    media_hash: str
+    deduplicated: bool
+    first_scheduled_at: datetime
+    last_scheduled_at: datetime
@@ -0,0 +1,149 @@
+"""
+Set-based account creation for bulk and cookie imports.
+
+Instead of one SELECT, one fingerprint commit and one account flush per username,
+existing usernames are looked up with chunked IN queries and new accounts are written
+with multi-row INSERTs (fingerprints first, then accounts), a few statements per
+IMPORT_CHUNK_SIZE accounts, all in the caller's transaction.
+
+File imports (CSV / NDJSON) are read IMPORT_CHUNK_SIZE rows at a time, so memory
+stays bounded and every chunk can be validated, inserted and committed on its own.
+"""
+import asyncio
+import codecs
+import csv
+import itertools
+import json
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.account import Account, Fingerprint
+from app.schemas.account import BulkAccountItem
+from app.services.fingerprint_service import FingerprintService
+
+IMPORT_CHUNK_SIZE = 500
+IMPORT_FORMATS = ("csv", "ndjson")
+
+
+def _chunks(items: List, size: int = IMPORT_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def existing_usernames(db: AsyncSession, usernames: Iterable[str]) -> Set[str]:
+    """Lower-cased usernames that already have an account (MySQL compares case-insensitively)."""
+    unique = list({name for name in usernames if name})
+    found = set()
+    for chunk in _chunks(unique):
+        result = await db.execute(select(Account.username).where(Account.username.in_(chunk)))
+        found.update(name.lower() for name in result.scalars())
+    return found
+
+
+async def insert_accounts(db: AsyncSession, user_id: int, rows: List[dict]) -> Dict[str, int]:
+    """
+    Insert accounts (dicts of Account column values, usernames unique within `rows`),
+    each with a freshly generated fingerprint. Returns username -> new account id.
+    Usernames taken concurrently by another import are skipped (absent from the result)
+    instead of failing the whole statement.
+    """
+    fp_service = FingerprintService(db)
+    created: Dict[str, int] = {}
+
+    for chunk in _chunks(rows):
+        fingerprints = [fp_service.build_fingerprint(user_id) for _ in chunk]
+        device_ids = [fp["raw_fingerprint"]["device_id"] for fp in fingerprints]
+
+        # A multi-row INSERT reports the first generated id; ids of one statement are not
+        # guaranteed to be consecutive (innodb_autoinc_lock_mode=2), so map them back
+        # through the device_id each generated fingerprint carries
+        result = await db.execute(insert(Fingerprint).values(fingerprints))
+        device_id = func.json_unquote(func.json_extract(Fingerprint.raw_fingerprint, "$.device_id"))
+        fp_rows = await db.execute(
+            select(Fingerprint.id, device_id)
+            .where(Fingerprint.id >= result.lastrowid, Fingerprint.user_id == user_id, device_id.in_(device_ids))
+        )
+        fp_ids = {dev: fp_id for fp_id, dev in fp_rows.all()}
+
+        account_values = [
+            {**row, "user_id": user_id, "fingerprint_id": fp_ids[dev]}
+            for row, dev in zip(chunk, device_ids)
+        ]
+        await db.execute(insert(Account).values(account_values).prefix_with("IGNORE"))
+
+        # Only rows carrying one of our fingerprints were inserted by this statement
+        inserted = await db.execute(
+            select(Account.username, Account.id, Account.fingerprint_id)
+            .where(Account.username.in_([row["username"] for row in chunk]), Account.fingerprint_id.in_(fp_ids.values()))
+        )
+        used_fps = set()
+        for username, account_id, fp_id in inserted.all():
+            created[username] = account_id
+            used_fps.add(fp_id)
+
+        unused_fps = set(fp_ids.values()) - used_fps
+        if unused_fps:
+            await db.execute(delete(Fingerprint).where(Fingerprint.id.in_(unused_fps)))
+
+    return created
+
+
+# --- File imports (CSV / NDJSON) ---------------------------------------------------
+
+def _read_rows(fileobj, fmt: str) -> Iterator[Tuple[int, object]]:
+    """(line number, raw row) pairs; a raw row is a dict, or the error that made it unreadable."""
+    text = codecs.getreader("utf-8-sig")(fileobj, errors="replace")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(text, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError as e:
+                yield line_no, e
+
+
+async def iter_import_batches(fileobj, fmt: str, size: int = IMPORT_CHUNK_SIZE) -> AsyncIterator[List[Tuple[int, object]]]:
+    """Read an uploaded file `size` rows at a time, off the event loop."""
+    rows = _read_rows(fileobj, fmt)
+    while True:
+        batch = await asyncio.to_thread(lambda: list(itertools.islice(rows, size)))
+        if not batch:
+            return
+        yield batch
+
+
+def parse_import_row(raw) -> BulkAccountItem:
+    """
+    Validate one CSV/NDJSON row (columns: username, password, seed_2fa, proxy,
+    login_method, cookies). Raises ValueError with a readable message.
+    """
+    if isinstance(raw, Exception):
+        raise ValueError(f"Invalid JSON: {raw}")
+    if not isinstance(raw, dict):
+        raise ValueError("Expected one JSON object per line")
+    values = {}
+    for key, value in raw.items():
+        if not key:
+            continue  # Extra CSV cells without a header
+        if isinstance(value, str):
+            value = value.strip()
+        if value not in ("", None):
+            values[key.strip().lower()] = value
+    if isinstance(values.get("cookies"), str):
+        try:
+            values["cookies"] = json.loads(values["cookies"])
+        except ValueError:
+            raise ValueError("cookies: not valid JSON")
+    try:
+        return BulkAccountItem(**values)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()))
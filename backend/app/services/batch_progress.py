@@ -0,0 +1,203 @@
+"""
+TaskBatch progress with constant work per finished task.
+
+Counters are bumped atomically in SQL (success_count = success_count + 1), so
+concurrent workers never lose updates, and a batch is complete once
+success_count + failed_count reaches total_count. The guarded completion UPDATE
+matches for exactly one caller, which then emits the batch_completed event on the
+user's event bus (app.services.events). total_count is maintained server-side: every
+task inserted into a batch bumps it (add_to_batch), and unfinished tasks deleted from
+a batch shrink it, so it always matches the tasks the batch really has.
+"""
+import logging
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select, update, func, case, text
+
+from app.core.tz_utils import now_jakarta
+from app.models.task import Task
+from app.models.task_batch import TaskBatch
+from app.services.events import publish_event
+
+logger = logging.getLogger(__name__)
+
+UNFINISHED_STATUSES = ("pending", "running", "paused")
+
+
+async def _complete_if_done(conn, batch_id: int) -> bool:
+    # Only the update that crosses the threshold matches, so completion fires once
+    result = await conn.execute(
+        update(TaskBatch)
+        .where(
+            TaskBatch.id == batch_id,
+            TaskBatch.status != "completed",
+            func.coalesce(TaskBatch.success_count, 0) + func.coalesce(TaskBatch.failed_count, 0) >= TaskBatch.total_count,
+        )
+        .values(status="completed", completed_at=now_jakarta())
+        .execution_options(synchronize_session=False)
+    )
+    return bool(result.rowcount)
+
+
+async def record_batch_results(conn, results: Dict[int, Tuple[int, int]]) -> list:
+    """
+    Add (succeeded, failed) per batch id and complete batches whose counters reached
+    total_count. Runs in the caller's transaction (AsyncSession or connection); commit,
+    then pass the returned batch ids to notify_batches_completed().
+    """
+    completed = []
+    for batch_id, (succeeded, failed) in results.items():
+        if not succeeded and not failed:
+            continue
+        await conn.execute(
+            update(TaskBatch)
+            .where(TaskBatch.id == batch_id)
+            .values(
+                success_count=func.coalesce(TaskBatch.success_count, 0) + succeeded,
+                failed_count=func.coalesce(TaskBatch.failed_count, 0) + failed,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if await _complete_if_done(conn, batch_id):
+            completed.append(batch_id)
+    return completed
+
+
+async def add_to_batch(conn, batch_id: Optional[int], user_id: Optional[int] = None, count: int = 1):
+    """
+    Count `count` newly inserted tasks into the batch's total_count, in the inserting
+    transaction. A batch that already completed is reopened for them.
+    """
+    if not batch_id or count <= 0:
+        return
+    stmt = update(TaskBatch).where(TaskBatch.id == batch_id)
+    if user_id is not None:
+        stmt = stmt.where(TaskBatch.user_id == user_id)
+    reopen = TaskBatch.status == "completed"
+    # MySQL applies SET clauses in order, so completed_at must read the old status
+    await conn.execute(
+        stmt.ordered_values(
+            (TaskBatch.total_count, func.coalesce(TaskBatch.total_count, 0) + count),
+            (TaskBatch.completed_at, case((reopen, None), else_=TaskBatch.completed_at)),
+            (TaskBatch.status, case((reopen, "running"), else_=TaskBatch.status)),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def reopen_batch_results(conn, results: Dict[int, Tuple[int, int]]):
+    """Take back (succeeded, failed) per batch for finished tasks that are retried, reopening the batch."""
+    for batch_id, (succeeded, failed) in results.items():
+        if not succeeded and not failed:
+            continue
+        await conn.execute(
+            update(TaskBatch)
+            .where(TaskBatch.id == batch_id)
+            .values(
+                success_count=func.greatest(func.coalesce(TaskBatch.success_count, 0) - succeeded, 0),
+                failed_count=func.greatest(func.coalesce(TaskBatch.failed_count, 0) - failed, 0),
+                status="running",
+                completed_at=None,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def remove_from_batches(conn, removed: Dict[int, int]) -> list:
+    """Shrink total_count by the unfinished tasks deleted per batch id; returns completed batches."""
+    completed = []
+    for batch_id, count in removed.items():
+        if not count:
+            continue
+        await conn.execute(
+            update(TaskBatch)
+            .where(TaskBatch.id == batch_id)
+            .values(total_count=func.greatest(func.coalesce(TaskBatch.total_count, 0) - count, 0))
+            .execution_options(synchronize_session=False)
+        )
+        if await _complete_if_done(conn, batch_id):
+            completed.append(batch_id)
+    return completed
+
+
+def unfinished_per_batch(tasks) -> Dict[int, int]:
+    """Per-batch number of unfinished tasks among loaded Task objects (before deleting them)."""
+    removed: Dict[int, int] = {}
+    for task in tasks:
+        if task.batch_id and task.status in UNFINISHED_STATUSES:
+            removed[task.batch_id] = removed.get(task.batch_id, 0) + 1
+    return removed
+
+
+def finished_per_batch(tasks) -> Dict[int, Tuple[int, int]]:
+    """Per-batch (succeeded, failed) among loaded Task objects (before retrying them)."""
+    results: Dict[int, Tuple[int, int]] = {}
+    for task in tasks:
+        if task.batch_id and task.status in ("completed", "failed"):
+            succeeded, failed = results.get(task.batch_id, (0, 0))
+            if task.status == "completed":
+                succeeded += 1
+            else:
+                failed += 1
+            results[task.batch_id] = (succeeded, failed)
+    return results
+
+
+async def count_batch_tasks(conn, *criteria) -> Dict[int, int]:
+    """Per-batch number of tasks matching `criteria` (run before a bulk UPDATE/DELETE)."""
+    rows = await conn.execute(
+        select(Task.batch_id, func.count(Task.id))
+        .where(Task.batch_id.isnot(None), *criteria)
+        .group_by(Task.batch_id)
+    )
+    return dict(rows.all())
+
+
+async def notify_batches_completed(conn, batch_ids: list):
+    """Publish batch_completed for each batch (best effort; call after commit)."""
+    if not batch_ids:
+        return
+    batches = (await conn.execute(
+        select(
+            TaskBatch.id, TaskBatch.user_id, TaskBatch.task_type, TaskBatch.total_count,
+            TaskBatch.success_count, TaskBatch.failed_count, TaskBatch.completed_at,
+        ).where(TaskBatch.id.in_(batch_ids))
+    )).all()
+    for batch in batches:
+        logger.info("Batch %s completed: %s succeeded, %s failed of %s", batch.id, batch.success_count, batch.failed_count, batch.total_count)
+        await publish_event(
+            batch.user_id,
+            "batch_completed",
+            batch_id=batch.id,
+            task_type=batch.task_type,
+            total_count=batch.total_count,
+            success_count=batch.success_count,
+            failed_count=batch.failed_count,
+            completed_at=batch.completed_at,
+        )
+
+
+async def rebuild_batch_totals(conn) -> Tuple[int, int]:
+    """
+    Set total_count of unfinished batches to the tasks they really have, then complete
+    the ones whose results already cover it (one-off repair, see
+    tools/rebuild_batch_totals.py). Returns (batches reconciled, batches completed).
+    """
+    reconciled = await conn.execute(text(
+        "UPDATE task_batches b "
+        "LEFT JOIN (SELECT batch_id, COUNT(*) AS task_count FROM tasks "
+        "           WHERE batch_id IS NOT NULL GROUP BY batch_id) t ON t.batch_id = b.id "
+        "SET b.total_count = COALESCE(t.task_count, 0) "
+        "WHERE b.status != 'completed' AND b.total_count <> COALESCE(t.task_count, 0)"
+    ))
+    completed = await conn.execute(
+        update(TaskBatch)
+        .where(
+            TaskBatch.status != "completed",
+            TaskBatch.total_count > 0,
+            func.coalesce(TaskBatch.success_count, 0) + func.coalesce(TaskBatch.failed_count, 0) >= TaskBatch.total_count,
+        )
+        .values(status="completed", completed_at=now_jakarta())
+        .execution_options(synchronize_session=False)
+    )
+    return reconciled.rowcount, completed.rowcount
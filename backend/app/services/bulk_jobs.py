@@ -0,0 +1,212 @@
+"""
+Bulk account import jobs, stored in Redis so every API worker sees the same job.
+
+Keys (all expire BULK_JOB_TTL seconds after the last update):
+- bulkjob:{id}            hash of counters and settings (user_id, status, total, ...)
+- bulkjob:{id}:results    hash row index -> JSON result of one submitted account
+- bulkjob:{id}:rows       hash account_id -> row index, for O(1) login updates
+- bulkjob:user:{user_id}  sorted set of the user's job ids by creation time
+
+Every change is also published on bulkjob:{id}:events, which the SSE endpoint
+relays to the browser instead of having it poll /bulk/status, and as a bulk_job
+event (counters only) on the user's event bus.
+"""
+import json
+import time
+from typing import AsyncIterator, List, Optional
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.services.events import publish_event
+
+COUNTERS = ("total", "created", "failed", "pending_login", "logged_in", "login_failed")
+FINISHED = "completed"
+
+_JOB_KEY = "bulkjob:{job_id}"
+_RESULTS_KEY = "bulkjob:{job_id}:results"
+_ROWS_KEY = "bulkjob:{job_id}:rows"
+_EVENTS_CHANNEL = "bulkjob:{job_id}:events"
+_USER_JOBS_KEY = "bulkjob:user:{user_id}"
+
+
+def _keys(job_id: str):
+    return (
+        _JOB_KEY.format(job_id=job_id),
+        _RESULTS_KEY.format(job_id=job_id),
+        _ROWS_KEY.format(job_id=job_id),
+    )
+
+
+def _decode_job(job_id: str, raw: dict) -> dict:
+    job = {"job_id": job_id}
+    for key, value in raw.items():
+        if key in COUNTERS or key == "user_id":
+            job[key] = int(value)
+        elif key == "created_at":
+            job[key] = float(value)
+        elif key == "status":
+            job[key] = value
+        else:
+            job[key] = json.loads(value)  # Options given to create_job()
+    return job
+
+
+async def _publish(r, job_id: str, event: str, **payload):
+    await r.publish(_EVENTS_CHANNEL.format(job_id=job_id), json.dumps({"event": event, **payload}, default=str))
+    job = payload.get("job")
+    if job:
+        # Counters only on the user's event bus; per-account results stay on the job channel
+        await publish_event(
+            job.get("user_id"),
+            "bulk_job",
+            job_id=job_id,
+            status=job.get("status"),
+            **{counter: job.get(counter, 0) for counter in COUNTERS},
+        )
+
+
+async def create_job(job_id: str, user_id: int, total: int, **options):
+    r = get_redis()
+    job_key, _, _ = _keys(job_id)
+    now = time.time()
+    fields = {
+        "user_id": user_id,
+        "status": "creating",
+        "created_at": now,
+        **{counter: 0 for counter in COUNTERS},
+        "total": total,
+        **{key: json.dumps(value) for key, value in options.items()},
+    }
+    user_key = _USER_JOBS_KEY.format(user_id=user_id)
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.hset(job_key, mapping=fields)
+        pipe.expire(job_key, settings.BULK_JOB_TTL)
+        pipe.zadd(user_key, {job_id: now})
+        # Forget jobs whose keys have expired
+        pipe.zremrangebyscore(user_key, 0, now - settings.BULK_JOB_TTL)
+        pipe.expire(user_key, settings.BULK_JOB_TTL)
+        await pipe.execute()
+
+
+async def add_results(job_id: str, results: List[dict], created: int, failed: int, status: str):
+    """Store the per-account creation results (in submission order) and the creation counters."""
+    r = get_redis()
+    job_key, results_key, rows_key = _keys(job_id)
+    async with r.pipeline(transaction=True) as pipe:
+        if results:
+            pipe.hset(results_key, mapping={str(i): json.dumps(result) for i, result in enumerate(results)})
+            rows = {str(result["account_id"]): str(i) for i, result in enumerate(results) if result.get("account_id")}
+            if rows:
+                pipe.hset(rows_key, mapping=rows)
+        pipe.hset(job_key, mapping={"created": created, "failed": failed, "pending_login": created, "status": status})
+        for key in (job_key, results_key, rows_key):
+            pipe.expire(key, settings.BULK_JOB_TTL)
+        await pipe.execute()
+    await _publish(r, job_id, "progress", job=await get_job(job_id, with_results=False))
+
+
+async def append_results(job_id: str, start: int, results: List[dict], created: int, failed: int):
+    """Add one chunk of results (rows start..) for imports that arrive incrementally."""
+    r = get_redis()
+    job_key, results_key, rows_key = _keys(job_id)
+    async with r.pipeline(transaction=True) as pipe:
+        if results:
+            pipe.hset(results_key, mapping={str(start + i): json.dumps(result) for i, result in enumerate(results)})
+            rows = {str(result["account_id"]): str(start + i) for i, result in enumerate(results) if result.get("account_id")}
+            if rows:
+                pipe.hset(rows_key, mapping=rows)
+        pipe.hincrby(job_key, "total", len(results))
+        pipe.hincrby(job_key, "created", created)
+        pipe.hincrby(job_key, "failed", failed)
+        pipe.hincrby(job_key, "pending_login", created)
+        for key in (job_key, results_key, rows_key):
+            pipe.expire(key, settings.BULK_JOB_TTL)
+        await pipe.execute()
+    await _publish(r, job_id, "progress", job=await get_job(job_id, with_results=False))
+
+
+async def record_login(job_id: str, account_id: int, login_status: str, error: Optional[str] = None):
+    """Count one finished login and update that account's result row."""
+    r = get_redis()
+    job_key, results_key, rows_key = _keys(job_id)
+    row = await r.hget(rows_key, str(account_id))
+    result = None
+    if row is not None:
+        raw = await r.hget(results_key, row)
+        if raw:
+            result = json.loads(raw)
+            result["login_status"] = login_status
+            if error:
+                result["error_reason"] = error
+
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.hincrby(job_key, "logged_in" if login_status == "active" else "login_failed", 1)
+        pipe.hincrby(job_key, "pending_login", -1)
+        if result is not None:
+            pipe.hset(results_key, row, json.dumps(result))
+        for key in (job_key, results_key, rows_key):
+            pipe.expire(key, settings.BULK_JOB_TTL)
+        await pipe.execute()
+    await _publish(r, job_id, "progress", job=await get_job(job_id, with_results=False), result=result)
+
+
+async def set_status(job_id: str, status: str):
+    r = get_redis()
+    job_key, _, _ = _keys(job_id)
+    await r.hset(job_key, "status", status)
+    await _publish(r, job_id, "progress", job=await get_job(job_id, with_results=False))
+
+
+async def get_job(job_id: str, with_results: bool = True) -> Optional[dict]:
+    r = get_redis()
+    job_key, results_key, _ = _keys(job_id)
+    raw = await r.hgetall(job_key)
+    if not raw:
+        return None
+    job = _decode_job(job_id, raw)
+    if with_results:
+        rows = await r.hgetall(results_key)
+        job["results"] = [json.loads(rows[i]) for i in sorted(rows, key=int)]
+    return job
+
+
+async def list_user_jobs(user_id: int) -> List[dict]:
+    r = get_redis()
+    user_key = _USER_JOBS_KEY.format(user_id=user_id)
+    await r.zremrangebyscore(user_key, 0, time.time() - settings.BULK_JOB_TTL)
+    jobs = []
+    for job_id in await r.zrange(user_key, 0, -1):
+        job = await get_job(job_id, with_results=False)
+        if job:
+            jobs.append(job)
+    return jobs
+
+
+async def job_events(job_id: str, heartbeat: float = 15.0) -> AsyncIterator[Optional[dict]]:
+    """
+    Yield a "snapshot" event (the full job) and then every published change until the
+    job completes. Yields None when nothing happened for `heartbeat` seconds.
+    """
+    r = get_redis()
+    pubsub = r.pubsub()
+    # Subscribe before taking the snapshot so no change falls in between
+    await pubsub.subscribe(_EVENTS_CHANNEL.format(job_id=job_id))
+    try:
+        job = await get_job(job_id)
+        if job is None:
+            return
+        yield {"event": "snapshot", "job": job}
+        if job["status"] == FINISHED:
+            return
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            if message is None:
+                yield None
+                continue
+            event = json.loads(message["data"])
+            yield event
+            if (event.get("job") or {}).get("status") == FINISHED:
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
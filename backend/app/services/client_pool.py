@@ -0,0 +1,143 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.models.account import Account, Fingerprint
+from app.services.instagram_service import InstagramService
+
+
+class _PoolEntry:
+    __slots__ = ("service", "signature", "session_checked_at", "warmed_up", "in_use")
+
+    def __init__(self, service: InstagramService, signature: str):
+        self.service = service
+        self.signature = signature
+        self.session_checked_at: Optional[float] = None
+        self.warmed_up = False
+        self.in_use = False
+
+
+class InstagramClientPool:
+    """
+    Process-wide, LRU-bounded pool of configured InstagramService clients keyed by account id.
+
+    An entry is reused only while the account's cookies, proxy and fingerprint are unchanged
+    (compared through a signature hash); any change rebuilds the client. Session validity
+    is cached for INSTAGRAM_SESSION_TTL seconds so consecutive tasks on the same account
+    skip the get_timeline_feed session check.
+    """
+
+    def __init__(self, max_size: int, session_ttl: int):
+        self.max_size = max(1, max_size)
+        self.session_ttl = session_ttl
+        self._entries: "OrderedDict[int, _PoolEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def signature(account: Account, fingerprint: Fingerprint) -> str:
+        payload = json.dumps(
+            {
+                "cookies": account.cookies,
+                "proxy": account.proxy,
+                "fingerprint_id": fingerprint.id,
+                "fingerprint": fingerprint.raw_fingerprint,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def acquire(self, account: Account, fingerprint: Fingerprint) -> Tuple[InstagramService, bool]:
+        """
+        Get a client for the account.
+        Returns (service, reused). Must be paired with release(account.id, service).
+        """
+        sig = self.signature(account, fingerprint)
+        with self._lock:
+            entry = self._entries.get(account.id)
+            if entry and entry.signature == sig and not entry.in_use:
+                entry.in_use = True
+                self._entries.move_to_end(account.id)
+                # Point the cached client at this session's ORM objects
+                entry.service.account = account
+                entry.service.fingerprint = fingerprint
+                return entry.service, True
+            busy = entry is not None and entry.in_use
+
+        service = InstagramService(account, fingerprint)
+        if busy:
+            # Another task is driving this account's pooled client; use a throwaway one
+            return service, False
+
+        with self._lock:
+            entry = _PoolEntry(service, sig)
+            entry.in_use = True
+            self._entries[account.id] = entry
+            self._entries.move_to_end(account.id)
+            while len(self._entries) > self.max_size:
+                oldest_id, oldest = next(iter(self._entries.items()))
+                if oldest.in_use:
+                    break
+                self._entries.pop(oldest_id)
+        return service, False
+
+    def release(self, account_id: int, service: InstagramService):
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry and entry.service is service:
+                entry.in_use = False
+
+    def session_is_fresh(self, account_id: int, service: InstagramService) -> bool:
+        """True if this pooled client verified the session within the TTL."""
+        with self._lock:
+            entry = self._entries.get(account_id)
+            return bool(
+                entry
+                and entry.service is service
+                and entry.session_checked_at is not None
+                and time.monotonic() - entry.session_checked_at < self.session_ttl
+            )
+
+    def mark_session_valid(self, account: Account, fingerprint: Fingerprint, service: InstagramService):
+        """
+        Record a verified session. Also refreshes the signature, since a login
+        rewrites the account's cookies from this very client.
+        """
+        sig = self.signature(account, fingerprint)
+        with self._lock:
+            entry = self._entries.get(account.id)
+            if entry and entry.service is service:
+                entry.signature = sig
+                entry.session_checked_at = time.monotonic()
+
+    def is_warmed_up(self, account_id: int, service: InstagramService) -> bool:
+        """True if this pooled client already completed a media warmup."""
+        with self._lock:
+            entry = self._entries.get(account_id)
+            return bool(entry and entry.service is service and entry.warmed_up)
+
+    def mark_warmed_up(self, account_id: int, service: InstagramService):
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry and entry.service is service:
+                entry.warmed_up = True
+
+    def mark_session_invalid(self, account_id: int):
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry:
+                entry.session_checked_at = None
+
+    def invalidate(self, account_id: int):
+        with self._lock:
+            self._entries.pop(account_id, None)
+
+
+client_pool = InstagramClientPool(
+    max_size=settings.INSTAGRAM_CLIENT_POOL_SIZE,
+    session_ttl=settings.INSTAGRAM_SESSION_TTL,
+)
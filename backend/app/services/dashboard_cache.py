@@ -0,0 +1,65 @@
+import json
+import logging
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Every cached stats key embeds a generation number; finishing a task bumps the
+# generation of its owner and of the admin ("all") scope, which orphans stale entries.
+_GEN_KEY = "dashboard:gen:{scope}"
+_STATS_KEY = "dashboard:stats:{user_id}:{period}:{gen}"
+
+
+def _scope(user) -> str:
+    return "all" if user.role == "admin" else str(user.id)
+
+
+async def _generation(r, scope: str) -> str:
+    return await r.get(_GEN_KEY.format(scope=scope)) or "0"
+
+
+async def get_cached_stats(user, period: str) -> Optional[dict]:
+    if settings.DASHBOARD_CACHE_TTL <= 0:
+        return None
+    try:
+        r = get_redis()
+        gen = await _generation(r, _scope(user))
+        raw = await r.get(_STATS_KEY.format(user_id=user.id, period=period, gen=gen))
+        return json.loads(raw) if raw else None
+    except RedisError as e:
+        logger.warning("Dashboard cache read failed: %s", e)
+        return None
+
+
+async def set_cached_stats(user, period: str, stats: dict):
+    if settings.DASHBOARD_CACHE_TTL <= 0:
+        return
+    try:
+        r = get_redis()
+        gen = await _generation(r, _scope(user))
+        await r.set(
+            _STATS_KEY.format(user_id=user.id, period=period, gen=gen),
+            json.dumps(stats, default=str),
+            ex=settings.DASHBOARD_CACHE_TTL,
+        )
+    except RedisError as e:
+        logger.warning("Dashboard cache write failed: %s", e)
+
+
+async def invalidate_dashboard_stats(user_id: Optional[int]):
+    """Drop cached stats that include tasks of this user (their own view and the admin view)."""
+    if settings.DASHBOARD_CACHE_TTL <= 0:
+        return
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            if user_id is not None:
+                pipe.incr(_GEN_KEY.format(scope=user_id))
+            pipe.incr(_GEN_KEY.format(scope="all"))
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning("Dashboard cache invalidation failed: %s", e)
@@ -0,0 +1,191 @@
+"""
+Entitlement snapshots: who the token's user is and what their subscription allows.
+
+get_current_user used to query users on every request, and subscription guards
+(require_active_subscription, require_feature, has_feature) ran one subscription query
+per check. A snapshot holds the user row (minus the password hash), the plan's
+features and limits, active addon quotas and the subscription expiry. It is cached in
+Redis under entitlements:{username} for ENTITLEMENT_CACHE_TTL seconds (never past the
+subscription end) and attached to the request's User, so authentication plus any
+number of feature checks cost one cache lookup.
+
+Call invalidate_entitlements() (or invalidate_user_entitlements() by id) whenever this
+service changes the user row, their subscription or addons: login / jti rotation,
+profile update, ban, proxy order fulfilment, and the subscription sweeper's expiries.
+Plans and addons are sold by the central service, which does not notify us, so
+ENTITLEMENT_CACHE_TTL is the upper bound for an upgrade, downgrade or cancellation
+made there to take effect.
+"""
+import json
+import logging
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from redis.exceptions import RedisError
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.core.tz_utils import now_jakarta
+from app.db.session import AsyncSessionLocal
+from app.models.user import User
+from app.models.subscription import Subscription, SubscriptionPlan, SubscriptionAddon
+
+logger = logging.getLogger(__name__)
+
+_KEY = "entitlements:{username}"
+_USER_COLUMNS = [column for column in User.__table__.columns if column.key != "hashed_password"]
+
+
+@dataclass
+class Entitlements:
+    user: dict
+    plan_id: Optional[str] = None
+    plan_name: Optional[str] = None
+    features: List[str] = field(default_factory=list)
+    ig_account_limit: int = 0
+    proxy_slot_limit: int = 0
+    addon_quota: Dict[str, int] = field(default_factory=dict)  # sub_type -> quantity
+    expires_at: Optional[float] = None  # Subscription end, epoch seconds
+
+    @property
+    def subscription_active(self) -> bool:
+        return self.expires_at is not None and self.expires_at > time.time()
+
+    def has_feature(self, feature_name: str) -> bool:
+        return self.subscription_active and feature_name in self.features
+
+    def limit(self, resource_type: str) -> int:
+        """Plan limit plus active addon quota for "account" or "proxy"."""
+        base = self.ig_account_limit if resource_type == "account" else self.proxy_slot_limit
+        return base + self.addon_quota.get(resource_type, 0)
+
+
+def _parse_features(features) -> List[str]:
+    if isinstance(features, str):
+        try:
+            features = json.loads(features)
+        except ValueError:
+            return []
+    return list(features or [])
+
+
+async def load_entitlements(db: AsyncSession, username: str) -> Optional[Entitlements]:
+    """Build a snapshot from the database (None if the user does not exist)."""
+    # Plain columns, not an entity: the request's session must not already hold this
+    # User when the detached copy from the snapshot is later added to it
+    row = (await db.execute(select(*_USER_COLUMNS).where(User.username == username))).first()
+    if row is None:
+        return None
+    ent = Entitlements(user=dict(row._mapping))
+
+    sub = (await db.execute(
+        select(Subscription.end_date, SubscriptionPlan)
+        .join(SubscriptionPlan, Subscription.plan_id == SubscriptionPlan.id)
+        .where(
+            Subscription.user_id == ent.user["id"],
+            Subscription.status == "active",
+            Subscription.end_date > now_jakarta()
+        )
+        .order_by(Subscription.end_date.desc())
+        .limit(1)
+    )).first()
+    if sub is not None:
+        end_date, plan = sub
+        if end_date.tzinfo is None:
+            # Stored as Jakarta wall-clock time (that is what the query compares against)
+            end_date = end_date.replace(tzinfo=ZoneInfo("Asia/Jakarta"))
+        ent.expires_at = end_date.timestamp()
+        ent.plan_id = plan.id
+        ent.plan_name = plan.name
+        ent.features = _parse_features(plan.features)
+        ent.ig_account_limit = int(plan.ig_account_limit or 0)
+        ent.proxy_slot_limit = int(plan.proxy_slot_limit or 0)
+
+    quotas = await db.execute(
+        select(SubscriptionAddon.sub_type, func.sum(SubscriptionAddon.quantity))
+        .where(
+            SubscriptionAddon.user_id == ent.user["id"],
+            SubscriptionAddon.addon_type == "quota",
+            SubscriptionAddon.is_active == True
+        )
+        .group_by(SubscriptionAddon.sub_type)
+    )
+    ent.addon_quota = {sub_type: int(quantity or 0) for sub_type, quantity in quotas.all() if sub_type}
+    return ent
+
+
+async def get_entitlements(db: AsyncSession, username: str) -> Optional[Entitlements]:
+    """Cached snapshot, loaded from the database on a miss."""
+    if settings.ENTITLEMENT_CACHE_TTL <= 0:
+        return await load_entitlements(db, username)
+
+    key = _KEY.format(username=username)
+    try:
+        raw = await get_redis().get(key)
+        if raw:
+            return Entitlements(**json.loads(raw))
+    except RedisError as e:
+        logger.warning("Entitlement cache read failed: %s", e)
+
+    ent = await load_entitlements(db, username)
+    if ent is None:
+        return None
+    ttl = settings.ENTITLEMENT_CACHE_TTL
+    if ent.expires_at is not None:
+        # Never serve a subscription past its end
+        ttl = max(1, min(ttl, int(ent.expires_at - time.time())))
+    try:
+        await get_redis().set(key, json.dumps(asdict(ent)), ex=ttl)
+    except RedisError as e:
+        logger.warning("Entitlement cache write failed: %s", e)
+    return ent
+
+
+async def invalidate_entitlements(username: str):
+    if settings.ENTITLEMENT_CACHE_TTL <= 0 or not username:
+        return
+    try:
+        await get_redis().delete(_KEY.format(username=username))
+    except RedisError as e:
+        logger.warning("Entitlement cache invalidation failed: %s", e)
+
+
+async def invalidate_user_entitlements(db, user_ids) -> None:
+    """Drop the snapshots of the given user ids (one username lookup, one Redis call)."""
+    user_ids = [user_id for user_id in set(user_ids) if user_id is not None]
+    if settings.ENTITLEMENT_CACHE_TTL <= 0 or not user_ids:
+        return
+    usernames = (await db.execute(select(User.username).where(User.id.in_(user_ids)))).scalars().all()
+    if not usernames:
+        return
+    try:
+        await get_redis().delete(*(_KEY.format(username=username) for username in usernames))
+    except RedisError as e:
+        logger.warning("Entitlement cache invalidation failed: %s", e)
+
+
+def user_from_entitlements(ent: Entitlements) -> User:
+    """
+    A detached User built from the snapshot: it can be read like a loaded row, and
+    db.add() on it updates only the attributes that were changed. The snapshot rides
+    along as user.entitlements for the subscription guards.
+    """
+    user = User(**ent.user)
+    make_transient_to_detached(user)
+    user.entitlements = ent
+    return user
+
+
+async def get_user_entitlements(user: User) -> Entitlements:
+    """The snapshot attached by get_current_user, or a fresh lookup for other User objects."""
+    ent = getattr(user, "entitlements", None)
+    if ent is None:
+        async with AsyncSessionLocal() as db:
+            ent = await get_entitlements(db, user.username) or Entitlements(user={"id": user.id})
+        user.entitlements = ent
+    return ent
@@ -0,0 +1,74 @@
+"""
+Per-user event bus over Redis pub/sub.
+
+Task status changes (execute_task, task CRUD), finished batches and bulk import
+progress are published to events:user:{user_id}, and mirrored to events:admin since
+admins see every user's tasks. GET /api/v1/events/stream relays them to the browser
+as Server-Sent Events, so pages refresh when something changed instead of polling.
+
+Events are small hints ({"event": "task_status", "task_ids": [...], ...}); clients
+re-fetch what they show. Publishing is best effort: a Redis outage never fails the
+change that triggered it.
+"""
+import json
+import logging
+import time
+from typing import AsyncIterator, Optional
+
+from redis.exceptions import RedisError
+
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+_USER_CHANNEL = "events:user:{user_id}"
+_ADMIN_CHANNEL = "events:admin"
+
+
+async def publish_event(user_id: Optional[int], event: str, **payload):
+    message = json.dumps({"event": event, "user_id": user_id, "ts": time.time(), **payload}, default=str)
+    try:
+        async with get_redis().pipeline(transaction=False) as pipe:
+            if user_id is not None:
+                pipe.publish(_USER_CHANNEL.format(user_id=user_id), message)
+            pipe.publish(_ADMIN_CHANNEL, message)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning("Event publish failed (%s): %s", event, e)
+
+
+async def publish_task_status(tasks, action: str = "status"):
+    """One task_status event per owner for a group of Task objects (or rows with the same fields)."""
+    by_user = {}
+    for task in tasks:
+        by_user.setdefault(task.user_id, []).append(task)
+    for user_id, owned in by_user.items():
+        await publish_event(
+            user_id,
+            "task_status",
+            action=action,
+            task_ids=[task.id for task in owned],
+            statuses={task.id: task.status for task in owned},
+            batch_ids=sorted({task.batch_id for task in owned if getattr(task, "batch_id", None)}),
+        )
+
+
+async def user_events(user_id: int, is_admin: bool = False, heartbeat: float = 15.0) -> AsyncIterator[Optional[dict]]:
+    """
+    Yield a "ready" event once subscribed, then events for the user (every user's for
+    admins); None after `heartbeat` idle seconds.
+    """
+    pubsub = get_redis().pubsub()
+    await pubsub.subscribe(_ADMIN_CHANNEL if is_admin else _USER_CHANNEL.format(user_id=user_id))
+    try:
+        # Clients re-fetch on "ready", so nothing published before it is missed
+        yield {"event": "ready"}
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            if message is None:
+                yield None
+                continue
+            yield json.loads(message["data"])
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
@@ -71,20 +71,26 @@ class FingerprintService:
             "phone_id": phone_id
         }
 
+    def build_fingerprint(self, user_id: int = None) -> dict:
+        """Column values for a new Fingerprint row, generated in memory (no database access)."""
+        data = self.generate_new_fingerprint_data()
+        return {
+            "user_agent": data["user_agent"],
+            "screen_resolution": data["screen_resolution"],
+            "browser_version": data["device_settings"].get("app_version", "unknown"),
+            "os_type": f"Android {data['device_settings'].get('android_release')}",
+            "raw_fingerprint": data,
+            "user_id": user_id,
+        }
+
     async def create_fingerprint(self, user_id: int = None) -> Fingerprint:
         try:
             print(f"FingerprintService: Generating fingerprint data for user_id={user_id}...")
-            data = self.generate_new_fingerprint_data()
+            values = self.build_fingerprint(user_id)
+            data = values["raw_fingerprint"]
             print(f"FingerprintService: Generated data for {data['device_settings']['manufacturer']} {data['device_settings']['model']}")
             
-            fp = Fingerprint(
-                user_agent=data["user_agent"],
-                screen_resolution=data["screen_resolution"],
-                browser_version=data["device_settings"].get("app_version", "unknown"),
-                os_type=f"Android {data['device_settings'].get('android_release')}",
-                raw_fingerprint=data,
-                user_id=user_id
-            )
+            fp = Fingerprint(**values)
             
             print("FingerprintService: Adding to database...")
             self.db.add(fp)
@@ -4,6 +4,9 @@ from instagrapi.exceptions import TwoFactorRequired, ChallengeRequired, LoginReq
 from app.models.account import Account, Fingerprint
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
 
 class InstagramService:
     def __init__(self, account: Account, fingerprint: Fingerprint):
@@ -18,24 +21,24 @@ class InstagramService:
         # 1. Set Proxy FIRST (consistent environment)
         if self.account.proxy:
             self.client.set_proxy(self.account.proxy)
-            print(f"Proxy set for {self.account.username}: {self.account.proxy[:30]}...")
+            logger.debug("Proxy set for %s: %s...", self.account.username, self.account.proxy[:30])
 
         # 2. Load Session Cookies if available
         session_loaded = False
         if self.account.cookies:
             try:
                 self.client.set_settings(self.account.cookies)
-                print(f"Loaded existing session cookies for {self.account.username}")
+                logger.debug("Loaded existing session cookies for %s", self.account.username)
                 session_loaded = True
             except Exception as e:
-                print(f"Failed to load cookies for {self.account.username}: {e}")
+                logger.warning("Failed to load cookies for %s: %s", self.account.username, e)
         
         # 3. Apply Fingerprint only if no session loaded or session load failed
         # This prevents session/device mismatch which triggers checkpoints.
         if not session_loaded:
             fp_data = self.fingerprint.raw_fingerprint
             if fp_data:
-                print(f"Applying fingerprint settings for {self.account.username}")
+                logger.debug("Applying fingerprint settings for %s", self.account.username)
                 if "device_settings" in fp_data:
                     self.client.set_device(fp_data["device_settings"])
                 
@@ -49,11 +52,9 @@ class InstagramService:
                 # if "uuid" in fp_data:
                 #     self.client.uuid = fp_data["uuid"]
         else:
-            print(f"Skipping fingerprint application for {self.account.username} (using settings from session)")
+            logger.debug("Skipping fingerprint application for %s (using settings from session)", self.account.username)
 
-        # Final Verification Log
-        print(f"Client configured for {self.account.username}:")
-        print(f"  - User-Agent: {self.client.user_agent}")
+        logger.debug("Client configured for %s (User-Agent: %s)", self.account.username, self.client.user_agent)
 
     def _clean_2fa_seed(self, seed: str) -> str:
         """Clean the 2FA seed - remove spaces and convert to uppercase."""
@@ -70,7 +71,7 @@ class InstagramService:
         
         totp = pyotp.TOTP(clean_seed)
         code = totp.now()
-        print(f"Generated 2FA code: {code} for user {self.account.username}")
+        logger.debug("Generated 2FA code for %s", self.account.username)
         return code
 
     def login(self, force_full_login: bool = False) -> Dict[str, Any]:
@@ -88,13 +89,13 @@ class InstagramService:
             jitter = random.uniform(1.0, 3.0)
             time.sleep(jitter)
             
-            print(f"Starting login for {self.account.username}, method: {self.account.login_method} (jitter: {jitter:.2f}s, force: {force_full_login})")
+            logger.info("Starting login for %s, method: %s (jitter: %.2fs, force: %s)", self.account.username, self.account.login_method, jitter, force_full_login)
             
             # GREEDY SESSION REUSE or EXPLICIT COOKIE LOGIN (Method 3)
             # Always try cookies first if available, or if method is 3
             if (self.account.cookies or self.account.login_method == 3) and not force_full_login:
                 try:
-                    print(f"Attempting cookie-based login (Method: {self.account.login_method})...")
+                    logger.info("Attempting cookie-based login for %s (method: %s)", self.account.username, self.account.login_method)
                     # Settings are already loaded in _setup_client
                     
                     # If we have no cookies stored but method is 3, we can't proceed
@@ -105,31 +106,31 @@ class InstagramService:
                     if session_id:
                         # login_by_sessionid is fast and doesn't trigger 2FA
                         if self.client.login_by_sessionid(session_id):
-                            print(f"Session successfully reused for {self.account.username}")
+                            logger.info("Session successfully reused for %s", self.account.username)
                             updates["status"] = "active"
                             # Refresh settings in case they updated
                             updates["cookies"] = self.client.get_settings()
                             updates["last_login_state"] = updates["cookies"]
                             return updates
                         else:
-                            print(f"login_by_sessionid returned False for {self.account.username}")
+                            logger.info("login_by_sessionid returned False for %s", self.account.username)
                     
                     # Fallback to general settings load if sessionid alone didn't work
                     # (This is already mostly handled by self.client.set_settings in __init__)
                     self.client.get_timeline_feed()
-                    print(f"Session verified via get_timeline_feed for {self.account.username}")
+                    logger.info("Session verified via get_timeline_feed for %s", self.account.username)
                     updates["status"] = "active"
                     return updates
 
                 except Exception as e:
-                    print(f"Cookie login failed for {self.account.username}: {e}")
+                    logger.warning("Cookie login failed for %s: %s", self.account.username, e)
                     if self.account.login_method == 3:
                         # If explicitly using cookies and it failed, we shouldn't just 
                         # fallback to password if password might not exist or isn't intended
                         if not self.account.password_encrypted:
                             updates["status"] = "expired"
                             raise ValueError(f"Cookie session expired or invalid for @{self.account.username}. Please re-export cookies.")
-                        print("Cookie failed, falling back to password/2FA since credentials exist.")
+                        logger.info("Cookie login failed for %s, falling back to password/2FA since credentials exist", self.account.username)
 
             # Get password
             password = self.account.password_encrypted
@@ -139,7 +140,7 @@ class InstagramService:
 
             # Method 2: 2FA Login
             if self.account.login_method == 2 and self.account.seed_2fa:
-                print("Attempting 2FA login...")
+                logger.info("Attempting 2FA login for %s", self.account.username)
                 try:
                     verification_code = self._generate_2fa_code()
                     self.client.login(
@@ -148,7 +149,7 @@ class InstagramService:
                         verification_code=verification_code
                     )
                 except TwoFactorRequired:
-                    print("2FA required, generating new code...")
+                    logger.info("2FA required for %s, generating new code", self.account.username)
                     time.sleep(1)
                     verification_code = self._generate_2fa_code()
                     self.client.login(
@@ -158,16 +159,16 @@ class InstagramService:
                     )
             else:
                 # Default: Password only
-                print("Attempting password login...")
+                logger.info("Attempting password login for %s", self.account.username)
                 try:
                     self.client.login(self.account.username, password)
                 except TwoFactorRequired:
-                    print("Account requires 2FA but no seed provided!")
+                    logger.warning("Account %s requires 2FA but no seed provided", self.account.username)
                     updates["status"] = "challenge"
                     raise ValueError("Account requires 2FA authentication. Please provide 2FA seed.")
             
             # Save new settings/cookies
-            print(f"Login successful for {self.account.username}!")
+            logger.info("Login successful for %s", self.account.username)
             new_settings = self.client.get_settings()
             updates["cookies"] = new_settings
             updates["last_login_state"] = new_settings
@@ -181,11 +182,11 @@ class InstagramService:
                 if threads_id and str(threads_id) != "0":
                     updates["threads_profile_id"] = str(threads_id)
                     updates["has_threads"] = True
-                    print(f"Threads detected for {self.account.username}: {threads_id}")
+                    logger.info("Threads detected for %s: %s", self.account.username, threads_id)
                 else:
                     updates["has_threads"] = False
             except Exception as e:
-                print(f"Failed to detect Threads for {self.account.username}: {e}")
+                logger.warning("Failed to detect Threads for %s: %s", self.account.username, e)
 
             # Post-login warmup
             self.warmup()
@@ -194,31 +195,29 @@ class InstagramService:
             
         except ChallengeRequired as e:
             updates["status"] = "challenge"
-            print(f"Challenge required for {self.account.username}: {e}")
+            logger.warning("Challenge required for %s: %s", self.account.username, e)
             raise e
         except Exception as e:
             error_msg = str(e)
             if "EOF when reading a line" in error_msg:
-                print(f"Connection reset (EOF) for {self.account.username}. Retrying once...")
+                logger.warning("Connection reset (EOF) for %s, retrying once", self.account.username)
                 import time
                 time.sleep(5)
                 # Recurse once with a flag to avoid infinite loops? 
                 # For simplicity, we can just re-execute the core login logic once
                 try:
                     self.client.login(self.account.username, self.account.password_encrypted)
-                    print(f"Login successful for {self.account.username} after EOF retry!")
+                    logger.info("Login successful for %s after EOF retry", self.account.username)
                     updates["cookies"] = self.client.get_settings()
                     updates["last_login_state"] = self.client.get_settings()
                     updates["status"] = "active"
                     return updates
                 except Exception as retry_e:
-                    print(f"Retry failed for {self.account.username}: {retry_e}")
+                    logger.warning("Retry failed for %s: %s", self.account.username, retry_e)
                     raise retry_e
 
             updates["status"] = "failed"
-            print(f"Login failed for {self.account.username}: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Login failed for %s: %s: %s", self.account.username, type(e).__name__, e)
             raise e
 
     def check_session(self) -> Dict[str, Any]:
@@ -228,11 +227,11 @@ class InstagramService:
         """
         updates = {}
         try:
-            print(f"Checking session for {self.account.username}...")
+            logger.info("Checking session for %s", self.account.username)
             # Try to fetch some private data to verify session
             self.client.get_timeline_feed()
             updates["status"] = "active"
-            print(f"Session valid for {self.account.username}")
+            logger.info("Session valid for %s", self.account.username)
             
             # Threads Detection during check
             try:
@@ -248,28 +247,28 @@ class InstagramService:
             return updates
         except LoginRequired:
             updates["status"] = "expired"
-            print(f"Session expired for {self.account.username}")
+            logger.info("Session expired for %s", self.account.username)
             return updates
         except Exception as e:
             updates["status"] = "failed"
-            print(f"Session check failed for {self.account.username}: {e}")
+            logger.warning("Session check failed for %s: %s", self.account.username, e)
             return updates
 
     def reconnect(self):
         """Full reset of the client to clear any stale state/attachments."""
-        print(f"Reconnecting client for {self.account.username}...")
+        logger.info("Reconnecting client for %s", self.account.username)
         self.client = Client()
         self._setup_client()
 
     def warmup(self):
         """Perform light requests to stabilize the session before hard actions."""
         try:
-            print(f"Performing warm-up for {self.account.username}...")
+            logger.info("Performing warm-up for %s", self.account.username)
             # Use timeline feed as it's a standard home-page action
             self.client.get_timeline_feed()
             return True
         except Exception as e:
-            print(f"Warm-up failed for {self.account.username}: {e}")
+            logger.warning("Warm-up failed for %s: %s", self.account.username, e)
             return False
 
     def post_photo(self, path: str, caption: str, share_to_threads: bool = False):
@@ -278,14 +277,14 @@ class InstagramService:
             extra_data["share_to_threads"] = True
         return self.client.photo_upload(path, caption, extra_data=extra_data)
         
-    def post_reel(self, path: str, caption: str, share_to_threads: bool = False):
-        """Upload a video as a Reel."""
+    def post_reel(self, path: str, caption: str, share_to_threads: bool = False, thumbnail: str = None):
+        """Upload a video as a Reel. A prebuilt thumbnail skips frame extraction."""
         extra_data = {}
         if share_to_threads:
             extra_data["share_to_threads"] = True
-        return self.client.clip_upload(path, caption, extra_data=extra_data)
+        return self.client.clip_upload(path, caption, thumbnail=thumbnail, extra_data=extra_data)
 
-    def post_story(self, path: str, caption: str = "", link: str = None):
+    def post_story(self, path: str, caption: str = "", link: str = None, thumbnail: str = None):
         """Upload a photo or video as a Story, optionally with a link."""
         from instagrapi.types import StoryLink
         
@@ -299,18 +298,16 @@ class InstagramService:
         
         try:
             if is_video:
-                result = self.client.video_upload_to_story(path, caption, links=links)
+                result = self.client.video_upload_to_story(path, caption, thumbnail=thumbnail, links=links)
             else:
                 result = self.client.photo_upload_to_story(path, caption, links=links)
             
-            with open("task_debug.log", "a") as f:
-                f.write(f"Story upload successful for {self.account.username}. Result: {result}\n")
+            logger.info("Story upload successful for %s (media %s)", self.account.username, getattr(result, "pk", result))
             return result
         except Exception as e:
             error_data = getattr(e, 'response', None)
             error_text = error_data.text if error_data else str(e)
-            with open("task_debug.log", "a") as f:
-                f.write(f"Story upload failed for {self.account.username}. Exception: {type(e).__name__}, Error: {error_text}\n")
+            logger.error("Story upload failed for %s: %s: %s", self.account.username, type(e).__name__, error_text)
             raise e
         
     def like_media(self, media_id: str):
@@ -323,5 +320,5 @@ class InstagramService:
         # Based on research, the private API uses 'share_to_threads' flag during upload,
         # but for existing media we might need a different endpoint.
         # For now, we will focus on cross-posting during upload.
-        print(f"Request to share media {media_id} to Threads (Not yet implemented for separate action)")
+        logger.info("Request to share media %s to Threads (not yet implemented for separate action)", media_id)
         pass
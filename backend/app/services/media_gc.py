@@ -0,0 +1,230 @@
+"""
+Media garbage collection and disk usage reporting.
+
+collect_media_garbage() recounts references from Task.params["media_path"], flags
+MediaObjects that nothing references, and deletes blobs (and their variants) that
+stayed unreferenced for MEDIA_GC_GRACE_HOURS. Abandoned .upload_* temp files are
+removed under the same rule. Uploads named the pre-content-addressed way
+("[reels_|story_]<account>_<timestamp>_<name>") are only reported, and deleted when
+an admin runs the GC with include_legacy; any other file in MEDIA_PATH is never
+touched. A MySQL named lock keeps concurrent runs (several dispatchers, Celery beat)
+from overlapping.
+"""
+import asyncio
+import logging
+import os
+import re
+import shutil
+import time
+from collections import Counter
+from datetime import timedelta
+from typing import Dict, Tuple
+
+from sqlalchemy import select, update, delete, func, text
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from app.core.config import settings
+from app.core.tz_utils import now_jakarta
+from app.db.session import worker_engine
+from app.models.media_object import MediaObject
+from app.models.task import Task
+
+logger = logging.getLogger(__name__)
+
+GC_LOCK_NAME = "media_gc"
+HASHED_NAME = re.compile(r"^([0-9a-f]{64})(\.[A-Za-z0-9]+)?$")
+TEMP_NAME = re.compile(r"^\.upload_[0-9a-f]{32}(\.[A-Za-z0-9]+)?$")
+LEGACY_NAME = re.compile(r"^(?:reels_|story_)?\d+_\d{9,}_.+$")
+
+
+def _scan_dir(path: str) -> Dict[str, Tuple[int, float]]:
+    """filename -> (size, mtime) for regular files directly in `path`."""
+    files = {}
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_file(follow_symlinks=False):
+                st = entry.stat(follow_symlinks=False)
+                files[entry.name] = (st.st_size, st.st_mtime)
+    return files
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _remove_blob(filename: str, sha256: str = None):
+    try:
+        os.remove(os.path.join(settings.MEDIA_PATH, filename))
+    except FileNotFoundError:
+        pass
+    if sha256:
+        shutil.rmtree(os.path.join(settings.MEDIA_VARIANTS_PATH, sha256), ignore_errors=True)
+
+
+async def _reference_counts(conn) -> Counter:
+    """Referenced media filenames (basename of params.media_path) -> number of tasks."""
+    media_path = func.json_unquote(func.json_extract(Task.params, "$.media_path"))
+    rows = (await conn.execute(
+        select(media_path.label("media_path"), func.count(Task.id))
+        .where(media_path.isnot(None))
+        .group_by(media_path)
+    )).all()
+    refs = Counter()
+    for path, count in rows:
+        refs[os.path.basename(path.replace("\\", "/"))] += count
+    return refs
+
+
+def _reclaimable_legacy(files: Dict[str, Tuple[int, float]], refs: Counter, cutoff_ts: float) -> Dict[str, int]:
+    """Legacy-named uploads no task references and older than the grace period -> size."""
+    return {
+        name: size for name, (size, mtime) in files.items()
+        if LEGACY_NAME.match(name) and not refs.get(name) and mtime <= cutoff_ts
+    }
+
+
+async def collect_media_garbage(include_legacy: bool = False) -> dict:
+    """
+    Reclaim unreferenced blobs and stale temp files. Unreferenced legacy uploads are
+    counted in "legacy_unreferenced", and only deleted with include_legacy.
+    """
+    grace = timedelta(hours=settings.MEDIA_GC_GRACE_HOURS)
+    now = now_jakarta()
+    cutoff = now - grace
+    cutoff_ts = time.time() - grace.total_seconds()
+    stats = {
+        "registered": 0, "unreferenced": 0, "deleted": 0, "temp_deleted": 0,
+        "legacy_unreferenced": 0, "legacy_deleted": 0, "bytes_freed": 0,
+    }
+
+    async with worker_engine.connect() as conn:
+        if not (await conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": GC_LOCK_NAME})).scalar():
+            return {"skipped": "another GC run holds the lock"}
+        try:
+            refs = await _reference_counts(conn)
+            files = await asyncio.to_thread(_scan_dir, settings.MEDIA_PATH)
+            objects = {o.sha256: o for o in (await conn.execute(select(MediaObject))).all()}
+
+            # Content-addressed files stored before their row existed (or whose row was lost)
+            for name, (size, _) in files.items():
+                match = HASHED_NAME.match(name)
+                if match and match.group(1) not in objects:
+                    await conn.execute(mysql_insert(MediaObject).values(
+                        sha256=match.group(1), filename=name, size_bytes=size, ref_count=0, created_at=now
+                    ).prefix_with("IGNORE"))
+                    stats["registered"] += 1
+            if stats["registered"]:
+                objects = {o.sha256: o for o in (await conn.execute(select(MediaObject))).all()}
+
+            # Refresh reference counts and unreferenced markers
+            for obj in objects.values():
+                count = refs.get(obj.filename, 0)
+                values = {"ref_count": count}
+                if count:
+                    values["unreferenced_since"] = None
+                elif obj.unreferenced_since is None:
+                    values["unreferenced_since"] = now
+                    stats["unreferenced"] += 1
+                if count != obj.ref_count or "unreferenced_since" in values:
+                    await conn.execute(update(MediaObject).where(MediaObject.sha256 == obj.sha256).values(**values))
+            await conn.commit()
+
+            # Reclaim objects unreferenced past the grace period. The conditional delete loses
+            # to a concurrent upload that revived the object; a fresh mtime marks a dedup reuse.
+            for obj in objects.values():
+                if refs.get(obj.filename, 0) or obj.unreferenced_since is None or obj.unreferenced_since > cutoff.replace(tzinfo=None):
+                    continue
+                size, mtime = files.get(obj.filename, (0, 0))
+                if mtime > cutoff_ts:
+                    continue
+                result = await conn.execute(
+                    delete(MediaObject).where(
+                        MediaObject.sha256 == obj.sha256,
+                        MediaObject.ref_count == 0,
+                        MediaObject.unreferenced_since <= cutoff
+                    )
+                )
+                await conn.commit()
+                if result.rowcount:
+                    await asyncio.to_thread(_remove_blob, obj.filename, obj.sha256)
+                    stats["deleted"] += 1
+                    stats["bytes_freed"] += size
+
+            # Temp files of uploads that never finished
+            for name, (size, mtime) in files.items():
+                if TEMP_NAME.match(name) and mtime <= cutoff_ts:
+                    await asyncio.to_thread(_remove_blob, name)
+                    stats["temp_deleted"] += 1
+                    stats["bytes_freed"] += size
+
+            legacy = _reclaimable_legacy(files, refs, cutoff_ts)
+            stats["legacy_unreferenced"] = len(legacy)
+            if include_legacy:
+                for name, size in legacy.items():
+                    await asyncio.to_thread(_remove_blob, name)
+                    stats["legacy_deleted"] += 1
+                    stats["bytes_freed"] += size
+        finally:
+            await conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": GC_LOCK_NAME})
+
+    if stats["bytes_freed"]:
+        logger.info("Media GC freed %.1f MB (%s blobs, %s temp files, %s legacy files)",
+                    stats["bytes_freed"] / 1024 / 1024, stats["deleted"], stats["temp_deleted"], stats["legacy_deleted"])
+    return stats
+
+
+async def media_usage(db) -> dict:
+    """Disk usage of the media volume, split by reference state."""
+    files = await asyncio.to_thread(_scan_dir, settings.MEDIA_PATH)
+    variants_bytes = await asyncio.to_thread(_dir_size, settings.MEDIA_VARIANTS_PATH)
+
+    row = (await db.execute(
+        select(
+            func.count(MediaObject.sha256),
+            func.coalesce(func.sum(MediaObject.size_bytes), 0),
+            func.coalesce(func.sum(MediaObject.ref_count), 0),
+        )
+    )).one()
+    unref = (await db.execute(
+        select(func.count(MediaObject.sha256), func.coalesce(func.sum(MediaObject.size_bytes), 0))
+        .where(MediaObject.ref_count == 0)
+    )).one()
+
+    cutoff_ts = time.time() - settings.MEDIA_GC_GRACE_HOURS * 3600
+    refs = await _reference_counts(db)
+    hashed = {name: size for name, (size, _) in files.items() if HASHED_NAME.match(name)}
+    temp = {name: size for name, (size, _) in files.items() if TEMP_NAME.match(name)}
+    legacy = {name: size for name, (size, _) in files.items() if LEGACY_NAME.match(name)}
+    reclaimable = _reclaimable_legacy(files, refs, cutoff_ts)
+    other = {name: size for name, (size, _) in files.items() if name not in hashed and name not in temp and name not in legacy}
+    return {
+        "media_path": settings.MEDIA_PATH,
+        "total_bytes": sum(size for size, _ in files.values()) + variants_bytes,
+        "objects": {
+            "count": row[0],
+            "bytes": int(row[1]),
+            "references": int(row[2]),
+            "unreferenced_count": unref[0],
+            "unreferenced_bytes": int(unref[1]),
+        },
+        "content_addressed_files": {"count": len(hashed), "bytes": sum(hashed.values())},
+        "legacy_files": {
+            "count": len(legacy),
+            "bytes": sum(legacy.values()),
+            # Deleted by POST /admin/media/gc?include_legacy=true
+            "unreferenced_count": len(reclaimable),
+            "unreferenced_bytes": sum(reclaimable.values()),
+        },
+        "temp_files": {"count": len(temp), "bytes": sum(temp.values())},
+        # Not written by this service; never deleted
+        "other_files": {"count": len(other), "bytes": sum(other.values())},
+        "variants_bytes": variants_bytes,
+        "gc_grace_hours": settings.MEDIA_GC_GRACE_HOURS,
+    }
@@ -0,0 +1,206 @@
+"""
+Upload-ready media variants, built once per content hash in a process pool.
+
+At upload time the API schedules preprocessing of the stored file; at execution time
+the worker awaits the same build if it is not finished yet. Variants live in
+settings.MEDIA_VARIANTS_PATH/<sha256>/ next to a manifest.json:
+
+- images: "feed" (padded into Instagram's 4:5..1.91:1 range, max 1080 wide) and
+  "story" (1080x1920, letterboxed to 9:16); nothing of the photo is cut off
+- videos: "thumbnail" (frame used as reel/story cover), plus probed duration and size;
+  the video itself is not transcoded or resized, tasks upload the original file
+
+Pillow and moviepy are optional here (instagrapi pulls them in); without them no
+variants are built and tasks upload the original file as before.
+"""
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.services.media_store import VIDEO_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+FEED_MAX_WIDTH = 1080
+FEED_MIN_RATIO = 4 / 5
+FEED_MAX_RATIO = 1.91
+STORY_SIZE = (1080, 1920)
+FEED_PAD_COLOR = (255, 255, 255)
+STORY_PAD_COLOR = (0, 0, 0)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending: Dict[str, asyncio.Future] = {}
+_background = set()
+
+
+# --- Runs in the worker processes -------------------------------------------------
+
+def _pad_to_ratio(img, min_ratio: float, max_ratio: float, color):
+    from PIL import ImageOps
+
+    width, height = img.size
+    ratio = width / height
+    if ratio > max_ratio:
+        return ImageOps.pad(img, (width, math.ceil(width / max_ratio)), color=color)
+    if ratio < min_ratio:
+        return ImageOps.pad(img, (math.ceil(height * min_ratio), height), color=color)
+    return img
+
+
+def _image_variants(src: str, out_dir: str, manifest: dict):
+    from PIL import Image, ImageOps
+
+    with Image.open(src) as opened:
+        img = ImageOps.exif_transpose(opened).convert("RGB")
+    manifest["width"], manifest["height"] = img.size
+
+    feed = _pad_to_ratio(img, FEED_MIN_RATIO, FEED_MAX_RATIO, FEED_PAD_COLOR)
+    if feed.width > FEED_MAX_WIDTH:
+        feed = feed.resize((FEED_MAX_WIDTH, round(feed.height * FEED_MAX_WIDTH / feed.width)), Image.LANCZOS)
+    feed.save(os.path.join(out_dir, "feed.jpg"), "JPEG", quality=95)
+    manifest["variants"]["feed"] = "feed.jpg"
+
+    story = ImageOps.pad(img, STORY_SIZE, Image.LANCZOS, color=STORY_PAD_COLOR)
+    story.save(os.path.join(out_dir, "story.jpg"), "JPEG", quality=95)
+    manifest["variants"]["story"] = "story.jpg"
+
+
+def _video_variants(src: str, out_dir: str, manifest: dict):
+    try:
+        from moviepy import VideoFileClip
+    except ImportError:
+        from moviepy.editor import VideoFileClip
+
+    clip = VideoFileClip(src)
+    try:
+        manifest["width"], manifest["height"] = clip.size
+        manifest["duration"] = clip.duration
+        thumb_at = min(1.0, (clip.duration or 0) / 2)
+        clip.save_frame(os.path.join(out_dir, "thumbnail.jpg"), t=thumb_at)
+        manifest["variants"]["thumbnail"] = "thumbnail.jpg"
+    finally:
+        clip.close()
+
+
+def build_variants(src: str, sha256: str, variants_root: str) -> dict:
+    """Build variants for one media file and return its manifest (process-pool entry point)."""
+    final_dir = os.path.join(variants_root, sha256)
+    manifest_path = os.path.join(final_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            return json.load(f)
+
+    is_video = os.path.splitext(src)[1].lower() in VIDEO_EXTENSIONS
+    manifest = {"sha256": sha256, "source": os.path.basename(src), "kind": "video" if is_video else "image", "variants": {}}
+
+    # Build in a private directory and rename it into place, so concurrent builders
+    # (API and worker containers) never see a half-written variant set
+    tmp_dir = os.path.join(variants_root, f".tmp_{sha256}_{uuid.uuid4().hex[:8]}")
+    os.makedirs(tmp_dir, exist_ok=True)
+    try:
+        try:
+            if is_video:
+                _video_variants(src, tmp_dir, manifest)
+            else:
+                _image_variants(src, tmp_dir, manifest)
+        except ImportError as e:
+            # Not cached: variants get built once the dependency is installed
+            manifest["variants"] = {}
+            manifest["error"] = f"{type(e).__name__}: {e}"
+            return manifest
+        except Exception as e:
+            # Unsupported/corrupt media or missing Pillow/moviepy: fall back to the original
+            manifest["variants"] = {}
+            manifest["error"] = f"{type(e).__name__}: {e}"
+
+        with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+            json.dump(manifest, f)
+        try:
+            os.rename(tmp_dir, final_dir)
+        except OSError:
+            # Another process won the race; keep its result
+            pass
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return manifest
+
+
+# --- Async side ---------------------------------------------------------------------
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn: never fork a process that runs an event loop and DB pools
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.MEDIA_PREPROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def load_manifest(sha256: Optional[str]) -> Optional[dict]:
+    if not sha256:
+        return None
+    path = os.path.join(settings.MEDIA_VARIANTS_PATH, sha256, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+async def ensure_variants(sha256: Optional[str], src: str) -> Optional[dict]:
+    """
+    Return the manifest for this media, building it in the process pool if needed.
+    Concurrent callers for the same hash share one build. Returns None when disabled.
+    """
+    if not sha256 or settings.MEDIA_PREPROCESS_WORKERS <= 0:
+        return None
+    manifest = await asyncio.to_thread(load_manifest, sha256)
+    if manifest is not None:
+        return manifest
+
+    future = _pending.get(sha256)
+    if future is None:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(_get_executor(), build_variants, src, sha256, settings.MEDIA_VARIANTS_PATH)
+        _pending[sha256] = future
+        future.add_done_callback(lambda _: _pending.pop(sha256, None))
+    return await asyncio.shield(future)
+
+
+def variant_path(manifest: Optional[dict], name: str) -> Optional[str]:
+    """Absolute path of a built variant, or None to use the original file."""
+    if not manifest:
+        return None
+    filename = manifest.get("variants", {}).get(name)
+    if not filename:
+        return None
+    path = os.path.join(settings.MEDIA_VARIANTS_PATH, manifest["sha256"], filename)
+    return path if os.path.exists(path) else None
+
+
+def schedule_preprocess(sha256: str, src: str):
+    """Fire-and-forget variant build right after an upload."""
+    if settings.MEDIA_PREPROCESS_WORKERS <= 0:
+        return
+
+    async def _run():
+        try:
+            manifest = await ensure_variants(sha256, src)
+            if manifest and manifest.get("error"):
+                logger.info("Media preprocessing skipped for %s: %s", sha256[:12], manifest["error"])
+        except Exception as e:
+            logger.exception("Media preprocessing failed for %s: %s", sha256[:12], e)
+
+    task = asyncio.create_task(_run())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
@@ -0,0 +1,152 @@
+"""
+Content-addressed storage for uploaded task media.
+
+Uploads are streamed in chunks, written off the event loop and hashed on the fly.
+Files are stored in settings.MEDIA_PATH as "<sha256><ext>", so scheduling the same
+video to many accounts stores it once. Tasks keep referencing the file by name
+through params["media_path"] (plus params["media_hash"]); each blob has a
+MediaObject row (see register_media) that the media GC uses to reclaim it. A hash
+is stored under one name only: the same bytes uploaded again with another
+extension reuse the file (and name) already recorded for that hash.
+"""
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from app.core.config import settings
+from app.core.tz_utils import now_jakarta
+from app.models.media_object import MediaObject
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".m4v", ".avi", ".mkv", ".webm"}
+# Spellings of the same format, stored under one extension
+EXTENSION_ALIASES = {".jpeg": ".jpg", ".jpe": ".jpg", ".jfif": ".jpg", ".tif": ".tiff", ".qt": ".mov"}
+
+
+@dataclass
+class StoredMedia:
+    filename: str  # Relative to settings.MEDIA_PATH, stored in Task.params["media_path"]
+    sha256: str
+    size: int
+    deduplicated: bool  # True if an identical file was already stored
+
+
+def _extension(upload: UploadFile) -> str:
+    ext = os.path.splitext(upload.filename or "")[1].lower()
+    # Keep names filesystem-safe; the extension drives format detection in instagrapi
+    if not ext[1:].isalnum():
+        return ""
+    return EXTENSION_ALIASES.get(ext, ext)
+
+
+def max_upload_bytes(ext: str) -> int:
+    limit_mb = settings.MEDIA_MAX_VIDEO_MB if ext in VIDEO_EXTENSIONS else settings.MEDIA_MAX_IMAGE_MB
+    return limit_mb * 1024 * 1024
+
+
+def _write_chunk(fh, hasher, chunk: bytes):
+    fh.write(chunk)
+    hasher.update(chunk)
+
+
+def _finalize(tmp_path: str, final_path: str) -> bool:
+    """Move the temp file into place; returns True if the content was already stored."""
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+        # Fresh mtime keeps the media GC from reclaiming a blob that was just reused
+        os.utime(final_path)
+        return True
+    os.replace(tmp_path, final_path)
+    return False
+
+
+async def save_upload(upload: UploadFile) -> StoredMedia:
+    """
+    Stream an UploadFile into the media store.
+    Raises HTTPException(413) when the file exceeds the configured size limit.
+    """
+    ext = _extension(upload)
+    limit = max_upload_bytes(ext)
+    declared_size = getattr(upload, "size", None)
+    if declared_size is not None and declared_size > limit:
+        raise HTTPException(status_code=413, detail=f"File too large (max {limit // (1024 * 1024)} MB)")
+
+    media_dir = settings.MEDIA_PATH
+    tmp_path = os.path.join(media_dir, f".upload_{uuid.uuid4().hex}{ext}")
+    hasher = hashlib.sha256()
+    size = 0
+
+    fh = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        try:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(status_code=413, detail=f"File too large (max {limit // (1024 * 1024)} MB)")
+                await asyncio.to_thread(_write_chunk, fh, hasher, chunk)
+        finally:
+            await asyncio.to_thread(fh.close)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+
+        digest = hasher.hexdigest()
+        filename = f"{digest}{ext}"
+        deduplicated = await asyncio.to_thread(_finalize, tmp_path, os.path.join(media_dir, filename))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return StoredMedia(filename=filename, sha256=digest, size=size, deduplicated=deduplicated)
+
+
+def _drop_duplicate(filename: str, canonical: str) -> bool:
+    """Remove a just-written copy when the hash is already stored as `canonical`."""
+    canonical_path = os.path.join(settings.MEDIA_PATH, canonical)
+    if not os.path.exists(canonical_path):
+        return False
+    os.utime(canonical_path)
+    try:
+        os.remove(os.path.join(settings.MEDIA_PATH, filename))
+    except FileNotFoundError:
+        pass
+    return True
+
+
+async def register_media(db, stored: StoredMedia):
+    """
+    Record (or revive) the MediaObject for a stored upload; committed with the caller's
+    tasks. If the hash is already recorded under another name, `stored` is pointed at
+    that file, so tasks reference the one file the media GC tracks. Call before using
+    stored.filename.
+    """
+    known = (await db.execute(select(MediaObject.filename).where(MediaObject.sha256 == stored.sha256))).scalar()
+    if known and known != stored.filename:
+        # A name that existed before this upload may be referenced by older tasks; keep it
+        if not stored.deduplicated and await asyncio.to_thread(_drop_duplicate, stored.filename, known):
+            stored.filename = known
+            stored.deduplicated = True
+        elif not stored.deduplicated:
+            # The recorded file is gone; track the new one instead
+            await db.execute(update(MediaObject).where(MediaObject.sha256 == stored.sha256).values(filename=stored.filename))
+    now = now_jakarta()
+    stmt = mysql_insert(MediaObject).values(
+        sha256=stored.sha256,
+        filename=stored.filename,
+        size_bytes=stored.size,
+        ref_count=0,
+        created_at=now,
+        last_referenced_at=now,
+    )
+    await db.execute(stmt.on_duplicate_key_update(unreferenced_since=None, last_referenced_at=now))
@@ -0,0 +1,65 @@
+"""
+Proxy distribution: least-loaded assignment with set-based writes.
+
+plan_distribution() is pure: it hands each candidate account (active ones first) the
+proxy URL with the fewest accounts, using a heap keyed by current usage, and drops a
+proxy once it reaches the per-proxy cap. apply_proxy_updates() then writes all changes
+with a few chunked `UPDATE accounts SET proxy = CASE id WHEN ... END` statements
+instead of one dirty-row flush per account, so row locks are held only for the writes.
+"""
+import heapq
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import update, case
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.account import Account
+
+UPDATE_CHUNK_SIZE = 500
+
+
+def is_active(status: Optional[str]) -> bool:
+    return (status or "").lower().strip() == "active"
+
+
+def plan_distribution(
+    candidates: List[Tuple[int, Optional[str]]],
+    proxy_urls: Iterable[str],
+    usage: Dict[str, int],
+    max_per_proxy: int,
+) -> Dict[int, str]:
+    """
+    Assign proxies to `candidates` ((account_id, status) in priority order).
+    `usage` counts accounts already on each proxy that are not candidates.
+    Returns account_id -> proxy URL for every account that got a slot.
+    """
+    # (usage, random tiebreak, url): equally loaded proxies are picked in random order
+    heap = [(usage.get(url, 0), random.random(), url) for url in set(proxy_urls) if usage.get(url, 0) < max_per_proxy]
+    heapq.heapify(heap)
+
+    plan = {}
+    for account_id, _ in candidates:
+        if not heap:
+            break
+        count, _, url = heapq.heappop(heap)
+        plan[account_id] = url
+        if count + 1 < max_per_proxy:
+            heapq.heappush(heap, (count + 1, random.random(), url))
+    return plan
+
+
+async def apply_proxy_updates(db: AsyncSession, changes: Dict[int, Optional[str]]) -> int:
+    """Write account_id -> proxy (None clears it) in chunked CASE updates. Does not commit."""
+    items = list(changes.items())
+    updated = 0
+    for start in range(0, len(items), UPDATE_CHUNK_SIZE):
+        chunk = dict(items[start:start + UPDATE_CHUNK_SIZE])
+        result = await db.execute(
+            update(Account)
+            .where(Account.id.in_(chunk))
+            .values(proxy=case(chunk, value=Account.id))
+            .execution_options(synchronize_session=False)
+        )
+        updated += result.rowcount
+    return updated
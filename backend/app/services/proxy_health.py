@@ -0,0 +1,210 @@
+"""
+Background proxy health checks.
+
+run_proxy_health_checks() probes every distinct proxy URL found in ProxyTemplate and
+ProxyAssignment concurrently (at most PROXY_PROBE_CONCURRENCY at once) by fetching
+PROXY_PROBE_URL through it, and stores latency, success and exit IP in
+proxy_health_checks. The target is configurable so tests or air-gapped installs can
+point it at a local stand-in; JSON responses with "query" (ip-api.com), "ip" or
+"origin" fields, or a plain-text IP, are understood.
+
+Runs every PROXY_PROBE_INTERVAL seconds from the dispatcher / Celery beat; a MySQL
+named lock keeps replicas from probing at the same time.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import select, insert, delete, func, case, text
+
+from app.core.config import settings
+from app.core.tz_utils import now_jakarta
+from app.db.session import worker_engine
+from app.models.proxy import ProxyTemplate, ProxyHealthCheck
+from app.models.subscription import ProxyAssignment
+
+logger = logging.getLogger(__name__)
+
+PROBE_LOCK_NAME = "proxy_health_probe"
+RETENTION_DELETE_BATCH = 5000
+
+
+@dataclass
+class ProbeResult:
+    success: bool
+    latency_ms: Optional[float] = None
+    exit_ip: Optional[str] = None
+    country: Optional[str] = None
+    error: Optional[str] = None
+
+
+def proxy_key(proxy_url: str) -> str:
+    return hashlib.sha256(proxy_url.strip().encode()).hexdigest()[:16]
+
+
+def assignment_url(assignment: ProxyAssignment) -> str:
+    auth = ""
+    if assignment.proxy_username:
+        auth = f"{assignment.proxy_username}:{assignment.proxy_password or ''}@"
+    return f"http://{auth}{assignment.proxy_ip}:{assignment.proxy_port or 80}"
+
+
+async def probe_proxy(proxy_url: str, timeout: float = None) -> ProbeResult:
+    """Fetch PROXY_PROBE_URL through the proxy and report latency and exit IP."""
+    start = time.perf_counter()
+    try:
+        # A client is bound to one proxy, so each probe needs its own
+        async with httpx.AsyncClient(proxy=proxy_url, timeout=timeout or settings.PROXY_PROBE_TIMEOUT) as client:
+            response = await client.get(settings.PROXY_PROBE_URL, follow_redirects=True)
+            response.raise_for_status()
+        latency = (time.perf_counter() - start) * 1000
+        exit_ip = country = None
+        try:
+            data = response.json()
+            if isinstance(data, dict):
+                exit_ip = data.get("query") or data.get("ip") or data.get("origin")
+                country = data.get("country")
+        except ValueError:
+            exit_ip = response.text.strip()[:45] or None
+        return ProbeResult(success=True, latency_ms=round(latency, 2), exit_ip=exit_ip, country=country)
+    except Exception as e:
+        return ProbeResult(success=False, error=f"{type(e).__name__}: {e}"[:255])
+
+
+async def _probe_targets(conn) -> Dict[str, str]:
+    """proxy key -> URL for every distinct proxy in templates and assignments."""
+    targets = {}
+    for (url,) in (await conn.execute(select(ProxyTemplate.proxy_url).distinct())).all():
+        if url and url.strip():
+            targets[proxy_key(url)] = url.strip()
+    assignments = await conn.execute(
+        select(ProxyAssignment.proxy_ip, ProxyAssignment.proxy_port, ProxyAssignment.proxy_username, ProxyAssignment.proxy_password)
+    )
+    for row in assignments.all():
+        url = assignment_url(row)
+        targets[proxy_key(url)] = url
+    return targets
+
+
+async def run_proxy_health_checks() -> dict:
+    async with worker_engine.connect() as conn:
+        if not (await conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": PROBE_LOCK_NAME})).scalar():
+            return {"skipped": "another probe run holds the lock"}
+        try:
+            targets = await _probe_targets(conn)
+            await conn.commit()
+
+            semaphore = asyncio.Semaphore(max(1, settings.PROXY_PROBE_CONCURRENCY))
+
+            async def probe(key: str, url: str):
+                async with semaphore:
+                    return key, now_jakarta(), await probe_proxy(url)
+
+            results = await asyncio.gather(*(probe(key, url) for key, url in targets.items()))
+            rows = [
+                {
+                    "proxy_key": key,
+                    "checked_at": checked_at,
+                    "success": result.success,
+                    "latency_ms": round(result.latency_ms) if result.latency_ms is not None else None,
+                    "exit_ip": result.exit_ip,
+                    "error": result.error,
+                }
+                for key, checked_at, result in results
+            ]
+            if rows:
+                await conn.execute(insert(ProxyHealthCheck).values(rows))
+
+            # Retention, in batches so a large backlog never holds long locks
+            cutoff = now_jakarta() - timedelta(days=settings.PROXY_HEALTH_RETENTION_DAYS)
+            purged = 0
+            while True:
+                result = await conn.execute(
+                    delete(ProxyHealthCheck)
+                    .where(ProxyHealthCheck.checked_at < cutoff)
+                    .with_dialect_options(mysql_limit=RETENTION_DELETE_BATCH)
+                )
+                await conn.commit()
+                purged += result.rowcount
+                if result.rowcount < RETENTION_DELETE_BATCH:
+                    break
+        finally:
+            await conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": PROBE_LOCK_NAME})
+
+    failed = sum(1 for row in rows if not row["success"])
+    if failed:
+        logger.info("Proxy health: %s/%s proxies failed the probe", failed, len(rows))
+    return {"probed": len(rows), "failed": failed, "purged": purged}
+
+
+def _status(successes: int, checks: int, last_success: Optional[bool], avg_latency: Optional[float]) -> str:
+    if not checks:
+        return "unknown"
+    if not last_success:
+        return "dead"
+    if avg_latency is not None and avg_latency > settings.PROXY_SLOW_MS:
+        return "slow"
+    return "healthy"
+
+
+async def health_summary(db, proxies: List[dict], hours: int = 24) -> List[dict]:
+    """
+    Per-proxy health over the last `hours`: checks, success rate, average and worst
+    latency, and the latest probe. `proxies` are {"source", "id", "name", "proxy_url"}.
+    """
+    keys = {proxy_key(p["proxy_url"]) for p in proxies if p["proxy_url"]}
+    if not keys:
+        return []
+    since = now_jakarta() - timedelta(hours=hours)
+
+    aggregates = {
+        row.proxy_key: row
+        for row in (await db.execute(
+            select(
+                ProxyHealthCheck.proxy_key,
+                func.count(ProxyHealthCheck.id).label("checks"),
+                func.sum(case((ProxyHealthCheck.success, 1), else_=0)).label("successes"),
+                func.avg(ProxyHealthCheck.latency_ms).label("avg_latency_ms"),
+                func.max(ProxyHealthCheck.latency_ms).label("max_latency_ms"),
+                func.max(ProxyHealthCheck.id).label("last_id"),
+            )
+            .where(ProxyHealthCheck.proxy_key.in_(keys), ProxyHealthCheck.checked_at >= since)
+            .group_by(ProxyHealthCheck.proxy_key)
+        )).all()
+    }
+    last_ids = [row.last_id for row in aggregates.values()]
+    latest = {}
+    if last_ids:
+        latest = {
+            row.proxy_key: row
+            for row in (await db.execute(select(ProxyHealthCheck).where(ProxyHealthCheck.id.in_(last_ids)))).scalars()
+        }
+
+    summary = []
+    for p in proxies:
+        key = proxy_key(p["proxy_url"]) if p["proxy_url"] else None
+        agg = aggregates.get(key)
+        last = latest.get(key)
+        checks = agg.checks if agg else 0
+        successes = int(agg.successes or 0) if agg else 0
+        avg_latency = float(agg.avg_latency_ms) if agg and agg.avg_latency_ms is not None else None
+        summary.append({
+            "source": p["source"],
+            "id": p["id"],
+            "name": p["name"],
+            "status": _status(successes, checks, last.success if last else None, avg_latency),
+            "checks": checks,
+            "success_rate": round(successes / checks * 100, 1) if checks else None,
+            "avg_latency_ms": round(avg_latency) if avg_latency is not None else None,
+            "max_latency_ms": agg.max_latency_ms if agg else None,
+            "last_checked_at": last.checked_at if last else None,
+            "last_success": last.success if last else None,
+            "last_exit_ip": last.exit_ip if last else None,
+            "last_error": last.error if last else None,
+        })
+    return summary
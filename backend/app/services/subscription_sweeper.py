@@ -0,0 +1,179 @@
+"""
+Subscription expiry sweeper.
+
+Expiry used to be enforced lazily: every request from an expired user re-ran
+stop_user_tasks(), loading and mutating their tasks and proxies one by one.
+sweep_expired_subscriptions() runs every SUBSCRIPTION_SWEEP_INTERVAL seconds instead:
+subscriptions still marked 'active' past their end_date are flipped to 'expired'
+(which records the sweep, so each expiry is handled once), and users left without any
+active subscription get their pending tasks (and running tasks whose worker lease
+expired) failed and their proxy templates released with one set-based UPDATE each.
+Tasks an executor is still running under a live lease are left to finish, since its
+final write would overwrite ours and count the task twice. A second pass does the same
+for users that still have such tasks but no active, unexpired subscription at all
+(plans expired or cancelled by the central service, or never bought). A MySQL named
+lock keeps concurrent runs (several dispatchers, Celery beat) from overlapping.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import select, update, text, exists, or_, and_
+
+from app.core.tz_utils import now_jakarta
+from app.db.session import worker_engine
+from app.models.proxy import ProxyTemplate
+from app.models.subscription import Subscription, SubscriptionStatus
+from app.models.task import Task
+from app.services.batch_progress import record_batch_results, notify_batches_completed
+from app.services.dashboard_cache import invalidate_dashboard_stats
+from app.services.entitlements import invalidate_user_entitlements
+from app.services.task_counters import COUNTER_COLUMNS, count_rows_change
+
+logger = logging.getLogger(__name__)
+
+SWEEP_LOCK_NAME = "subscription_sweep"
+SWEEP_BATCH_SIZE = 500
+
+
+def _has_active_subscription(user_id_column, now):
+    return exists().where(
+        Subscription.user_id == user_id_column,
+        Subscription.status == SubscriptionStatus.ACTIVE.value,
+        Subscription.end_date > now
+    )
+
+
+def _stoppable_task():
+    # Leases are written in UTC by app.services.task_queue
+    lease_now = datetime.now(timezone.utc)
+    return or_(
+        Task.status == "pending",
+        and_(
+            Task.status == "running",
+            or_(Task.lease_expires_at.is_(None), Task.lease_expires_at < lease_now)
+        )
+    )
+
+
+async def _stop_users(conn, user_ids: List[int]) -> List[int]:
+    """Fail the users' stoppable tasks and release their proxies; returns completed task batches."""
+    # Lock first, so counters and batch results cover exactly the rows failed here
+    rows = (await conn.execute(
+        select(Task.id, Task.batch_id, *COUNTER_COLUMNS)
+        .where(Task.user_id.in_(user_ids), _stoppable_task())
+        .with_for_update(skip_locked=True)
+    )).all()
+    failed_per_batch: Dict[int, int] = {}
+    if rows:
+        await count_rows_change(conn, rows, new_status="failed")
+        for row in rows:
+            if row.batch_id:
+                failed_per_batch[row.batch_id] = failed_per_batch.get(row.batch_id, 0) + 1
+        await conn.execute(
+            update(Task)
+            .where(Task.id.in_([row.id for row in rows]))
+            .values(status="failed", error_message="Subscription expired")
+        )
+    completed_batches = await record_batch_results(conn, {batch_id: (0, count) for batch_id, count in failed_per_batch.items()})
+    # Release proxies from the user
+    await conn.execute(update(ProxyTemplate).where(ProxyTemplate.user_id.in_(user_ids)).values(user_id=None))
+    return completed_batches
+
+
+async def _sweep_batch(conn, now) -> Tuple[int, List[int], List[int]]:
+    """
+    Expire one batch of subscriptions; returns (subscriptions expired, users that lost
+    access, task batches completed by failing their tasks).
+    """
+    expired = (await conn.execute(
+        select(Subscription.id, Subscription.user_id)
+        .where(Subscription.status == SubscriptionStatus.ACTIVE.value, Subscription.end_date <= now)
+        .limit(SWEEP_BATCH_SIZE)
+    )).all()
+    if not expired:
+        return 0, [], []
+    sub_ids = [row.id for row in expired]
+    user_ids = {row.user_id for row in expired}
+
+    # Users renewed with another subscription keep their tasks and proxies
+    still_active = set((await conn.execute(
+        select(Subscription.user_id).distinct().where(
+            Subscription.user_id.in_(user_ids),
+            Subscription.status == SubscriptionStatus.ACTIVE.value,
+            Subscription.end_date > now
+        )
+    )).scalars())
+    swept = sorted(user_ids - still_active)
+
+    await conn.execute(
+        update(Subscription)
+        .where(Subscription.id.in_(sub_ids))
+        .values(status=SubscriptionStatus.EXPIRED.value)
+    )
+    completed_batches = await _stop_users(conn, swept) if swept else []
+    await conn.commit()
+    return len(sub_ids), swept, completed_batches
+
+
+async def _sweep_unsubscribed(conn, now) -> Tuple[List[int], List[int]]:
+    """
+    Stop one batch of users that still have stoppable tasks without an active
+    subscription; returns (users stopped, task batches completed).
+    """
+    user_ids = list((await conn.execute(
+        select(Task.user_id).distinct()
+        .where(
+            _stoppable_task(),
+            Task.user_id.isnot(None),
+            ~_has_active_subscription(Task.user_id, now)
+        )
+        .limit(SWEEP_BATCH_SIZE)
+    )).scalars())
+    if not user_ids:
+        return [], []
+    completed_batches = await _stop_users(conn, user_ids)
+    await conn.commit()
+    return user_ids, completed_batches
+
+
+async def sweep_expired_subscriptions() -> dict:
+    now = now_jakarta()
+    swept: List[int] = []
+    completed_batches: List[int] = []
+    expired_total = 0
+    async with worker_engine.connect() as conn:
+        if not (await conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": SWEEP_LOCK_NAME})).scalar():
+            return {"skipped": "another sweep holds the lock"}
+        try:
+            while True:
+                expired, users, batches = await _sweep_batch(conn, now)
+                expired_total += expired
+                swept.extend(users)
+                completed_batches.extend(batches)
+                if expired < SWEEP_BATCH_SIZE:
+                    break
+            seen = set()
+            while True:
+                users, batches = await _sweep_unsubscribed(conn, now)
+                # Users whose rows another transaction held are picked again; stop then
+                new_users = [user_id for user_id in users if user_id not in seen]
+                seen.update(users)
+                swept.extend(new_users)
+                completed_batches.extend(batches)
+                if len(users) < SWEEP_BATCH_SIZE or not new_users:
+                    break
+            if swept:
+                # Snapshots must not keep serving the lost subscription until their TTL
+                await invalidate_user_entitlements(conn, swept)
+                await notify_batches_completed(conn, completed_batches)
+                await conn.commit()
+        finally:
+            await conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": SWEEP_LOCK_NAME})
+
+    swept = sorted(set(swept))
+    for user_id in swept:
+        await invalidate_dashboard_stats(user_id)
+    if swept:
+        logger.info("Subscription sweep: stopped tasks and released proxies of %s expired user(s)", len(swept))
+    return {"expired_subscriptions": expired_total, "swept_users": len(swept)}
@@ -0,0 +1,114 @@
+"""
+Helpers around the task_counters table (see app.models.task_counter).
+
+ORM changes to Task are counted automatically at flush. Bulk Core UPDATE/DELETE
+statements bypass the ORM, so call count_bulk_change() with the same criteria,
+in the same transaction, right before executing them. Paths that race with other
+workers on the same rows (claims, lease recovery) lock the rows first, update them
+by id and count exactly those rows with count_rows_change().
+"""
+from collections import defaultdict
+from typing import Dict, Optional
+
+from sqlalchemy import select, func, delete, insert, literal, cast, DateTime
+
+from app.models.task import Task
+from app.models.task_counter import TaskCounter, CounterKey, counter_key, counter_upsert
+
+
+async def apply_counter_deltas(db, deltas: Dict[CounterKey, int]):
+    stmt = counter_upsert(deltas)
+    if stmt is not None:
+        await db.execute(stmt)
+
+
+# Columns count_rows_change() needs from each row
+COUNTER_COLUMNS = (Task.user_id, Task.account_id, Task.task_type, Task.status, Task.created_at)
+
+
+async def count_rows_change(db, rows, new_status: Optional[str] = None) -> int:
+    """
+    Record the counter effect of moving already locked rows (selected with
+    COUNTER_COLUMNS) to `new_status`, or of deleting them when new_status is None.
+    """
+    deltas: Dict[CounterKey, int] = defaultdict(int)
+    for row in rows:
+        if row.status == new_status:
+            continue
+        deltas[counter_key(row.user_id, row.account_id, row.task_type, row.status, row.created_at)] -= 1
+        if new_status is not None:
+            deltas[counter_key(row.user_id, row.account_id, row.task_type, new_status, row.created_at)] += 1
+    await apply_counter_deltas(db, deltas)
+    return len(rows)
+
+
+async def count_bulk_change(db, *criteria, new_status: Optional[str] = None) -> int:
+    """
+    Record the counter effect of a bulk statement on the tasks matching `criteria`:
+    moved to `new_status`, or deleted when new_status is None.
+    One grouped query computes the deltas in SQL, without fetching or locking the
+    matched rows; a row changed concurrently in between only drifts the counters
+    until the next rebuild. Returns how many matched.
+    """
+    bucket = cast(func.date_format(Task.created_at, "%Y-%m-%d %H:00:00"), DateTime)
+    stmt = (
+        select(
+            Task.user_id, Task.account_id, Task.task_type, Task.status,
+            bucket.label("bucket"), func.count(Task.id).label("task_count"),
+        )
+        .where(*criteria)
+        .group_by(Task.user_id, Task.account_id, Task.task_type, Task.status, bucket)
+    )
+    groups = (await db.execute(stmt)).all()
+
+    deltas: Dict[CounterKey, int] = defaultdict(int)
+    for row in groups:
+        if row.status == new_status:
+            continue
+        deltas[counter_key(row.user_id, row.account_id, row.task_type, row.status, row.bucket)] -= row.task_count
+        if new_status is not None:
+            deltas[counter_key(row.user_id, row.account_id, row.task_type, new_status, row.bucket)] += row.task_count
+
+    await apply_counter_deltas(db, deltas)
+    return sum(row.task_count for row in groups)
+
+
+async def approximate_task_count(db, user_id: Optional[int] = None, status: Optional[str] = None,
+                                 task_type: Optional[str] = None, exclude_types=()) -> int:
+    """Task count from the counters (no scan of tasks; may drift until the next rebuild)."""
+    stmt = select(func.coalesce(func.sum(TaskCounter.task_count), 0))
+    if user_id is not None:
+        stmt = stmt.where(TaskCounter.user_id == user_id)
+    if status:
+        stmt = stmt.where(TaskCounter.status == status)
+    if task_type:
+        stmt = stmt.where(TaskCounter.task_type == task_type)
+    elif exclude_types:
+        stmt = stmt.where(TaskCounter.task_type.not_in(exclude_types))
+    return max(int((await db.execute(stmt)).scalar_one()), 0)
+
+
+async def rebuild_task_counters(db):
+    """Recompute every counter from the tasks table (backfill / drift repair)."""
+    bucket = func.date_format(Task.created_at, "%Y-%m-%d %H:00:00")
+    await db.execute(delete(TaskCounter))
+    await db.execute(
+        insert(TaskCounter).from_select(
+            ["user_id", "account_id", "task_type", "status", "bucket_hour", "task_count"],
+            select(
+                func.coalesce(Task.user_id, 0),
+                func.coalesce(Task.account_id, 0),
+                Task.task_type,
+                func.coalesce(Task.status, literal("pending")),
+                bucket,
+                func.count(Task.id),
+            ).group_by(
+                func.coalesce(Task.user_id, 0),
+                func.coalesce(Task.account_id, 0),
+                Task.task_type,
+                func.coalesce(Task.status, literal("pending")),
+                bucket,
+            )
+        )
+    )
+
@@ -1,16 +1,27 @@
-from app.db.session import AsyncSessionLocal
+from app.db.session import WorkerSessionLocal
 from app.models.task import Task
 from app.models.task_batch import TaskBatch
 from app.models.account import Account, Fingerprint
-from app.services.instagram_service import InstagramService
+from app.services.client_pool import client_pool
+from app.services.dashboard_cache import invalidate_dashboard_stats
+from app.services.batch_progress import finished_per_batch, record_batch_results, notify_batches_completed
+from app.services.events import publish_task_status
+from app.services.media_preprocess import ensure_variants, variant_path
+from app.services.task_queue import claim_task, new_lease_owner
 from sqlalchemy import select
 from datetime import datetime
+from typing import Dict, List
 from app.core.tz_utils import now_jakarta
 import os
 from instagrapi.exceptions import LoginRequired
 from pydantic import ValidationError
 from app.core.config import settings
+from app.core.logging_config import bind_correlation_id
 import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
 
 def get_absolute_media_path(media_path: str) -> str:
     """
@@ -37,331 +48,411 @@ def get_absolute_media_path(media_path: str) -> str:
     # Otherwise return as is (might already be a host path)
     return media_path
 
-async def execute_task(task_id: int):
+# Per-account serialization: two tasks must never drive the same cookies at once.
+# Locks are dropped once no group holds or waits for them, so the dict stays small.
+_account_locks: Dict[int, asyncio.Lock] = {}
+_account_lock_users: Dict[int, int] = {}
+
+MEDIA_TASK_TYPES = ["story", "post", "reels"]
+
+@asynccontextmanager
+async def _account_lock(account_id: int):
+    lock = _account_locks.setdefault(account_id, asyncio.Lock())
+    _account_lock_users[account_id] = _account_lock_users.get(account_id, 0) + 1
+    try:
+        async with lock:
+            yield
+    finally:
+        _account_lock_users[account_id] -= 1
+        if not _account_lock_users[account_id]:
+            del _account_lock_users[account_id]
+            del _account_locks[account_id]
+
+async def execute_task(task_id: int, claimed: bool = False):
     """
     Execute a task immediately.
     Can be called by API (background task) or Celery Worker (scheduled task).
+    Args:
+        claimed: True when the caller already claimed the task (worker sweep).
+            Otherwise the task is claimed here, and skipped if a worker got it first.
     """
-    async with AsyncSessionLocal() as session:
-        # Get task with account
-        stmt = select(Task).where(Task.id == task_id)
-        result = await session.execute(stmt)
-        task = result.scalars().first()
-        
-        if not task:
-            with open("task_debug.log", "a") as f:
-                f.write(f"Task {task_id} not found in DB\n")
-            print(f"Task {task_id} not found")
-            return
+    if not claimed and not await claim_task(task_id, new_lease_owner()):
+        logger.info("Task %s is already claimed, no longer pending, or its account is busy; leaving it to the sweep", task_id)
+        return
+
+    async with WorkerSessionLocal() as session:
+        result = await session.execute(select(Task.account_id).where(Task.id == task_id))
+        account_id = result.scalar()
+
+    await execute_account_tasks(account_id, [task_id])
+
+async def execute_account_tasks(account_id: int, task_ids: List[int]):
+    """
+    Execute claimed tasks that belong to one account, one after another.
+    Task/account/fingerprint lookups and the Instagram session check (or login)
+    are paid once for the whole group instead of once per task, and the account
+    lock keeps other groups for the same account from running concurrently.
+    """
+    async with _account_lock(account_id):
+        async with WorkerSessionLocal() as session:
+            # Get tasks (Task.account is eager-joined)
+            stmt = select(Task).where(Task.id.in_(task_ids)).order_by(Task.scheduled_at.asc(), Task.id.asc())
+            result = await session.execute(stmt)
+            tasks = result.scalars().unique().all()
             
-        with open("task_debug.log", "a") as f:
-            f.write(f"Starting execution for Task {task_id}\n")
-        
-        # Get account
-        stmt_acc = select(Account).where(Account.id == task.account_id)
-        result_acc = await session.execute(stmt_acc)
-        account = result_acc.scalars().first()
-        
-        if not account:
-            task.status = "failed"
-            task.error_message = "Account not found"
-            await session.commit()
-            with open("task_debug.log", "a") as f:
-                f.write(f"Task {task_id} failed: Account {task.account_id} not found\n")
-            return
-        
-        # Get fingerprint
-        stmt_fp = select(Fingerprint).where(Fingerprint.id == account.fingerprint_id)
-        result_fp = await session.execute(stmt_fp)
-        fingerprint = result_fp.scalars().first()
-        
-        if not fingerprint:
-            task.status = "failed"
-            task.error_message = "Fingerprint not found"
-            await session.commit()
-            with open("task_debug.log", "a") as f:
-                f.write(f"Task {task_id} failed: Fingerprint for account {account.username} not found\n")
-            return
-        
-        task.status = "running"
-        
-        # If part of a batch, mark batch as running if it was pending
-        if task.batch_id:
-            stmt_batch = select(TaskBatch).where(TaskBatch.id == task.batch_id)
-            result_batch = await session.execute(stmt_batch)
-            batch = result_batch.scalars().first()
-            if batch and batch.status == "pending":
-                batch.status = "running"
-                if not batch.started_at:
-                    batch.started_at = now_jakarta()
-                    
-        await session.commit()
-        
-        try:
-            service = InstagramService(account, fingerprint)
+            for missing_id in set(task_ids) - {t.id for t in tasks}:
+                logger.warning("Task %s not found in DB", missing_id, extra={"task_id": missing_id})
             
-            # ALWAYS validate/ensure we have a valid Instagram session
-            print(f"Task {task_id}: Checking Instagram session for {account.username}...")
-            session_valid = False
+            if not tasks:
+                return
+                
+            logger.info("Starting execution for tasks %s", [t.id for t in tasks], extra={"account_id": account_id})
             
-            # Try to check current session if account was previously active
-            if account.status == "active" and account.cookies:
-                try:
-                    check_result = await asyncio.to_thread(service.check_session)
-                    session_valid = check_result.get("status") == "active"
-                    if session_valid:
-                        print(f"Task {task_id}: Existing session is valid for {account.username}")
-                except Exception as e:
-                    print(f"Task {task_id}: Session check failed for {account.username}: {e}")
-                    session_valid = False
+            account = tasks[0].account
             
-            # If session is not valid, perform login
-            if not session_valid:
-                print(f"Task {task_id}: Session invalid, performing login for {account.username}...")
-                try:
-                    login_updates = await asyncio.to_thread(service.login)
-                    if login_updates:
-                        # Update account status from login result
-                        for key, val in login_updates.items():
-                            setattr(account, key, val)
-                        await session.commit()
-                        
-                        # Verify login was successful
-                        if login_updates.get("status") == "active":
-                            print(f"Task {task_id}: Login successful for {account.username}")
-                            session_valid = True
-                        else:
-                            raise Exception(f"Login failed with status: {login_updates.get('status')}")
-                    else:
-                        raise Exception("Login returned no updates")
-                except Exception as e:
-                    print(f"Task {task_id}: Login failed for {account.username}: {e}")
-                    raise Exception(f"Failed to establish valid session: {str(e)}")
+            if not account:
+                for task in tasks:
+                    task.status = "failed"
+                    task.error_message = "Account not found"
+                completed_batches = await _record_batch_progress(session, tasks)
+                await session.commit()
+                await publish_task_status(tasks)
+                await notify_batches_completed(session, completed_batches)
+                logger.error("Tasks %s failed: account %s not found", [t.id for t in tasks], account_id)
+                await invalidate_dashboard_stats(tasks[0].user_id)
+                return
             
-            # Warmup session for story/post/reel tasks to ensure stability
-            if task.task_type in ["story", "post", "reels"]:
-                print(f"Task {task_id}: Performing warmup for {task.task_type} task...")
-                try:
-                    warmup_result = await asyncio.to_thread(service.warmup)
-                    if warmup_result:
-                        print(f"Task {task_id}: Warmup successful")
-                    else:
-                        print(f"Task {task_id}: Warmup returned False (continuing anyway)")
-                except Exception as e:
-                    print(f"Task {task_id}: Warmup failed: {e} (continuing anyway)")
+            # Get fingerprint
+            stmt_fp = select(Fingerprint).where(Fingerprint.id == account.fingerprint_id)
+            result_fp = await session.execute(stmt_fp)
+            fingerprint = result_fp.scalars().first()
             
+            if not fingerprint:
+                for task in tasks:
+                    task.status = "failed"
+                    task.error_message = "Fingerprint not found"
+                completed_batches = await _record_batch_progress(session, tasks)
+                await session.commit()
+                await publish_task_status(tasks)
+                await notify_batches_completed(session, completed_batches)
+                logger.error("Tasks %s failed: fingerprint for account %s not found", [t.id for t in tasks], account.username)
+                await invalidate_dashboard_stats(tasks[0].user_id)
+                return
             
-            params = task.params or {}
+            for task in tasks:
+                task.status = "running"
             
-            # Retry loop for LoginRequired
-            max_retries = 1
-            for attempt in range(max_retries + 1):
-                try:
-                    if task.task_type == "post":
-                        media_path = get_absolute_media_path(params.get("media_path", ""))
-                        caption = params.get("caption", "")
-                        share_to_threads = params.get("share_to_threads", False)
-                        if media_path and os.path.exists(media_path):
-                            await asyncio.to_thread(service.post_photo, media_path, caption, share_to_threads=share_to_threads)
-                        else:
-                            raise ValueError(f"Media file not found: {media_path} (original: {params.get('media_path')})")
-
-                    elif task.task_type == "reels":
-                        media_path = get_absolute_media_path(params.get("media_path", ""))
-                        caption = params.get("caption", "")
-                        share_to_threads = params.get("share_to_threads", False)
-                        if media_path and os.path.exists(media_path):
-                            await asyncio.to_thread(service.post_reel, media_path, caption, share_to_threads=share_to_threads)
-                        else:
-                            raise ValueError(f"Media file not found: {media_path} (original: {params.get('media_path')})")
-
-                    elif task.task_type == "story":
-                        media_path = get_absolute_media_path(params.get("media_path", ""))
-                        caption = params.get("caption", "")
-                        link = params.get("link")
-                        if media_path and os.path.exists(media_path):
-                            await asyncio.to_thread(service.post_story, media_path, caption, link=link)
-                        else:
-                            raise ValueError(f"Media file not found: {media_path} (original: {params.get('media_path')})")
-                            
-                    elif task.task_type == "like":
-                        media_url = params.get("media_url", "")
-                        if media_url:
-                            # Extract shortcode from URL
-                            # Supports p, reel, reels, tv, posts etc.
-                            import re
-                            shortcode = None
-                            match = re.search(r"(?:/p/|/reel/|/reels/|/tv/|/posts/)([\w-]+)", media_url)
-                            if match:
-                                shortcode = match.group(1)
-                            
-                            if shortcode:
-                                # Use media_pk_from_code which is offline/math-based
-                                # This is safer to avoid extra requests initially
-                                media_id = await asyncio.to_thread(service.client.media_pk_from_code, shortcode)
-                                
-                                # Pre-load media info to simulate human behavior and check accessibility
-                                try:
-                                    await asyncio.to_thread(service.client.media_info, str(media_id))
-                                except Exception as e:
-                                    print(f"Warning: Could not fetch media_info for {media_id}: {e}")
-                                    # Continue anyway, it might work
-                                
-                                await asyncio.to_thread(service.like_media, str(media_id))
-                            else:
-                                # Fallback to original method if shortcode extraction fails
-                                # Clean URL first
-                                if "?" in media_url:
-                                    media_url = media_url.split("?")[0]
-                                media_id = await asyncio.to_thread(service.client.media_pk_from_url, media_url)
-                                await asyncio.to_thread(service.like_media, str(media_id))
-                        else:
-                            raise ValueError("Media URL not provided")
-                            
-                    elif task.task_type == "follow":
-                        target_username = params.get("target_username", "")
-                        if target_username:
-                            import random
-                            # 1. Visit Profile (Get User ID)
-                            user_id = await asyncio.to_thread(service.client.user_id_from_username, target_username)
-                            
-                            # 2. Random Delay (Simulate looking at profile)
-                            await asyncio.sleep(random.uniform(2.0, 5.0))
-                            
-                            # 3. Try to fetch recent media for Warm-up
-                            try:
-                                # Get latest 3 posts
-                                medias = await asyncio.to_thread(service.client.user_medias, user_id, 3)
-                                if medias:
-                                    # 60% chance to like a random post from the top 3
-                                    if random.random() < 0.6:
-                                        target_media = random.choice(medias)
-                                        print(f"Warm-up: Liking post {target_media.pk} for {target_username}")
-                                        await asyncio.to_thread(service.client.media_like, target_media.id)
-                                        await asyncio.sleep(random.uniform(1.0, 3.0))
-                            except Exception as e:
-                                # If media is private or fails, skip silently and continue with Follow
-                                print(f"Warm-up: Skipping like for {target_username} (Media empty, private, or error: {e})")
-                            
-                            # 4. Final Follow Action
-                            await asyncio.to_thread(service.client.user_follow, user_id)
-                        else:
-                            raise ValueError("Target username not provided")
-
-                            
-                    elif task.task_type == "view":
-                        story_url = params.get("story_url", "")
-                        if story_url:
-                            # For stories, we need to extract story_pk
-                            story_pk = await asyncio.to_thread(service.client.story_pk_from_url, story_url)
-                            await asyncio.to_thread(service.client.story_seen, [story_pk])
-                        else:
-                            raise ValueError("Story URL not provided")
-                    
-                    # If successful, break the retry loop
-                    break
-                    
-                except ValidationError as e:
-                    # Specific Pydantic Validation Error (Instagrapi issue)
-                    print(f"Task {task_id}: ignoring Pydantic validation error: {e}")
-                    with open("task_debug.log", "a") as f:
-                        f.write(f"Task {task_id}: Pydantic Validation error ignored. Assuming success.\n")
-                    # Break loop to treat as SUCCESS
-                    break
-
-                except Exception as e:
-                    error_str = str(e).lower()
-                    
-                    # Detect if error is essentially "login required" even if wrapped
-                    # instagrapi often wraps it in PhotoNotUpload for stories
-                    is_login_issue = "login_required" in error_str or isinstance(e, LoginRequired)
-                    
-                    # 1. Handle Inactive User
-                    if "this user is inactive" in error_str:
-                        print(f"Task {task_id}: Account {account.username} is inactive! Marking as failed.")
-                        with open("task_debug.log", "a") as f:
-                            f.write(f"Task {task_id} failed: Account inactive. Usually due to IP/Proxy block or account restriction.\n")
-                        
-                        # Update account status
-                        account.status = "inactive"
-                        await session.commit()
-                        
-                        # Raise to fail the task
-                        raise e
-
-                    # 2. Handle Login Issues
-                    if is_login_issue and attempt < max_retries:
-                        print(f"Task {task_id}: Login required ({type(e).__name__}: {str(e)}), re-connecting and re-logging in (forced=True)...")
-                        
-                        # Use the new reconnect method to clear stale internal states
-                        await asyncio.to_thread(service.reconnect)
+            # If part of a batch, mark batch as running if it was pending
+            batch_ids = {task.batch_id for task in tasks if task.batch_id}
+            if batch_ids:
+                stmt_batch = select(TaskBatch).where(TaskBatch.id.in_(batch_ids), TaskBatch.status == "pending")
+                result_batch = await session.execute(stmt_batch)
+                for batch in result_batch.scalars().all():
+                    batch.status = "running"
+                    if not batch.started_at:
+                        batch.started_at = now_jakarta()
                         
-                        # Force a full login to refresh everything
-                        login_updates = await asyncio.to_thread(service.login, force_full_login=True)
-                        if login_updates:
-                             # Update account status from login result
-                             for key, val in login_updates.items():
-                                 setattr(account, key, val)
-                             await session.commit()
-                        
-                        # Small delay to let the session "settle"
-                        await asyncio.sleep(2)
-                        continue
-                    
-                    # 4. Handle SOCKS5 Authentication Errors
-                    if "SOCKS5 authentication failed" in error_str:
-                        print(f"Task {task_id}: Proxy authentication failed. Marking as failed.")
-                        task.error_message = f"Proxy Authentication Failed: Please check your proxy credentials. ({str(e)})"
-                        raise e
-                        
-                    # 3. Handle Generic Validation Error (fallback string check)
-                    if "validation error" in error_str or "field required" in error_str:
-                         print(f"Task {task_id}: ignoring string-based validation error: {e}")
-                         with open("task_debug.log", "a") as f:
-                             f.write(f"Task {task_id}: String-based Validation error ignored. Assuming success.\n")
-                         break
-
-                    # Else raise error
-                    raise e
+            await session.commit()
+            await publish_task_status(tasks)
             
-            task.status = "completed"
-            task.executed_at = now_jakarta()
+            if len(tasks) > 1:
+                logger.info("Executing %d tasks for %s in one session: %s", len(tasks), account.username, [t.id for t in tasks])
             
+            # Reuse a ready client for this account when cookies/proxy/fingerprint are unchanged
+            service, _ = client_pool.acquire(account, fingerprint)
+            # A pooled client that already completed a warmup needs no other one
+            warmed_up = client_pool.is_warmed_up(account.id, service)
+            
+            try:
+                for task in tasks:
+                    with bind_correlation_id(f"task-{task.id}"):
+                        warmed_up = await _run_task(session, task, account, fingerprint, service, warmed_up)
+                    # Batch counters move in the same transaction as the task status
+                    completed_batches = await _record_batch_progress(session, [task])
+                    await session.commit()
+                    await invalidate_dashboard_stats(task.user_id)
+                    await publish_task_status([task])
+                    await notify_batches_completed(session, completed_batches)
+            finally:
+                client_pool.release(account.id, service)
+
+async def _ensure_session(session, task_id: int, account: Account, fingerprint: Fingerprint, service):
+    """Validate the Instagram session, logging in again if needed. Raises on failure."""
+    # ALWAYS validate/ensure we have a valid Instagram session
+    logger.info("Task %s: Checking Instagram session for %s", task_id, account.username)
+    session_valid = False
+    
+    # Skip the round trip if this client verified the session recently
+    if account.status == "active" and account.cookies and client_pool.session_is_fresh(account.id, service):
+        session_valid = True
+        logger.info("Task %s: Reusing recently verified session for %s", task_id, account.username)
+    
+    # Try to check current session if account was previously active
+    elif account.status == "active" and account.cookies:
+        try:
+            check_result = await asyncio.to_thread(service.check_session)
+            session_valid = check_result.get("status") == "active"
+            if session_valid:
+                logger.info("Task %s: Existing session is valid for %s", task_id, account.username)
+        except Exception as e:
+            logger.warning("Task %s: Session check failed for %s: %s", task_id, account.username, e)
+            session_valid = False
+    
+    # If session is not valid, perform login
+    if not session_valid:
+        logger.info("Task %s: Session invalid, performing login for %s", task_id, account.username)
+        try:
+            login_updates = await asyncio.to_thread(service.login)
+            if login_updates:
+                # Update account status from login result
+                for key, val in login_updates.items():
+                    setattr(account, key, val)
+                await session.commit()
+                
+                # Verify login was successful
+                if login_updates.get("status") == "active":
+                    logger.info("Task %s: Login successful for %s", task_id, account.username)
+                    session_valid = True
+                else:
+                    raise Exception(f"Login failed with status: {login_updates.get('status')}")
+            else:
+                raise Exception("Login returned no updates")
         except Exception as e:
-            task.status = "failed"
-            task.error_message = str(e)
-            task.executed_at = now_jakarta()
-            with open("task_debug.log", "a") as f:
-                f.write(f"Task {task_id} failed: {e}\n")
-                import traceback
-                traceback.print_exc(file=f)
-            print(f"Task {task_id} failed: {e}")
+            logger.warning("Task %s: Login failed for %s: %s", task_id, account.username, e)
+            raise Exception(f"Failed to establish valid session: {str(e)}")
+    
+    client_pool.mark_session_valid(account, fingerprint, service)
+
+async def _run_task(session, task: Task, account: Account, fingerprint: Fingerprint, service, warmed_up: bool) -> bool:
+    """
+    Run a single task on an already prepared client and record its outcome on the task.
+    Returns whether the session has been warmed up for media uploads.
+    """
+    task_id = task.id
+    try:
+        await _ensure_session(session, task_id, account, fingerprint, service)
+        
+        # Warmup session for story/post/reel tasks to ensure stability
+        if task.task_type in MEDIA_TASK_TYPES and not warmed_up:
+            logger.info("Task %s: Performing warmup for %s task", task_id, task.task_type)
+            try:
+                warmup_result = await asyncio.to_thread(service.warmup)
+                if warmup_result:
+                    logger.info("Task %s: Warmup successful", task_id)
+                    client_pool.mark_warmed_up(account.id, service)
+                else:
+                    logger.warning("Task %s: Warmup returned False (continuing anyway)", task_id)
+            except Exception as e:
+                logger.warning("Task %s: Warmup failed: %s (continuing anyway)", task_id, e)
+            warmed_up = True
+        
+        await _perform_action(session, task, account, fingerprint, service)
         
-        await session.commit()
+        task.status = "completed"
+        task.executed_at = now_jakarta()
+        task.lease_expires_at = None
         
-        # Update batch completion status if necessary
-        if task.batch_id:
-            from sqlalchemy import func
-            async with AsyncSessionLocal() as update_session:
-                # Use a fresh session to update counts to avoid isolation issues in heavy load
-                stmt_b = select(TaskBatch).where(TaskBatch.id == task.batch_id)
-                res_b = await update_session.execute(stmt_b)
-                batch = res_b.scalars().first()
-                if batch:
-                    if task.status == "completed":
-                        batch.success_count += 1
+    except Exception as e:
+        task.status = "failed"
+        task.error_message = str(e)
+        task.executed_at = now_jakarta()
+        task.lease_expires_at = None
+        # Force a session check before the next task on this account
+        client_pool.mark_session_invalid(account.id)
+        logger.exception("Task %s failed: %s", task_id, e, extra={"task_type": task.task_type, "account": account.username})
+    
+    return warmed_up
+
+async def _media_variants(params: dict, media_path: str):
+    """Preprocessed variants for this media (built once per content hash), or None to upload the original."""
+    try:
+        return await ensure_variants(params.get("media_hash"), media_path)
+    except Exception as e:
+        logger.warning("Media variants unavailable for %s: %s", media_path, e)
+        return None
+
+async def _perform_action(session, task: Task, account: Account, fingerprint: Fingerprint, service):
+    """Perform the Instagram action for the task, re-logging in once on LoginRequired."""
+    task_id = task.id
+    params = task.params or {}
+
+    # Retry loop for LoginRequired
+    max_retries = 1
+    for attempt in range(max_retries + 1):
+        try:
+            if task.task_type == "post":
+                media_path = get_absolute_media_path(params.get("media_path", ""))
+                caption = params.get("caption", "")
+                share_to_threads = params.get("share_to_threads", False)
+                if media_path and os.path.exists(media_path):
+                    variants = await _media_variants(params, media_path)
+                    upload_path = variant_path(variants, "feed") or media_path
+                    await asyncio.to_thread(service.post_photo, upload_path, caption, share_to_threads=share_to_threads)
+                else:
+                    raise ValueError(f"Media file not found: {media_path} (original: {params.get('media_path')})")
+
+            elif task.task_type == "reels":
+                media_path = get_absolute_media_path(params.get("media_path", ""))
+                caption = params.get("caption", "")
+                share_to_threads = params.get("share_to_threads", False)
+                if media_path and os.path.exists(media_path):
+                    variants = await _media_variants(params, media_path)
+                    thumbnail = variant_path(variants, "thumbnail")
+                    await asyncio.to_thread(service.post_reel, media_path, caption, share_to_threads=share_to_threads, thumbnail=thumbnail)
+                else:
+                    raise ValueError(f"Media file not found: {media_path} (original: {params.get('media_path')})")
+
+            elif task.task_type == "story":
+                media_path = get_absolute_media_path(params.get("media_path", ""))
+                caption = params.get("caption", "")
+                link = params.get("link")
+                if media_path and os.path.exists(media_path):
+                    variants = await _media_variants(params, media_path)
+                    upload_path = variant_path(variants, "story") or media_path
+                    thumbnail = variant_path(variants, "thumbnail")
+                    await asyncio.to_thread(service.post_story, upload_path, caption, link=link, thumbnail=thumbnail)
+                else:
+                    raise ValueError(f"Media file not found: {media_path} (original: {params.get('media_path')})")
+
+            elif task.task_type == "like":
+                media_url = params.get("media_url", "")
+                if media_url:
+                    # Extract shortcode from URL
+                    # Supports p, reel, reels, tv, posts etc.
+                    import re
+                    shortcode = None
+                    match = re.search(r"(?:/p/|/reel/|/reels/|/tv/|/posts/)([\w-]+)", media_url)
+                    if match:
+                        shortcode = match.group(1)
+
+                    if shortcode:
+                        # Use media_pk_from_code which is offline/math-based
+                        # This is safer to avoid extra requests initially
+                        media_id = await asyncio.to_thread(service.client.media_pk_from_code, shortcode)
+
+                        # Pre-load media info to simulate human behavior and check accessibility
+                        try:
+                            await asyncio.to_thread(service.client.media_info, str(media_id))
+                        except Exception as e:
+                            logger.warning("Could not fetch media_info for %s: %s", media_id, e)
+                            # Continue anyway, it might work
+
+                        await asyncio.to_thread(service.like_media, str(media_id))
                     else:
-                        batch.failed_count += 1
-                    
-                    # Check if all tasks in batch are finished
-                    stmt_all = select(func.count(Task.id)).where(
-                        Task.batch_id == task.batch_id,
-                        Task.status.in_(["pending", "running"])
-                    )
-                    remaining = (await update_session.execute(stmt_all)).scalar_one()
-                    
-                    if remaining == 0:
-                        batch.status = "completed"
-                        batch.completed_at = now_jakarta()
-                    
-                    await update_session.commit()
+                        # Fallback to original method if shortcode extraction fails
+                        # Clean URL first
+                        if "?" in media_url:
+                            media_url = media_url.split("?")[0]
+                        media_id = await asyncio.to_thread(service.client.media_pk_from_url, media_url)
+                        await asyncio.to_thread(service.like_media, str(media_id))
+                else:
+                    raise ValueError("Media URL not provided")
+
+            elif task.task_type == "follow":
+                target_username = params.get("target_username", "")
+                if target_username:
+                    import random
+                    # 1. Visit Profile (Get User ID)
+                    user_id = await asyncio.to_thread(service.client.user_id_from_username, target_username)
+
+                    # 2. Random Delay (Simulate looking at profile)
+                    await asyncio.sleep(random.uniform(2.0, 5.0))
+
+                    # 3. Try to fetch recent media for Warm-up
+                    try:
+                        # Get latest 3 posts
+                        medias = await asyncio.to_thread(service.client.user_medias, user_id, 3)
+                        if medias:
+                            # 60% chance to like a random post from the top 3
+                            if random.random() < 0.6:
+                                target_media = random.choice(medias)
+                                logger.info("Warm-up: Liking post %s for %s", target_media.pk, target_username)
+                                await asyncio.to_thread(service.client.media_like, target_media.id)
+                                await asyncio.sleep(random.uniform(1.0, 3.0))
+                    except Exception as e:
+                        # If media is private or fails, skip silently and continue with Follow
+                        logger.info("Warm-up: Skipping like for %s (media empty, private, or error: %s)", target_username, e)
+
+                    # 4. Final Follow Action
+                    await asyncio.to_thread(service.client.user_follow, user_id)
+                else:
+                    raise ValueError("Target username not provided")
+
+
+            elif task.task_type == "view":
+                story_url = params.get("story_url", "")
+                if story_url:
+                    # For stories, we need to extract story_pk
+                    story_pk = await asyncio.to_thread(service.client.story_pk_from_url, story_url)
+                    await asyncio.to_thread(service.client.story_seen, [story_pk])
+                else:
+                    raise ValueError("Story URL not provided")
+
+            # If successful, break the retry loop
+            break
+
+        except ValidationError as e:
+            # Specific Pydantic Validation Error (Instagrapi issue)
+            logger.warning("Task %s: Pydantic validation error ignored, assuming success: %s", task_id, e)
+            # Break loop to treat as SUCCESS
+            break
+
+        except Exception as e:
+            error_str = str(e).lower()
+
+            # Detect if error is essentially "login required" even if wrapped
+            # instagrapi often wraps it in PhotoNotUpload for stories
+            is_login_issue = "login_required" in error_str or isinstance(e, LoginRequired)
+
+            # 1. Handle Inactive User
+            if "this user is inactive" in error_str:
+                logger.error("Task %s: Account %s is inactive (usually an IP/proxy block or account restriction), marking as failed", task_id, account.username)
+
+                # Update account status
+                account.status = "inactive"
+                await session.commit()
+                client_pool.invalidate(account.id)
+
+                # Raise to fail the task
+                raise e
+
+            # 2. Handle Login Issues
+            if is_login_issue and attempt < max_retries:
+                logger.warning("Task %s: Login required (%s: %s), re-connecting and re-logging in (forced=True)", task_id, type(e).__name__, e)
+
+                # Use the new reconnect method to clear stale internal states
+                await asyncio.to_thread(service.reconnect)
+
+                # Force a full login to refresh everything
+                login_updates = await asyncio.to_thread(service.login, force_full_login=True)
+                if login_updates:
+                     # Update account status from login result
+                     for key, val in login_updates.items():
+                         setattr(account, key, val)
+                     await session.commit()
+                     client_pool.mark_session_valid(account, fingerprint, service)
+
+                # Small delay to let the session "settle"
+                await asyncio.sleep(2)
+                continue
+
+            # 4. Handle SOCKS5 Authentication Errors
+            if "SOCKS5 authentication failed" in error_str:
+                logger.error("Task %s: Proxy authentication failed, marking as failed", task_id)
+                task.error_message = f"Proxy Authentication Failed: Please check your proxy credentials. ({str(e)})"
+                raise e
+
+            # 3. Handle Generic Validation Error (fallback string check)
+            if "validation error" in error_str or "field required" in error_str:
+                 logger.warning("Task %s: String-based validation error ignored, assuming success: %s", task_id, e)
+                 break
+
+            # Else raise error
+            raise e
+
+async def _record_batch_progress(session, tasks) -> list:
+    """Count finished tasks towards their batches; returns the batches this completed."""
+    results = finished_per_batch(tasks)
+    if not results:
+        return []
+    return await record_batch_results(session, results)
@@ -0,0 +1,22 @@
+"""
+Task listing queries shared by the task and reporting routers.
+
+Listings select the TaskResponse columns plus the account username, without loading
+Task entities (and their eager-joined Account).
+"""
+from sqlalchemy import select
+
+from app.models.account import Account
+from app.models.task import Task
+
+TASK_LIST_COLUMNS = (
+    Task.id, Task.account_id, Task.task_type, Task.scheduled_at, Task.params, Task.status,
+    Task.error_message, Task.executed_at, Task.created_at, Task.batch_id,
+    Account.username.label("account_username"),
+)
+# Internal task types, hidden from listings unless asked for explicitly
+HIDDEN_TASK_TYPES = ['login', 'check_session']
+
+
+def task_listing(*criteria):
+    return select(*TASK_LIST_COLUMNS).select_from(Task).outerjoin(Account, Account.id == Task.account_id).where(*criteria)
@@ -0,0 +1,262 @@
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, update, func, or_, exists, text
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.db.session import WorkerSessionLocal, worker_engine
+from app.models.task import Task
+from app.services.task_counters import COUNTER_COLUMNS, count_rows_change
+
+logger = logging.getLogger(__name__)
+
+
+def get_worker_id() -> str:
+    """Identity written to Task.lease_owner by this process."""
+    return settings.WORKER_ID or f"{socket.gethostname()}:{os.getpid()}"
+
+
+def new_lease_owner(prefix: str = "api") -> str:
+    """One-off lease owner for tasks executed outside the worker sweep (execute_now, retry)."""
+    return f"{prefix}:{uuid.uuid4().hex[:12]}"
+
+
+CLAIM_LOCK_NAME = "task_claim"
+CLAIM_LOCK_TIMEOUT = 10
+
+
+def _lease_window():
+    now = datetime.now(timezone.utc)
+    return now, now + timedelta(seconds=settings.TASK_LEASE_SECONDS)
+
+
+def _account_idle(now):
+    """No task of the row's account is running under a live lease (in any process)."""
+    busy = aliased(Task)
+    return ~exists().where(
+        busy.account_id == Task.account_id,
+        busy.status == "running",
+        busy.lease_expires_at > now
+    )
+
+
+async def _acquire_claim_lock(conn) -> bool:
+    # Claims are serialized across dispatchers, Celery children and the API, so two
+    # claimers cannot both see an account as idle and start it twice
+    return bool((await conn.execute(
+        text("SELECT GET_LOCK(:name, :timeout)"), {"name": CLAIM_LOCK_NAME, "timeout": CLAIM_LOCK_TIMEOUT}
+    )).scalar())
+
+
+async def _release_claim_lock(conn):
+    await conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": CLAIM_LOCK_NAME})
+
+
+async def claim_due_tasks(
+    worker_id: str,
+    limit: int,
+    per_account: Optional[int] = None,
+    max_accounts: Optional[int] = None,
+    exclude_accounts: Iterable[int] = (),
+) -> List[Tuple[int, int]]:
+    """
+    Atomically claim up to `limit` due pending tasks for this worker.
+    Rows are locked with FOR UPDATE SKIP LOCKED, so concurrent sweeps (overlapping
+    beats or other worker replicas) never receive the same task.
+    Claimed tasks are moved to 'running' with a lease owner and expiry.
+
+    Accounts with a task running under a live lease anywhere are skipped, and claims
+    are serialized with a MySQL named lock, so one Instagram account is never driven
+    by two processes at once. Tasks of one account run serially, so `per_account`
+    caps how many of an account's tasks are claimed at once (one busy account cannot
+    take the whole batch), `max_accounts` caps how many accounts the claim spans, and
+    `exclude_accounts` skips accounts this worker is already running.
+    Returns (task_id, account_id) pairs in schedule order.
+    """
+    if limit <= 0 or (max_accounts is not None and max_accounts <= 0):
+        return []
+
+    now, lease_until = _lease_window()
+    criteria = [Task.status == "pending", Task.scheduled_at <= now, _account_idle(now)]
+    exclude_accounts = [account_id for account_id in exclude_accounts if account_id is not None]
+    if exclude_accounts:
+        criteria.append(or_(Task.account_id.is_(None), Task.account_id.not_in(exclude_accounts)))
+
+    async with worker_engine.connect() as conn:
+        if not await _acquire_claim_lock(conn):
+            return []
+        try:
+            if per_account is None:
+                stmt = (
+                    select(Task.id, *COUNTER_COLUMNS)
+                    .where(*criteria)
+                    .order_by(Task.scheduled_at.asc(), Task.id.asc())
+                    .limit(limit)
+                    .with_for_update(skip_locked=True)
+                )
+                locked = (await conn.execute(stmt)).all()
+            else:
+                locked = await _claim_fair(conn, criteria, limit, per_account, max_accounts)
+            if not locked:
+                await conn.rollback()
+                return []
+            claimed = [(row.id, row.account_id) for row in locked]
+            task_ids = [task_id for task_id, _ in claimed]
+
+            # Counted from the locked rows, which only this transaction can change
+            await count_rows_change(conn, locked, new_status="running")
+            await conn.execute(
+                update(Task)
+                .where(Task.id.in_(task_ids))
+                .values(status="running", lease_owner=worker_id, lease_expires_at=lease_until)
+            )
+            await conn.commit()
+        except BaseException:
+            await conn.rollback()
+            raise
+        finally:
+            await _release_claim_lock(conn)
+    return claimed
+
+
+async def _claim_fair(conn, criteria, limit: int, per_account: int, max_accounts: Optional[int]) -> list:
+    # The first `per_account` due tasks of each account, in schedule order
+    ranked = (
+        select(
+            Task.id,
+            Task.account_id,
+            Task.scheduled_at,
+            func.row_number().over(
+                partition_by=Task.account_id,
+                order_by=(Task.scheduled_at.asc(), Task.id.asc())
+            ).label("position"),
+        )
+        .where(*criteria)
+        .subquery()
+    )
+    candidates = (await conn.execute(
+        select(ranked.c.id, ranked.c.account_id)
+        .where(ranked.c.position <= per_account)
+        .order_by(ranked.c.scheduled_at.asc(), ranked.c.id.asc())
+        .limit(limit)
+    )).all()
+
+    accounts = set()
+    picked = []
+    for row in candidates:
+        if row.account_id not in accounts:
+            if max_accounts is not None and len(accounts) >= max_accounts:
+                continue
+            accounts.add(row.account_id)
+        picked.append(row.id)
+    if not picked:
+        return []
+
+    # Window functions cannot be locked; lock the picked rows, skipping ones another worker took
+    return (await conn.execute(
+        select(Task.id, *COUNTER_COLUMNS)
+        .where(Task.id.in_(picked), Task.status == "pending")
+        .order_by(Task.scheduled_at.asc(), Task.id.asc())
+        .with_for_update(skip_locked=True)
+    )).all()
+
+
+def group_by_account(claimed: List[Tuple[int, int]]) -> Dict[int, List[int]]:
+    """Group claimed (task_id, account_id) pairs into per-account task lists, keeping order."""
+    groups: Dict[int, List[int]] = {}
+    for task_id, account_id in claimed:
+        groups.setdefault(account_id, []).append(task_id)
+    return groups
+
+
+async def claim_task(task_id: int, owner: str) -> bool:
+    """
+    Claim a single pending task (pending -> running) for immediate execution.
+    Returns False if the task was already claimed by a worker or is not pending, or if
+    another task of its account is running (the sweep runs it once the account is free).
+    """
+    now, lease_until = _lease_window()
+    async with worker_engine.connect() as conn:
+        if not await _acquire_claim_lock(conn):
+            return False
+        try:
+            row = (await conn.execute(
+                select(Task.id, *COUNTER_COLUMNS)
+                .where(Task.id == task_id, Task.status == "pending", _account_idle(now))
+                .with_for_update()
+            )).first()
+            if row is None:
+                await conn.rollback()
+                return False
+            result = await conn.execute(
+                update(Task)
+                .where(Task.id == task_id, Task.status == "pending")
+                .values(status="running", lease_owner=owner, lease_expires_at=lease_until)
+            )
+            if result.rowcount == 1:
+                await count_rows_change(conn, [row], new_status="running")
+            await conn.commit()
+            return result.rowcount == 1
+        except BaseException:
+            await conn.rollback()
+            raise
+        finally:
+            await _release_claim_lock(conn)
+
+
+async def release_expired_leases() -> int:
+    """
+    Re-queue running tasks whose lease has expired (worker crashed or was killed mid-task).
+    Returns the number of tasks moved back to pending.
+    """
+    now = datetime.now(timezone.utc)
+    expired = (
+        Task.status == "running",
+        Task.lease_expires_at.isnot(None),
+        Task.lease_expires_at < now
+    )
+    async with WorkerSessionLocal() as session:
+        # Lock first so the counters move only for the rows this statement re-queues
+        rows = (await session.execute(
+            select(Task.id, *COUNTER_COLUMNS).where(*expired).with_for_update(skip_locked=True)
+        )).all()
+        if not rows:
+            await session.rollback()
+            return 0
+        await count_rows_change(session, rows, new_status="pending")
+        result = await session.execute(
+            update(Task)
+            .where(Task.id.in_([row.id for row in rows]))
+            .values(status="pending", lease_owner=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        if result.rowcount:
+            logger.info("Re-queued %s task(s) with expired worker leases", result.rowcount)
+        return result.rowcount
+
+
+async def renew_leases(worker_id: str, task_ids: List[int]) -> int:
+    """Extend the lease of tasks this worker is still executing (e.g. long reel uploads)."""
+    if not task_ids:
+        return 0
+
+    _, lease_until = _lease_window()
+    async with WorkerSessionLocal() as session:
+        result = await session.execute(
+            update(Task)
+            .where(
+                Task.id.in_(task_ids),
+                Task.status == "running",
+                Task.lease_owner == worker_id
+            )
+            .values(lease_expires_at=lease_until)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        return result.rowcount
@@ -1,12 +1,19 @@
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init, setup_logging as celery_setup_logging
 from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.db.session import engine, worker_engine
 import asyncio
-from sqlalchemy import select
-from datetime import datetime, timezone
-from app.db.session import AsyncSessionLocal
+import logging
 from app.models import Task, Account, User, Fingerprint, TaskBatch # Import all to ensure registry
-from app.services.task_executor import execute_task
+from app.services.task_executor import execute_account_tasks
+from app.services.media_gc import collect_media_garbage
+from app.services.proxy_health import run_proxy_health_checks
+from app.services.subscription_sweeper import sweep_expired_subscriptions
+from app.services.task_queue import claim_due_tasks, release_expired_leases, renew_leases, get_worker_id, group_by_account
+
+logger = logging.getLogger(__name__)
 
 celery_app = Celery(
     "worker",
@@ -23,7 +30,34 @@ celery_app.conf.beat_schedule = {
         "task": "app.worker.check_scheduled_tasks",
         "schedule": 10.0,  # Run every 10 seconds
     },
+    "collect-media-garbage": {
+        "task": "app.worker.collect_media_garbage_task",
+        "schedule": float(settings.MEDIA_GC_INTERVAL),
+    },
 }
+if settings.SUBSCRIPTION_SWEEP_INTERVAL > 0:
+    celery_app.conf.beat_schedule["sweep-expired-subscriptions"] = {
+        "task": "app.worker.sweep_expired_subscriptions_task",
+        "schedule": float(settings.SUBSCRIPTION_SWEEP_INTERVAL),
+    }
+if settings.PROXY_PROBE_INTERVAL > 0:
+    celery_app.conf.beat_schedule["probe-proxies"] = {
+        "task": "app.worker.probe_proxies_task",
+        "schedule": float(settings.PROXY_PROBE_INTERVAL),
+    }
+
+@celery_setup_logging.connect
+def configure_logging(**kwargs):
+    # Connected handler: Celery leaves the root logger to us instead of hijacking it
+    setup_logging("worker")
+
+@worker_process_init.connect
+def reset_db_pools(**kwargs):
+    # Pooled connections inherited from the parent process must not be shared across forks
+    engine.sync_engine.dispose(close=False)
+    worker_engine.sync_engine.dispose(close=False)
+    # The parent's log writer thread does not exist in the child
+    setup_logging("worker")
 
 @celery_app.task(acks_late=True)
 def test_celery(word: str) -> str:
@@ -32,36 +66,51 @@ def test_celery(word: str) -> str:
 @celery_app.task
 def check_scheduled_tasks():
     """
-    Periodic task to check for pending tasks and execute them.
+    Periodic task to claim due pending tasks and execute them.
+    Tasks are claimed atomically (pending -> running with a lease), so overlapping
+    sweeps and multiple worker replicas never execute the same task twice. Leases are
+    renewed while the batch runs, so slow groups are not re-queued by the next beat.
     """
     async def run_check():
-        async with AsyncSessionLocal() as session:
-            # Find pending tasks that are due
-            now = datetime.now(timezone.utc)
-            stmt = select(Task).where(
-                Task.status == "pending",
-                Task.scheduled_at <= now
-            )
-            result = await session.execute(stmt)
-            tasks = result.scalars().all()
-            
-            if not tasks:
-                return
+        worker_id = get_worker_id()
+        
+        # Recover tasks left running by a crashed worker
+        await release_expired_leases()
+        
+        # Claim a bounded batch of due tasks for this worker
+        claimed = await claim_due_tasks(worker_id, settings.TASK_CLAIM_BATCH_SIZE, per_account=settings.TASK_CLAIM_PER_ACCOUNT)
+        if not claimed:
+            return
 
-            print(f"Found {len(tasks)} tasks to execute. Starting parallel execution (limit {settings.WORKER_CONCURRENCY})...")
-            
-            # Use Semaphore to limit concurrency
-            semaphore = asyncio.Semaphore(settings.WORKER_CONCURRENCY)
-            
-            async def wrapped_execute(task_id: int):
-                async with semaphore:
-                    try:
-                        await execute_task(task_id)
-                    except Exception as e:
-                        print(f"Unhandled error in parallel task {task_id}: {e}")
+        # Tasks of the same account run one after another in a single session
+        groups = group_by_account(claimed)
+        logger.info("[%s] Claimed %s tasks for %s accounts. Starting parallel execution (limit %s)...", worker_id, len(claimed), len(groups), settings.WORKER_CONCURRENCY)
+        
+        # Use Semaphore to limit concurrency
+        semaphore = asyncio.Semaphore(settings.WORKER_CONCURRENCY)
+        
+        async def wrapped_execute(account_id: int, task_ids: list):
+            async with semaphore:
+                try:
+                    await execute_account_tasks(account_id, task_ids)
+                except Exception as e:
+                    logger.exception("Unhandled error in parallel tasks %s: %s", task_ids, e)
 
-            # Execute all tasks in parallel, respecting the semaphore limit
-            await asyncio.gather(*(wrapped_execute(task.id) for task in tasks))
+        async def keep_leases():
+            task_ids = [task_id for task_id, _ in claimed]
+            while True:
+                await asyncio.sleep(max(10, settings.TASK_LEASE_SECONDS // 3))
+                try:
+                    await renew_leases(worker_id, task_ids)
+                except Exception as e:
+                    logger.warning("[%s] Lease renewal failed: %s", worker_id, e)
+
+        renewer = asyncio.create_task(keep_leases())
+        try:
+            # Execute all claimed tasks in parallel per account, respecting the semaphore limit
+            await asyncio.gather(*(wrapped_execute(account_id, task_ids) for account_id, task_ids in groups.items()))
+        finally:
+            renewer.cancel()
 
     # Run async code synchronously
     loop = asyncio.get_event_loop()
@@ -70,3 +119,21 @@ def check_scheduled_tasks():
         asyncio.ensure_future(run_check())
     else:
         loop.run_until_complete(run_check())
+
+@celery_app.task
+def collect_media_garbage_task():
+    """Periodic media GC (reclaims uploads no task references anymore)."""
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(collect_media_garbage())
+
+@celery_app.task
+def probe_proxies_task():
+    """Periodic proxy health probe (latency / exit IP history in proxy_health_checks)."""
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(run_proxy_health_checks())
+
+@celery_app.task
+def sweep_expired_subscriptions_task():
+    """Periodic subscription expiry sweep (fails tasks and releases proxies of expired users)."""
+    loop = asyncio.get_event_loop()
+    return loop.run_until_complete(sweep_expired_subscriptions())
@@ -0,0 +1,105 @@
+"""
+Query plan audit for the hot queries on the tasks table.
+
+Runs EXPLAIN on each query and exits with status 1 if any of them does a full table
+scan (type=ALL) on tasks. Tiny tables are skipped by the optimizer's own estimate:
+use --min-rows to ignore scans of fewer rows (default 1000), so run it against a
+database with realistic volume.
+
+Usage (from backend/): python tools/explain_hot_queries.py [--min-rows N]
+"""
+import argparse
+import asyncio
+import sys
+import os
+from datetime import timedelta
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from sqlalchemy import select, func, text
+
+from app.core.tz_utils import now_jakarta
+from app.db.session import AsyncSessionLocal, dispose_engines
+from app.models import Task, Account, User, Fingerprint, TaskBatch  # Import all to ensure registry
+
+
+async def sample_ids(db):
+    """Pick real ids so the optimizer sees selective values."""
+    row = (await db.execute(
+        select(Task.user_id, Task.account_id).where(Task.user_id.isnot(None)).limit(1)
+    )).first()
+    batch_id = (await db.execute(select(func.max(Task.batch_id)))).scalar()
+    user_id, account_id = (row.user_id, row.account_id) if row else (1, 1)
+    return user_id, account_id, batch_id or 1
+
+
+def hot_queries(user_id: int, account_id: int, batch_id: int):
+    now = now_jakarta()
+    period_start = now - timedelta(days=7)
+    return {
+        "worker sweep (claim_due_tasks)": select(Task.id, Task.account_id).where(
+            Task.status == "pending", Task.scheduled_at <= now
+        ).order_by(Task.scheduled_at.asc(), Task.id.asc()).limit(50),
+        "expired leases (release_expired_leases)": select(Task.id).where(
+            Task.status == "running", Task.lease_expires_at < now
+        ),
+        "stats by account (user)": select(Task.account_id, Task.status, func.count(Task.id)).where(
+            Task.user_id == user_id
+        ).group_by(Task.account_id, Task.status),
+        "task list by status (user)": select(Task.id).where(
+            Task.user_id == user_id, Task.status == "pending"
+        ).order_by(Task.scheduled_at.asc()).limit(100),
+        "account tasks by status": select(func.count(Task.id)).where(
+            Task.account_id == account_id, Task.status == "pending"
+        ),
+        "batch completion": select(func.count(Task.id)).where(
+            Task.batch_id == batch_id, Task.status.in_(["pending", "running"])
+        ),
+        "dashboard completed in period (admin)": select(func.count(Task.id)).where(
+            Task.status == "completed", Task.executed_at >= period_start, Task.executed_at <= now
+        ),
+        "dashboard executed trend (user)": select(Task.executed_at, Task.status).where(
+            Task.user_id == user_id, Task.executed_at >= period_start, Task.executed_at <= now
+        ),
+        "dashboard created in period (user)": select(func.count(Task.id)).where(
+            Task.user_id == user_id, Task.created_at >= period_start, Task.created_at <= now
+        ),
+    }
+
+
+async def main(min_rows: int) -> int:
+    failures = 0
+    async with AsyncSessionLocal() as db:
+        dialect = db.bind.dialect
+        user_id, account_id, batch_id = await sample_ids(db)
+        for name, stmt in hot_queries(user_id, account_id, batch_id).items():
+            sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+            result = await db.execute(text(f"EXPLAIN {sql}"))
+            plan = [dict(r._mapping) for r in result]
+            full_scans = [
+                p for p in plan
+                if p.get("table") == Task.__tablename__
+                and p.get("type") == "ALL"
+                and (p.get("rows") or 0) >= min_rows
+            ]
+            used = ", ".join(str(p.get("key")) for p in plan if p.get("table") == Task.__tablename__)
+            if full_scans:
+                failures += 1
+                print(f"❌ {name}: full scan of ~{full_scans[0].get('rows')} rows")
+                print(f"   {sql}")
+            else:
+                print(f"✅ {name}: key={used}")
+    await dispose_engines()
+
+    if failures:
+        print(f"{failures} hot quer{'y' if failures == 1 else 'ies'} fall back to a full table scan")
+        return 1
+    print("All hot queries use an index")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-rows", type=int, default=1000, help="Ignore full scans estimated below this many rows")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.min_rows)))
@@ -0,0 +1,27 @@
+"""
+Reconcile TaskBatch.total_count with the tasks each unfinished batch really has.
+
+total_count used to be the planned count sent by the client, so batches created
+before it was maintained server-side may never complete. Run once after upgrading,
+or whenever batch progress looks off. Usage (from backend/): python tools/rebuild_batch_totals.py
+"""
+import asyncio
+import sys
+import os
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from app.db.session import AsyncSessionLocal, dispose_engines
+from app.models import Task, Account, User, Fingerprint, TaskBatch  # Import all to ensure registry
+from app.services.batch_progress import rebuild_batch_totals
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        print("Reconciling batch totals...")
+        reconciled, completed = await rebuild_batch_totals(db)
+        await db.commit()
+        print(f"Done. {reconciled} batch total(s) corrected, {completed} batch(es) completed.")
+    await dispose_engines()
+
+if __name__ == "__main__":
+    asyncio.run(main())
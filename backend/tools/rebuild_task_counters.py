@@ -0,0 +1,32 @@
+"""
+Rebuild the task_counters table from the tasks table.
+
+Run after restoring a backup, after manual SQL on tasks, or whenever the stats
+look off. Usage (from backend/): python tools/rebuild_task_counters.py
+"""
+import asyncio
+import sys
+import os
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from sqlalchemy import select, func
+
+from app.db.session import AsyncSessionLocal, dispose_engines
+from app.models import Task, Account, User, Fingerprint, TaskBatch, TaskCounter  # Import all to ensure registry
+from app.services.task_counters import rebuild_task_counters
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        print("Rebuilding task counters...")
+        await rebuild_task_counters(db)
+        await db.commit()
+        
+        tasks_total = (await db.execute(select(func.count(Task.id)))).scalar()
+        counted = (await db.execute(select(func.sum(TaskCounter.task_count)))).scalar() or 0
+        counters = (await db.execute(select(func.count()).select_from(TaskCounter))).scalar()
+        print(f"Done. {counters} counter rows covering {counted} of {tasks_total} tasks.")
+    await dispose_engines()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -16,6 +16,7 @@ class Settings(BaseSettings):
     MYSQL_USER: Optional[str] = None
     MYSQL_PASSWORD: Optional[str] = None
     MYSQL_DATABASE: Optional[str] = None
+    DB_ECHO: bool = False  # Print every SQL statement (local debugging only)
     
     # Security
     SECRET_KEY: str = "your-super-secret-key-change-in-production-min-32-chars"
@@ -17,7 +17,7 @@ elif database_url.startswith("mysql://"):
 is_sqlite = "sqlite" in database_url
 engine = create_async_engine(
     database_url,
-    echo=True,  # Set to False in production
+    echo=settings.DB_ECHO,
     poolclass=NullPool if is_sqlite else None,
     pool_pre_ping=not is_sqlite,  # Enable connection health checks for MySQL
     pool_recycle=3600 if not is_sqlite else None,  # Recycle connections every hour for MySQL
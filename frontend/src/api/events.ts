@@ -0,0 +1,116 @@
+import { useEffect, useRef } from 'react';
+import api from './client';
+
+export interface ServerEvent {
+    event: string;
+    [key: string]: unknown;
+}
+
+const EVENT_TYPES = ['task_status', 'tasks_changed', 'batch_completed', 'bulk_job'];
+// Delay before reopening a dropped stream with a fresh stream token
+const RECONNECT_MS = 5000;
+
+interface ServerEventsOptions {
+    enabled?: boolean;
+    // Bursts of events (e.g. a campaign finishing) trigger one call per window
+    debounceMs?: number;
+    // Polling interval used only when the stream cannot be opened
+    fallbackMs?: number;
+}
+
+/**
+ * Calls `onChange` when the server reports a task, batch or bulk import change for
+ * the current user (GET /events/stream), instead of polling on a timer.
+ * After a reconnect it is called once too, since events may have been missed.
+ * The stream is opened with a short-lived token from POST /events/token, so the
+ * access token never ends up in a URL; reconnects fetch a new one.
+ */
+export function useServerEvents(
+    onChange: (event: ServerEvent) => void,
+    { enabled = true, debounceMs = 1000, fallbackMs }: ServerEventsOptions = {}
+) {
+    const onChangeRef = useRef(onChange);
+    onChangeRef.current = onChange;
+
+    useEffect(() => {
+        if (!enabled) return;
+
+        let debounceTimer: ReturnType<typeof setTimeout> | null = null;
+        let pollTimer: ReturnType<typeof setInterval> | null = null;
+        let lastEvent: ServerEvent | null = null;
+        let connectedOnce = false;
+        let source: EventSource | null = null;
+        let reconnectTimer: ReturnType<typeof setTimeout> | null = null;
+        let closed = false;
+
+        const trigger = (event: ServerEvent) => {
+            lastEvent = event;
+            if (debounceTimer) return;
+            debounceTimer = setTimeout(() => {
+                debounceTimer = null;
+                if (lastEvent) onChangeRef.current(lastEvent);
+            }, debounceMs);
+        };
+
+        const startPolling = () => {
+            if (fallbackMs && !pollTimer) {
+                pollTimer = setInterval(() => onChangeRef.current({ event: 'poll' }), fallbackMs);
+            }
+        };
+
+        const connect = async () => {
+            reconnectTimer = null;
+            let token: string;
+            try {
+                const res = await api.post('/events/token');
+                token = res.data.token;
+            } catch {
+                if (closed) return;
+                startPolling();
+                reconnectTimer = setTimeout(connect, RECONNECT_MS);
+                return;
+            }
+            if (closed) return;
+
+            const stream = new EventSource(`${api.defaults.baseURL}events/stream?token=${encodeURIComponent(token)}`);
+            source = stream;
+
+            stream.addEventListener('ready', () => {
+                if (pollTimer) {
+                    clearInterval(pollTimer);
+                    pollTimer = null;
+                }
+                if (connectedOnce) trigger({ event: 'ready' });
+                connectedOnce = true;
+            });
+
+            EVENT_TYPES.forEach((type) => {
+                stream.addEventListener(type, (e: MessageEvent) => trigger(JSON.parse(e.data)));
+            });
+
+            // Access is gone (banned, logged in elsewhere): stop streaming, the API calls will tell the user
+            stream.addEventListener('revoked', () => {
+                stream.close();
+                startPolling();
+            });
+
+            stream.onerror = () => {
+                // The stream token has expired by now, so EventSource's own retry would be
+                // refused; reopen with a fresh token instead
+                stream.close();
+                startPolling();
+                if (!closed && !reconnectTimer) reconnectTimer = setTimeout(connect, RECONNECT_MS);
+            };
+        };
+
+        connect();
+
+        return () => {
+            closed = true;
+            source?.close();
+            if (reconnectTimer) clearTimeout(reconnectTimer);
+            if (debounceTimer) clearTimeout(debounceTimer);
+            if (pollTimer) clearInterval(pollTimer);
+        };
+    }, [enabled, debounceMs, fallbackMs]);
+}
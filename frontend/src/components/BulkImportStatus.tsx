@@ -12,17 +12,23 @@ const BulkImportStatus = ({ jobId, onComplete }: BulkImportStatusProps) => {
     const [status, setStatus] = useState<any>(null);
     const [isReportOpen, setIsReportOpen] = useState(false);
     const pollIntervalRef = useRef<any>(null);
+    const onCompleteRef = useRef(onComplete);
+    onCompleteRef.current = onComplete;
+
+    const stopPolling = () => {
+        if (pollIntervalRef.current) {
+            clearInterval(pollIntervalRef.current);
+            pollIntervalRef.current = null;
+        }
+    };
 
     const fetchStatus = async () => {
         try {
             const res = await api.get(`/accounts/bulk/status/${jobId}`);
             setStatus(res.data);
             if (res.data.status === 'completed') {
-                if (pollIntervalRef.current) {
-                    clearInterval(pollIntervalRef.current);
-                    pollIntervalRef.current = null;
-                }
-                if (onComplete) onComplete();
+                stopPolling();
+                if (onCompleteRef.current) onCompleteRef.current();
             }
         } catch (err) {
             console.error('Failed to fetch job status:', err);
@@ -30,10 +36,70 @@ const BulkImportStatus = ({ jobId, onComplete }: BulkImportStatusProps) => {
     };
 
     useEffect(() => {
-        fetchStatus();
-        pollIntervalRef.current = setInterval(fetchStatus, 3000);
+        // Progress is pushed over Server-Sent Events; polling is only the fallback
+        let finished = false;
+        let closed = false;
+        let source: EventSource | null = null;
+
+        const fallBackToPolling = () => {
+            fetchStatus();
+            if (!pollIntervalRef.current) pollIntervalRef.current = setInterval(fetchStatus, 3000);
+        };
+
+        const open = async () => {
+            let token: string;
+            try {
+                // Short-lived stream token, so the access token never ends up in a URL
+                const res = await api.post('/events/token');
+                token = res.data.token;
+            } catch {
+                if (!closed) fallBackToPolling();
+                return;
+            }
+            if (closed) return;
+            const url = `${api.defaults.baseURL}accounts/bulk/stream/${jobId}?token=${encodeURIComponent(token)}`;
+            const stream = new EventSource(url);
+            source = stream;
+
+            stream.addEventListener('snapshot', (e: MessageEvent) => {
+                const data = JSON.parse(e.data);
+                setStatus(data);
+                if (data.status === 'completed') {
+                    finished = true;
+                    stream.close();
+                    if (onCompleteRef.current) onCompleteRef.current();
+                }
+            });
+
+            stream.addEventListener('progress', (e: MessageEvent) => {
+                const { result, ...counters } = JSON.parse(e.data);
+                setStatus((prev: any) => {
+                    if (!prev) return prev;
+                    const results = result && result.account_id
+                        ? prev.results.map((r: any) => (r.account_id === result.account_id ? result : r))
+                        : prev.results;
+                    return { ...prev, ...counters, results };
+                });
+                if (counters.status === 'completed') {
+                    finished = true;
+                    stream.close();
+                    if (onCompleteRef.current) onCompleteRef.current();
+                }
+            });
+
+            stream.onerror = () => {
+                if (finished) return;
+                stream.close();
+                fallBackToPolling();
+            };
+        };
+
+        open();
+
         return () => {
-            if (pollIntervalRef.current) clearInterval(pollIntervalRef.current);
+            closed = true;
+            source?.close();
+            stopPolling();
         };
     }, [jobId]);
 
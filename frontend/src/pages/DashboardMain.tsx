@@ -7,6 +7,7 @@ import {
     PieChart, Pie, Cell, Label
 } from 'recharts';
 import api from '../api/client';
+import { useServerEvents } from '../api/events';
 
 const COLORS = {
     active: '#10b981',    // green-500
@@ -262,10 +263,10 @@ const Dashboard = () => {
         fetchStats();
     }, [timePeriod]); // Re-fetch when period changes
 
-    useEffect(() => {
-        const interval = setInterval(fetchStats, 10000); // 10s refresh for activities
-        return () => clearInterval(interval);
-    }, [timePeriod]);
+    // Refresh activities when tasks change (polls every 10s only if the stream is unavailable)
+    useServerEvents(() => {
+        fetchStats();
+    }, { debounceMs: 2000, fallbackMs: 10000 });
 
     const formatTime = (isoString: string) => {
         if (!isoString) return 'Unknown';
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { Image, Heart, UserPlus, Eye, Calendar, Clock, AlertCircle, Loader2, CheckSquare, Square, Trash2, RotateCcw, RotateCw, X, Play, Pause, Video } from 'lucide-react';
 import api from '../api/client';
+import { useServerEvents } from '../api/events';
 import { Pagination } from '../components/common/Pagination';
 import { ConfirmDialog } from '../components/common/ConfirmDialog';
 
@@ -85,10 +86,12 @@ const Monitoring = () => {
     const [totalPages, setTotalPages] = useState(1);
     const [totalItems, setTotalItems] = useState(0);
     const LIMIT = 20;
+    // Keyset pagination: page n starts at the X-Next-Cursor of page n - 1, so pages are
+    // reached by walking forward from the furthest one already seen (per filter tab)
+    const pageCursors = useRef<{ tab: string; cursors: Map<number, string | undefined> }>({ tab: 'all', cursors: new Map([[1, undefined]]) });
 
     // Auto-refresh state
     const [autoRefresh, setAutoRefresh] = useState(false);
-    const autoRefreshInterval = useRef<ReturnType<typeof setInterval> | null>(null);
 
     // Selection state
     const [selectedTaskIds, setSelectedTaskIds] = useState<number[]>([]);
@@ -109,18 +112,32 @@ const Monitoring = () => {
     const fetchTasks = async () => {
         setLoading(true);
         try {
-            const skip = (currentPage - 1) * LIMIT;
-
             // Handle different filter types
             const statusFilters = ['failed', 'pending', 'paused', 'running', 'completed'];
             const isStatusFilter = statusFilters.includes(selectedTab);
             const typeParam = !isStatusFilter && selectedTab !== 'all' ? selectedTab : undefined;
             const statusParam = isStatusFilter ? selectedTab : undefined;
 
-            const [tasksRes, countRes] = await Promise.all([
-                api.get('/tasks', { params: { skip, limit: LIMIT, task_type: typeParam, status: statusParam } }),
-                api.get('/tasks/count', { params: { task_type: typeParam, status: statusParam } })
-            ]);
+            if (pageCursors.current.tab !== selectedTab) {
+                pageCursors.current = { tab: selectedTab, cursors: new Map([[1, undefined]]) };
+            }
+            const cursors = pageCursors.current.cursors;
+            const fetchPage = async (page: number) => {
+                const res = await api.get('/tasks', { params: { cursor: cursors.get(page), limit: LIMIT, task_type: typeParam, status: statusParam } });
+                const next = res.headers['x-next-cursor'];
+                if (next) cursors.set(page + 1, next);
+                return res;
+            };
+
+            const countPromise = api.get('/tasks/count', { params: { task_type: typeParam, status: statusParam } });
+            let page = currentPage;
+            while (!cursors.has(page)) page -= 1;
+            let tasksRes = await fetchPage(page);
+            while (page < currentPage && cursors.has(page + 1)) {
+                page += 1;
+                tasksRes = await fetchPage(page);
+            }
+            const countRes = await countPromise;
 
             setTasks(tasksRes.data);
             setTotalItems(countRes.data.count);
@@ -152,25 +169,10 @@ const Monitoring = () => {
         fetchTasks();
     }, [currentPage, selectedTab]);
 
-    // Auto-refresh effect
-    useEffect(() => {
-        if (autoRefresh) {
-            autoRefreshInterval.current = setInterval(() => {
-                fetchTasks();
-            }, 5000); // Refresh every 5 seconds
-        } else {
-            if (autoRefreshInterval.current) {
-                clearInterval(autoRefreshInterval.current);
-                autoRefreshInterval.current = null;
-            }
-        }
-
-        return () => {
-            if (autoRefreshInterval.current) {
-                clearInterval(autoRefreshInterval.current);
-            }
-        };
-    }, [autoRefresh, currentPage, selectedTab]);
+    // Auto-refresh: re-fetch when the server reports task changes (polls only if the stream is unavailable)
+    useServerEvents(() => {
+        fetchTasks();
+    }, { enabled: autoRefresh, fallbackMs: 5000 });
 
     // Edit task functions
     const handleEditTask = (task: ScheduledTask) => {